@@ -7,24 +7,143 @@ DATA_DIR = os.path.join(BASE_DIR, 'data')
 DATAFORSEO_USERNAME = os.getenv('DATAFORSEO_USERNAME', 'your_default_username')
 DATAFORSEO_PASSWORD = os.getenv('DATAFORSEO_PASSWORD', 'your_default_password')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', 'your_default_openai_key')
+# Alternative OpenAI-compatible endpoint, e.g. the local stand-in in src/benchmarks/fake_openai.py
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL') or None
 
 # API settings
 DATAFORSEO_DOMAIN = "api.dataforseo.com"
 MAX_RETRIES = 5
 RETRY_DELAY = 35
 
+# On-page task readiness polling (exponential backoff with jitter)
+TASK_POLL_INITIAL_DELAY = 2
+TASK_POLL_MAX_DELAY = 30
+TASK_READY_TIMEOUT = 300
+
+# Maximum tasks per DataForSEO request
+ONPAGE_TASK_BATCH_SIZE = 100
+ONPAGE_INSTANT_BATCH_SIZE = 20
+
 # Analysis settings
 MAX_COMPETITORS = 10
 TOP_KEYWORDS_COUNT = 40
+# Keywords are pre-ranked by frequency across competitors; only this many are embedded for similarity ranking
+KEYWORD_CANDIDATES = 200
 SIMILARITY_THRESHOLD = 0.6
 MAX_LINK_SUGGESTIONS = 5
 
 # Threading
 MAX_WORKERS = 5
 
+# Number of briefs run at once by src/batch.py
+BATCH_CONCURRENCY = 4
+
+# Competitor analyses are shared by briefs running in the same process: a URL already being crawled
+# for one brief is awaited by the others, and finished analyses are reused for URL_ANALYSIS_MAX_AGE seconds
+URL_ANALYSIS_SHARING = True
+URL_ANALYSIS_MAX_AGE = 6 * 3600
+URL_ANALYSIS_MAX_ENTRIES = 2000
+
+# Brief server (src/server.py): jobs wait in a queue of SERVER_QUEUE_SIZE and are run SERVER_WORKERS at a time;
+# submissions are refused while the queue is full. Finished jobs are kept for SERVER_JOB_RETENTION seconds,
+# checked every SERVER_EXPIRE_INTERVAL seconds.
+SERVER_HOST = os.getenv('BRIEF_SERVER_HOST', '127.0.0.1')
+SERVER_PORT = int(os.getenv('BRIEF_SERVER_PORT', '8080'))
+SERVER_WORKERS = BATCH_CONCURRENCY
+SERVER_QUEUE_SIZE = 32
+SERVER_JOB_RETENTION = 24 * 3600
+SERVER_EXPIRE_INTERVAL = 60
+
+# Process-wide rate limits per provider:endpoint class (requests and tokens per minute)
+RATE_LIMITS = {
+    'dataforseo:serp': {'rpm': 600},
+    'dataforseo:on_page': {'rpm': 1000},
+    'dataforseo:default': {'rpm': 2000},
+    'openai:embeddings': {'rpm': 3000, 'tpm': 1000000},
+    'openai:chat': {'rpm': 500, 'tpm': 30000},
+}
+RATE_LIMIT_MAX_RETRIES = 5
+
+# DataForSEO response cache (seconds). Only endpoints listed in RESPONSE_CACHE_TTLS are cached;
+# stale entries inside the stale-while-revalidate window are served while a refresh runs in the background
+RESPONSE_CACHE_ENABLED = True
+RESPONSE_CACHE_BYPASS = os.getenv('RESPONSE_CACHE_BYPASS', '') == '1'
+RESPONSE_CACHE_PATH = os.path.join(DATA_DIR, 'cache', 'responses.sqlite3')
+RESPONSE_CACHE_TTLS = {
+    '/v3/serp/google/organic/live/advanced': 24 * 3600,
+    '/v3/serp/ai_summary': 24 * 3600,
+    '/v3/on_page/instant_pages': 7 * 24 * 3600,
+    '/v3/on_page/keyword_density': 7 * 24 * 3600,
+}
+RESPONSE_CACHE_STALE_WHILE_REVALIDATE = {
+    '/v3/serp/google/organic/live/advanced': 3600,
+    '/v3/serp/ai_summary': 3600,
+    '/v3/on_page/instant_pages': 24 * 3600,
+}
+# Entries past their TTL and stale-while-revalidate window are deleted when the cache is opened and every
+# RESPONSE_CACHE_PURGE_INTERVAL writes
+RESPONSE_CACHE_PURGE_INTERVAL = 500
+# Request fields left out of cache keys ('*' applies to every endpoint); keyword density is keyed by URL, not crawl task
+RESPONSE_CACHE_IGNORED_FIELDS = {
+    '*': ['tag'],
+    '/v3/on_page/keyword_density': ['id'],
+}
+
+# Tracing: a JSON trace per brief run (stages and every API call with duration, retries, bytes, tokens
+# and DataForSEO cost) and process-wide totals in Prometheus textfile-collector format
+TRACE_ENABLED = True
+TRACE_DIR = os.path.join(DATA_DIR, 'traces')
+PROMETHEUS_TEXTFILE_PATH = os.getenv('PROMETHEUS_TEXTFILE_PATH') or os.path.join(DATA_DIR, 'metrics', 'brief_gen.prom')
+# DEBUG also logs raw API responses
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+
+# Stage outputs of every brief run are checkpointed under RUNS_DIR/<run id>/ so a failed or
+# interrupted run can be resumed with `python src/main.py --resume <run id>`. Checkpoints are deleted
+# when the brief is generated; those of failed runs are purged after RUNS_MAX_AGE seconds
+CHECKPOINT_ENABLED = True
+RUNS_DIR = os.path.join(DATA_DIR, 'runs')
+RUNS_MAX_AGE = 7 * 24 * 3600
+
+# HTTP connection pooling (shared by every DataForSEO call)
+HTTP_POOL_SIZE = 10
+HTTP_CONNECT_TIMEOUT = 10
+HTTP_READ_TIMEOUT = 120
+
 # Model settings
 GPT_MODEL = "gpt-4o"
-EMBEDDING_MODEL = "text-embedding-ada-002"
+# Expected size of a brief completion, only used to budget chat requests against the tokens-per-minute limit
+GPT_EXPECTED_COMPLETION_TOKENS = 4096
+# Upper bound on the brief prompt (system + user message). Competitor headings, outlinks, keywords and the
+# SERP overview are trimmed in that order when the input data would exceed it
+PROMPT_MAX_TOKENS = 12000
+# Competitor headings whose embeddings are at least this similar are collapsed into one outline entry
+HEADING_SIMILARITY_THRESHOLD = 0.9
+# Articles (src/analysis/article_generator.py) are written one H2 section of the brief's outline per completion,
+# ARTICLE_MAX_WORKERS at a time; a failed section is retried on its own up to ARTICLE_SECTION_ATTEMPTS times.
+# Each call gets the ARTICLE_CONTEXT_KEYWORDS top related keywords instead of the whole brief
+ARTICLE_MAX_WORKERS = 6
+ARTICLE_SECTION_MAX_TOKENS = 1200
+ARTICLE_SECTION_ATTEMPTS = 3
+ARTICLE_CONTEXT_KEYWORDS = 20
+EMBEDDING_MODEL = "text-embedding-3-large"
+EMBEDDING_DIMENSIONS = None  # e.g. 256 to request reduced text-embedding-3-* vectors
+EMBEDDING_BATCH_MAX_TOKENS = 20000
+EMBEDDING_BATCH_MAX_INPUTS = 1024
+EMBEDDING_MAX_WORKERS = 4
+
+# Embedding cache
+EMBEDDING_CACHE_PATH = os.path.join(DATA_DIR, 'cache', 'embeddings.sqlite3')
+EMBEDDING_CACHE_MAX_BYTES = 512 * 1024 * 1024
+EMBEDDING_CACHE_DTYPE = 'float16'  # 'float16' or 'float32'
+
+# Similarity backend for keyword and H1 matching: 'openai' (remote embeddings) or 'local'
+# (character n-gram TF-IDF + LSA, fitted on the URL database H1s, no network needed)
+SIMILARITY_BACKEND = os.getenv('SIMILARITY_BACKEND', 'openai')
+# Use the local backend for keyword similarity when the OpenAI embeddings API fails
+SIMILARITY_FALLBACK_TO_LOCAL = True
+LOCAL_SIMILARITY_MODEL_PATH = os.path.join(DATA_DIR, 'models', 'local_similarity.joblib')
+LOCAL_SIMILARITY_FEATURES = 2 ** 15
+LOCAL_SIMILARITY_DIMENSIONS = 128
 
 # CSV file paths
 LOCATION_CSV_PATH = os.path.join(DATA_DIR, 'Country_List - Sheet1.csv')
@@ -32,11 +151,26 @@ LANGUAGE_CSV_PATH = os.path.join(DATA_DIR, 'languages_serp_google_2023_05_02.csv
 
 # URL databases directory
 URL_DATABASES_DIR = os.path.join(DATA_DIR, 'url_databases')
-os.makedirs(URL_DATABASES_DIR, exist_ok=True)
+
+# Precomputed H1 embedding indexes, one sub-directory per URL database
+URL_INDEX_DIR = os.path.join(DATA_DIR, 'url_indexes')
+LOCAL_URL_INDEX_DIR = os.path.join(URL_INDEX_DIR, 'local')
+
+# Outlink search: 'exact' scans every row, 'ann' only scores the ANN_N_PROBE closest partitions
+OUTLINK_SEARCH_MODE = 'exact'
+ANN_PARTITIONS = 'cluster'  # 'cluster' to partition on cluster_name, or a k-means partition count
+ANN_N_PROBE = 4
+
+# Broad inlink analysis (src/build_inlinks.py): the INLINK_NEIGHBOURS most similar pages of every row of a URL
+# database, limited to the same cluster ('same'), other clusters ('cross') or not at all ('all'). The all-pairs
+# similarities are computed in blocks that keep each worker process under INLINK_BLOCK_MEMORY bytes
+INLINK_NEIGHBOURS = 10
+INLINK_SCOPE = 'all'
+INLINK_BLOCK_MEMORY = 64 * 1024 * 1024
+INLINK_PROCESSES = None  # None for one per CPU
+
+# Similarity bonus for rows in the selected clusters when hard clustering is off
+CLUSTER_BOOST = 0.05
 
 # Linking opportunities limit
 MAX_POTENTIAL_OUTLINKS = 10
-
-# Dictionary to store paths of all URL database CSV files
-URL_DATABASES = {os.path.splitext(f)[0]: os.path.join(URL_DATABASES_DIR, f) 
-                 for f in os.listdir(URL_DATABASES_DIR) if f.endswith('.csv')}
\ No newline at end of file
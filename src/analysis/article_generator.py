@@ -0,0 +1,247 @@
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config.settings import (
+    GPT_MODEL, ARTICLE_MAX_WORKERS, ARTICLE_SECTION_MAX_TOKENS, ARTICLE_SECTION_ATTEMPTS, ARTICLE_CONTEXT_KEYWORDS
+)
+from src.api.backoff import backoff_delays
+from src.api.clients import get_openai_client
+from src.api.rate_limiter import call_openai
+from src.utils.token_counter import count_tokens
+from src.utils.tracing import propagate, span
+
+SYSTEM_PROMPT = "You are an expert SEO content writer. You write clear, well-structured, engaging articles that follow the outline you are given and use the target keyword and related terms naturally."
+
+# "H2: Title", "**H3 - Title**", "- H4. Title", "## H2: Title" and similar heading lines of the brief's outline
+_TAGGED_HEADING = re.compile(r'^\s*(?:[-*+]\s+)?(?:#+\s*)?(?:\*\*|__)?\s*<?(H[1-4])>?\s*[:.\-–—)]?\s*(.+)$', re.IGNORECASE)
+_MARKDOWN_HEADING = re.compile(r'^\s*(#{1,4})\s+(.+)$')
+# Sections that follow the Content Structure in a brief (see gpt_brief_generator's output format)
+_BRIEF_SECTIONS = ('key points to address', 'unique angles', 'related keywords', 'content specifications', 'related links')
+
+
+def _clean_heading(text):
+    text = re.sub(r'\[ADDED\]', '', text, flags=re.IGNORECASE)
+    text = re.sub(r'</?h[1-4]>', '', text, flags=re.IGNORECASE)
+    return text.strip().strip('*_').strip()
+
+
+def _brief_section_title(line):
+    title = re.sub(r'^[#*_\s\d.]+', '', line).strip('*_: ').lower()
+    return title if line.lstrip().startswith(('#', '**')) else ''
+
+
+def parse_outline(brief):
+    """The Content Structure of a brief as {'title', 'intro', 'sections'}.
+
+    Each section is an H2 with its H3/H4 subheadings and any notes (bullets) written under
+    them; whatever comes before the first H2 is the introduction. Headings written as H-tags
+    ("H2: ...") are preferred; without any, Markdown heading levels are used instead.
+    """
+    lines = brief.splitlines()
+    start = next((i for i, line in enumerate(lines) if 'content structure' in line.lower()), -1)
+    end = next((i for i in range(start + 1, len(lines))
+                if _brief_section_title(lines[i]).startswith(_BRIEF_SECTIONS)), len(lines))
+    outline_lines = lines[start + 1:end]
+    tagged = any(_TAGGED_HEADING.match(line) for line in outline_lines)
+
+    outline = {'title': None, 'intro': [], 'sections': []}
+    for line in outline_lines:
+        if not line.strip():
+            continue
+        match = _TAGGED_HEADING.match(line) if tagged else _MARKDOWN_HEADING.match(line)
+        if match:
+            level = int(match.group(1)[1]) if tagged else len(match.group(1))
+            text = _clean_heading(match.group(2))
+            if level == 1 and outline['title'] is None:
+                outline['title'] = text
+            elif level <= 2:
+                outline['sections'].append({'heading': text, 'subheadings': [], 'notes': []})
+            elif outline['sections']:
+                outline['sections'][-1]['subheadings'].append((level, text))
+            continue
+        note = line.strip().lstrip('-*+ ').strip()
+        if outline['sections']:
+            outline['sections'][-1]['notes'].append(note)
+        else:
+            outline['intro'].append(note)
+    return outline
+
+
+class ArticleGenerator:
+    """Writes an article from a brief, one completion per H2 section of its Content Structure.
+
+    Sections are generated concurrently (``max_workers`` at a time, under the process-wide
+    'openai:chat' rate limits) from a compact context: the keyword, title, section list,
+    top related keywords and outlinks rather than the whole brief. They are stitched back
+    in outline order; a failed section is retried on its own, up to ``max_attempts`` times.
+    """
+
+    def __init__(self, client=None, max_workers=ARTICLE_MAX_WORKERS, section_max_tokens=ARTICLE_SECTION_MAX_TOKENS,
+                 max_attempts=ARTICLE_SECTION_ATTEMPTS):
+        self._client = client
+        self.max_workers = max_workers
+        self.section_max_tokens = section_max_tokens
+        self.max_attempts = max_attempts
+
+    @property
+    def client(self):
+        # Resolved on first request so constructing the generator does not import the OpenAI SDK
+        if self._client is None:
+            self._client = get_openai_client()
+        return self._client
+
+    @staticmethod
+    def build_context(keyword, outline, top_keywords=None, potential_outlinks=None, target_language='English'):
+        keywords = [kw['keyword'] if isinstance(kw, dict) else kw for kw in top_keywords or []]
+        return {
+            'keyword': keyword,
+            'language': target_language,
+            'title': outline['title'] or keyword,
+            'sections': [section['heading'] for section in outline['sections']],
+            'related_keywords': keywords[:ARTICLE_CONTEXT_KEYWORDS],
+            'outlinks': [(link.get('h1') or link['url'], link['url']) for link in potential_outlinks or []]
+        }
+
+    @staticmethod
+    def _render_context(context):
+        lines = [
+            f"Article title: {context['title']}",
+            f"Target keyword: {context['keyword']}",
+            f"Language: {context['language']}",
+            "Article sections: " + ' | '.join(context['sections'])
+        ]
+        if context['related_keywords']:
+            lines.append("Related keywords (use where natural): " + ', '.join(context['related_keywords']))
+        if context['outlinks']:
+            lines.append("Links you may cite (use only these, as Markdown links):")
+            lines.extend(f"- {title}: {url}" for title, url in context['outlinks'])
+        return '\n'.join(lines)
+
+    @staticmethod
+    def _render_section(section):
+        lines = [f"## {section['heading']}"]
+        lines.extend(f"{'#' * level} {text}" for level, text in section['subheadings'])
+        lines.extend(f"- {note}" for note in section['notes'])
+        return '\n'.join(lines)
+
+    def section_messages(self, context, section):
+        # A section without a heading is the introduction
+        if section['heading'] is None:
+            task = ("Write the introduction of the article: two or three paragraphs that present the topic and what "
+                    "the reader will learn. Do not write a heading.")
+            task += ''.join(f"\n- {note}" for note in section['notes'])
+        else:
+            task = ("Write only the section below. Start with its H2 heading exactly as given and use the given "
+                    "subheadings in Markdown; cover the notes. Do not write an introduction or conclusion for the "
+                    "whole article, the other sections are written separately.\n\n" + self._render_section(section))
+        prompt = f"{self._render_context(context)}\n\n{task}\n\nWrite in {context['language']}."
+        return [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": prompt}]
+
+    def _complete(self, messages, max_tokens, name, **attributes):
+        with span(name, 'llm', model=GPT_MODEL, **attributes):
+            completion = call_openai(
+                'openai:chat',
+                lambda: self.client.chat.completions.with_raw_response.create(
+                    model=GPT_MODEL,
+                    messages=messages,
+                    max_tokens=max_tokens
+                ),
+                tokens=sum(count_tokens(message["content"], GPT_MODEL) for message in messages) + max_tokens
+            )
+        return completion.choices[0].message.content or ''
+
+    def generate_section(self, context, section):
+        messages = self.section_messages(context, section)
+        heading = section['heading'] or 'Introduction'
+        delays = backoff_delays(1, 30)
+        started = time.perf_counter()
+        error = None
+        for attempt in range(1, self.max_attempts + 1):
+            # call_openai already retries rate limits and server errors; this retries whatever is left
+            # (e.g. an empty completion or a call that ran out of retries) for this section alone
+            try:
+                text = self._complete(messages, self.section_max_tokens, 'article_section', heading=heading)
+                if text.strip():
+                    return {'heading': heading, 'text': text.strip(), 'attempts': attempt, 'error': None,
+                            'seconds': time.perf_counter() - started}
+                error = "empty completion"
+            except Exception as e:
+                error = str(e)
+            if attempt < self.max_attempts:
+                delay = next(delays)
+                print(f"Section '{heading}' failed ({error}). Retrying in {delay:.1f} seconds...")
+                time.sleep(delay)
+        print(f"Section '{heading}' failed after {self.max_attempts} attempts: {error}")
+        return {'heading': heading, 'text': None, 'attempts': self.max_attempts, 'error': error,
+                'seconds': time.perf_counter() - started}
+
+    def generate_article(self, brief, keyword, top_keywords=None, potential_outlinks=None, target_language='English'):
+        outline = parse_outline(brief)
+        if not outline['sections']:
+            print("The brief has no H2 sections; generating the article in a single call.")
+            return self.generate_single_call(brief, keyword, top_keywords, potential_outlinks, target_language)
+        context = self.build_context(keyword, outline, top_keywords, potential_outlinks, target_language)
+        print(f"Generating article '{context['title']}' in {len(outline['sections'])} sections "
+              f"({self.max_workers} at a time)...")
+
+        started = time.perf_counter()
+        parts = [{'heading': None, 'subheadings': [], 'notes': outline['intro']}] + outline['sections']
+        with span('generate_article', 'llm', sections=len(outline['sections'])), \
+                ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(propagate(lambda section: self.generate_section(context, section)), parts))
+        wall_time = time.perf_counter() - started
+
+        text = [f"# {context['title']}"]
+        for section, result in zip(parts, results):
+            if result['text'] is not None:
+                # Models sometimes repeat the heading they were asked to start with; it is written once here
+                body = result['text']
+                if section['heading'] is not None:
+                    body = re.sub(r'^\s*#{1,2}\s+[^\n]*\n?', '', body, count=1)
+                    text.append(f"## {section['heading']}")
+                text.append(body.strip())
+            elif section['heading'] is not None:
+                text.append(f"## {section['heading']}\n\n<!-- This section could not be generated: {result['error']} -->")
+        return {
+            'text': '\n\n'.join(text),
+            'sections': results,
+            'failed': [result['heading'] for result in results if result['text'] is None],
+            'wall_time': wall_time,
+            # What the same calls would have taken one after another
+            'sequential_time': sum(result['seconds'] for result in results)
+        }
+
+    def generate_single_call(self, brief, keyword, top_keywords=None, potential_outlinks=None, target_language='English'):
+        # The whole article in one completion, as a baseline for generate_article
+        outline = parse_outline(brief)
+        context = self.build_context(keyword, outline, top_keywords, potential_outlinks, target_language)
+        outline_text = '\n\n'.join(self._render_section(section) for section in outline['sections'])
+        prompt = (f"{self._render_context(context)}\n\nWrite the complete article: an introduction, then every "
+                  f"section below in order, in Markdown.\n\n{outline_text}\n\nWrite in {context['language']}.")
+        messages = [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": prompt}]
+        started = time.perf_counter()
+        text = self._complete(messages, self.section_max_tokens * (len(outline['sections']) + 1), 'generate_article_single')
+        wall_time = time.perf_counter() - started
+        return {
+            'text': f"# {context['title']}\n\n{text.strip()}",
+            'sections': [],
+            'failed': [],
+            'wall_time': wall_time,
+            'sequential_time': wall_time
+        }
+
+    @staticmethod
+    def print_report(article):
+        sections = article['sections']
+        retried = sum(result['attempts'] > 1 for result in sections)
+        line = f"Article: {len(article['text'].split())} words in {article['wall_time']:.1f}s"
+        if sections:
+            speedup = article['sequential_time'] / article['wall_time'] if article['wall_time'] else 0.0
+            line += (f" ({len(sections)} parts, {article['sequential_time']:.1f}s of generation in total, "
+                     f"{speedup:.1f}x faster than one part at a time)")
+        print(line)
+        if retried:
+            print(f"{retried} section(s) needed more than one attempt")
+        if article['failed']:
+            print(f"Failed sections: {', '.join(article['failed'])}")
@@ -0,0 +1,108 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from config.settings import (
+    EMBEDDING_MODEL, EMBEDDING_DIMENSIONS,
+    EMBEDDING_BATCH_MAX_TOKENS, EMBEDDING_BATCH_MAX_INPUTS, EMBEDDING_MAX_WORKERS
+)
+from src.api.clients import get_openai_client
+from src.api.rate_limiter import call_openai
+from src.utils.embedding_cache import EmbeddingCache
+from src.utils.token_counter import count_tokens
+from src.utils.tracing import propagate
+
+
+class EmbeddingService:
+    """Deduplicating, cache-backed, batched front end for the OpenAI embeddings API."""
+
+    def __init__(self, client=None, model=EMBEDDING_MODEL, dimensions=EMBEDDING_DIMENSIONS, cache=None,
+                 max_batch_tokens=EMBEDDING_BATCH_MAX_TOKENS, max_batch_inputs=EMBEDDING_BATCH_MAX_INPUTS,
+                 max_workers=EMBEDDING_MAX_WORKERS):
+        if dimensions and not model.startswith("text-embedding-3"):
+            raise ValueError(f"Reduced dimensions are only supported by text-embedding-3 models, not {model}")
+        self._client = client
+        self.model = model
+        self.dimensions = dimensions
+        self.cache = cache or EmbeddingCache()
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_inputs = max_batch_inputs
+        self.max_workers = max_workers
+
+    @property
+    def client(self):
+        # Resolved on first request so constructing the service does not import the OpenAI SDK
+        if self._client is None:
+            self._client = get_openai_client()
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+
+    @property
+    def cache_model(self) -> str:
+        # Vectors requested with reduced dimensions differ from the full ones, so key them separately
+        return f"{self.model}@{self.dimensions}" if self.dimensions else self.model
+
+    def embed(self, texts: Sequence[str], normalize: bool = False) -> np.ndarray:
+        unique_texts = list(dict.fromkeys(text for text in texts if text))
+        vectors = self.cache.get_many(self.cache_model, unique_texts)
+
+        missing = [text for text in unique_texts if text not in vectors]
+        if missing:
+            print(f"Embedding {len(missing)} new texts ({len(unique_texts) - len(missing)} cached)...")
+            vectors.update(self._embed_missing(missing))
+
+        dim = len(next(iter(vectors.values()))) if vectors else (self.dimensions or 0)
+        matrix = np.zeros((len(texts), dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            if text:
+                matrix[i] = vectors[text]
+
+        if normalize:
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+    def embed_one(self, text: str, normalize: bool = False) -> np.ndarray:
+        return self.embed([text], normalize=normalize)[0]
+
+    def _make_batches(self, texts: List[str]) -> List[Tuple[List[str], int]]:
+        batches = []
+        current, current_tokens = [], 0
+        for text in texts:
+            tokens = count_tokens(text, self.model)
+            if current and (current_tokens + tokens > self.max_batch_tokens or len(current) >= self.max_batch_inputs):
+                batches.append((current, current_tokens))
+                current, current_tokens = [], 0
+            current.append(text)
+            current_tokens += tokens
+        if current:
+            batches.append((current, current_tokens))
+        return batches
+
+    def _embed_missing(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        batches = self._make_batches(texts)
+        results = {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as executor:
+            for (batch, _), embeddings in zip(batches, executor.map(propagate(lambda args: self._embed_batch(*args)), batches)):
+                batch_vectors = dict(zip(batch, embeddings))
+                self.cache.put_many(self.cache_model, batch_vectors.items())
+                results.update(batch_vectors)
+        return results
+
+    def _embed_batch(self, batch: List[str], tokens: int) -> List[np.ndarray]:
+        kwargs = {'input': batch, 'model': self.model}
+        if self.dimensions:
+            kwargs['dimensions'] = self.dimensions
+
+        response = call_openai(
+            'openai:embeddings',
+            lambda: self.client.embeddings.with_raw_response.create(**kwargs),
+            tokens=tokens
+        )
+        # The API does not guarantee response order, so place each vector by its index
+        ordered = sorted(response.data, key=lambda item: item.index)
+        return [np.asarray(item.embedding, dtype=np.float32) for item in ordered]
@@ -1,12 +1,169 @@
-from openai import OpenAI
-from config.settings import OPENAI_API_KEY, GPT_MODEL
-import json
+from config.settings import GPT_MODEL, GPT_EXPECTED_COMPLETION_TOKENS
+from src.api.clients import get_openai_client
+from src.api.rate_limiter import call_openai
+from src.analysis.prompt_builder import PromptBuilder
+from src.utils.token_counter import count_tokens
+from src.utils.tracing import span, start_span
+import sys
+import time
+
+
+def stdout_sink(text):
+    sys.stdout.write(text)
+    sys.stdout.flush()
+
+
+def file_sink(file):
+    # Sink for an open text file; flushed per chunk so the brief can be tailed while it is written
+    def write(text):
+        file.write(text)
+        file.flush()
+    return write
+
+
+def warn_if_truncated(finish_reason):
+    if finish_reason == 'length':
+        print("\nWarning: the model stopped at its output token limit; the brief is incomplete.")
+
+
+SYSTEM_PROMPT = "You are an expert SEO analyst specialized in creating comprehensive, actionable content briefs tailored to specific target keywords and audience needs. You excel at analyzing SERP data and reference content to inform content strategy."
+
+
+class BriefStream:
+    """Text chunks of a streamed brief, passed to every sink as they arrive.
+
+    The full text is assembled incrementally in ``text``; ``time_to_first_token`` and
+    ``total_time`` are measured from when the request was sent. ``trace_span``, if given,
+    is ended with the timings and token usage once the stream is exhausted.
+    """
+
+    def __init__(self, chunks, sinks=(), started=None, prompt_report=None, trace_span=None):
+        self._chunks = chunks
+        self.prompt_report = prompt_report
+        self.trace_span = trace_span
+        self.usage = None
+        self.finish_reason = None
+        self.sinks = [sink for sink in sinks if sink is not None]
+        self.started = started or time.perf_counter()
+        self._parts = []
+        self.time_to_first_token = None
+        self.total_time = None
+
+    def __iter__(self):
+        try:
+            for chunk in self._chunks:
+                # With stream_options include_usage the last chunk has no choices, only usage
+                if getattr(chunk, 'usage', None) is not None:
+                    self.usage = chunk.usage
+                if chunk.choices and chunk.choices[0].finish_reason:
+                    self.finish_reason = chunk.choices[0].finish_reason
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                if self.time_to_first_token is None:
+                    self.time_to_first_token = time.perf_counter() - self.started
+                self._parts.append(delta)
+                for sink in self.sinks:
+                    sink(delta)
+                yield delta
+        except Exception as e:
+            self._end_span(e)
+            raise
+        self.total_time = time.perf_counter() - self.started
+        warn_if_truncated(self.finish_reason)
+        self._end_span()
+
+    def _end_span(self, error=None):
+        if self.trace_span is None:
+            return
+        if self.usage is not None:
+            tokens = {'prompt_tokens': self.usage.prompt_tokens, 'completion_tokens': self.usage.completion_tokens}
+        else:
+            tokens = {'prompt_tokens': (self.prompt_report or {}).get('total_tokens', 0),
+                      'completion_tokens': count_tokens(self.text, GPT_MODEL)}
+        self.trace_span.set(time_to_first_token=self.time_to_first_token, response_chars=len(self.text),
+                            finish_reason=self.finish_reason, **tokens)
+        self.trace_span.end(error)
+
+    @classmethod
+    def completed(cls, text, timings=None, prompt_report=None):
+        # An already finished brief, e.g. restored from a run checkpoint
+        stream = cls([], prompt_report=prompt_report)
+        stream._parts = [text]
+        stream.time_to_first_token = (timings or {}).get('time_to_first_token')
+        stream.total_time = (timings or {}).get('total_time')
+        return stream
+
+    @property
+    def text(self):
+        return ''.join(self._parts)
+
+    def consume(self):
+        for _ in self:
+            pass
+        return self.text
+
+    def timings(self):
+        return {'time_to_first_token': self.time_to_first_token, 'total_time': self.total_time}
+
 
 class GPTBriefGenerator:
-    def __init__(self):
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
+    def __init__(self, prompt_builder=None, client=None):
+        self._client = client
+        self.prompt_builder = prompt_builder or PromptBuilder()
+
+    @property
+    def client(self):
+        # Resolved on first request so constructing the generator does not import the OpenAI SDK
+        if self._client is None:
+            self._client = get_openai_client()
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
 
     def generate_brief(self, keyword, compiled_data, top_keywords, potential_outlinks, reference_data=None, target_language=None):
+        messages, _ = self.build_messages(keyword, compiled_data, top_keywords, potential_outlinks, reference_data, target_language)
+        with span('generate_brief', 'llm', model=GPT_MODEL):
+            completion = call_openai(
+                'openai:chat',
+                lambda: self.client.chat.completions.with_raw_response.create(
+                    model=GPT_MODEL,
+                    messages=messages
+                ),
+                tokens=self._estimate_tokens(messages)
+            )
+        warn_if_truncated(completion.choices[0].finish_reason)
+        return completion.choices[0].message.content
+
+    def stream_brief(self, keyword, compiled_data, top_keywords, potential_outlinks, reference_data=None, target_language=None, sinks=()):
+        # Returns a BriefStream; iterate it (or call consume()) to receive the brief as it is written
+        messages, prompt_report = self.build_messages(keyword, compiled_data, top_keywords, potential_outlinks, reference_data, target_language)
+        return self.stream_messages(messages, prompt_report, sinks)
+
+    def stream_messages(self, messages, prompt_report=None, sinks=()):
+        # Streams a brief for messages from build_messages, e.g. a prompt restored from a checkpoint
+        started = time.perf_counter()
+        # Ended by the BriefStream once the last chunk has arrived
+        stream_span = start_span('stream_brief', 'llm', model=GPT_MODEL)
+        try:
+            chunks = call_openai(
+                'openai:chat',
+                lambda: self.client.chat.completions.with_raw_response.create(
+                    model=GPT_MODEL,
+                    messages=messages,
+                    stream=True,
+                    stream_options={'include_usage': True}
+                ),
+                tokens=self._estimate_tokens(messages)
+            )
+        except Exception as e:
+            stream_span.end(e)
+            raise
+        return BriefStream(chunks, sinks, started, prompt_report, stream_span)
+
+    def build_messages(self, keyword, compiled_data, top_keywords, potential_outlinks, reference_data, target_language):
         print("Generating brief with the following data:")
         print(f"Keyword: {keyword}")
         print(f"Target language: {target_language}")
@@ -15,25 +172,27 @@ class GPTBriefGenerator:
 
         is_english = target_language.lower() in ['en', 'eng', 'english']
         keyword_strings = [kw['keyword'] for kw in top_keywords]
-        
-        prompt = self._create_prompt(keyword, compiled_data, keyword_strings, potential_outlinks, reference_data, target_language, is_english)
-
-        is_english = target_language.lower() in ['en', 'eng', 'english']
-        keyword_strings = [kw['keyword'] for kw in top_keywords]
-        
-        prompt = self._create_prompt(keyword, compiled_data, keyword_strings, potential_outlinks, reference_data, target_language, is_english)
 
-        print("\nGenerating GPT Brief...")
-        completion = self.client.chat.completions.create(
-            model=GPT_MODEL,
-            messages=[
-                {"role": "system", "content": "You are an expert SEO analyst specialized in creating comprehensive, actionable content briefs tailored to specific target keywords and audience needs. You excel at analyzing SERP data and reference content to inform content strategy."},
-                {"role": "user", "content": prompt}
-            ]
+        prompt, report = self.prompt_builder.build(
+            lambda sections: self._create_prompt(keyword, sections, reference_data, target_language, is_english),
+            SYSTEM_PROMPT, compiled_data, keyword_strings, potential_outlinks, reference_data
         )
-        return completion.choices[0].message.content
+        self.prompt_builder.print_report(report)
 
-    def _create_prompt(self, keyword, compiled_data, top_keywords, potential_outlinks, reference_data, target_language, is_english):
+        print("\nGenerating GPT Brief...")
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+        return messages, report
+
+    @staticmethod
+    def _estimate_tokens(messages):
+        # Budget the prompt plus a typical brief against the tokens-per-minute limit; completions are not capped
+        return sum(count_tokens(message["content"], GPT_MODEL) for message in messages) + GPT_EXPECTED_COMPLETION_TOKENS
+
+    def _create_prompt(self, keyword, sections, reference_data, target_language, is_english):
+        # `sections` holds the token-budgeted section texts from PromptBuilder
         prompt = f"""
         Role: You are an expert SEO content strategist and translator tasked with creating a comprehensive and actionable content brief.
 
@@ -51,23 +210,23 @@ class GPTBriefGenerator:
         3. SERP Summary:
            Context: This provides an overview of the current search engine results page for the target keyword and an analysis of the top 10 competitors.
            Data: 
-           Overview: {compiled_data['content_summary']}
-           Top 10 Competitors: {compiled_data['top_competitors']}
+           Overview: {sections['content_summary']}
+           Top 10 Competitors: {sections['top_competitors']}
 
         4. Content Outline Based on Relevant Headings from the SERP:
            Context: This outline compiles important headings and subheadings from top-ranking pages. Use this to supplement the reference URL structure or create a new structure if no reference URL is provided.
-           Data: {compiled_data['content_outline']}
+           Data: {sections['content_outline']}
 
         5. Related Keywords:
            Context: These are semantically related terms and phrases relevant to the target keyword. They should be incorporated into the content structure to improve topical relevance. Translate these to {target_language}.
-           Data: {', '.join(top_keywords)}
+           Data: {sections['related_keywords']}
         """
 
-        if potential_outlinks:
+        if sections.get('potential_outlinks'):
             prompt += f"""
         6. Related Links:
            Context: These are specific relevant link sources that the new content could link to, enhancing its value and credibility. Only use these provided outlinks in your strategy.
-           Data: {self._format_links(potential_outlinks)}
+           Data: {sections['potential_outlinks']}
         """
 
         if reference_data:
@@ -76,7 +235,7 @@ class GPTBriefGenerator:
            Context: This is detailed information about a specific URL, including its headings and relevant keywords. This structure MUST be translated and used as the base for the content brief, supplemented with additional insights from the SERP data.
            Data:
            URL: {reference_data['url']}
-           Headings: {json.dumps(reference_data['headings'], indent=2)}
+           Headings: {sections['reference_headings']}
            Relevant Keywords: {', '.join([kw['keyword'] for kw in reference_data['relevant_keywords']])}
         """
 
@@ -160,11 +319,3 @@ class GPTBriefGenerator:
         """
 
         return prompt
-
-    def _format_links(self, links):
-        if not links:
-            return "No potential link sources available."
-        formatted_links = []
-        for link in links:
-            formatted_links.append(f"- {link['url']} (H1: {link['h1']}, Similarity: {link['similarity']:.2f}, Cluster: {link['cluster']})")
-        return "\n".join(formatted_links)
\ No newline at end of file
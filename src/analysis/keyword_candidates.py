@@ -0,0 +1,21 @@
+import numpy as np
+from typing import Optional
+
+from config.settings import KEYWORD_CANDIDATES
+from src.utils.keyword_table import KeywordTable
+
+
+def score_keywords(keywords: KeywordTable, document_count: int) -> None:
+    # TF-IDF-like, but rewarding rather than penalising document frequency: a term most competitors
+    # use is a topic the brief should cover, while a term repeated on a single page is usually noise
+    tf = 1 + np.log(np.maximum(keywords['frequency'], 1))
+    keywords['score'] = tf * keywords['document_frequency'] / max(document_count, 1)
+
+
+def select_candidates(keywords: KeywordTable, document_count: int,
+                      limit: Optional[int] = KEYWORD_CANDIDATES) -> KeywordTable:
+    # First ranking stage: cheap lexical scoring picks the keywords worth embedding. Stopword-only
+    # n-grams were already dropped (for the job's language) when the page tables were built.
+    aggregated = keywords.aggregate()
+    score_keywords(aggregated, document_count)
+    return aggregated.top(limit, by=('score', 'frequency'))
@@ -1,53 +1,40 @@
-from openai import OpenAI
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
-from config.settings import OPENAI_API_KEY
-from tqdm import tqdm
-import time
+from src.analysis.embedding_service import EmbeddingService
 
 class KeywordDensityAnalyzer:
-    def __init__(self):
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
-        self.model = "text-embedding-3-large"
+    def __init__(self, embedding_service=None, fallback_service=None):
+        self.embedding_service = embedding_service or EmbeddingService()
+        # Used when the primary service fails, e.g. a LocalEmbeddingService while the API is down
+        self.fallback_service = fallback_service
+
+    @property
+    def model(self):
+        return self.embedding_service.model
 
     def get_embedding(self, text):
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                response = self.client.embeddings.create(
-                    input=text,
-                    model=self.model
-                )
-                return response.data[0].embedding
-            except Exception as e:
-                print(f"Error getting embedding for '{text}': {e}")
-                if attempt < max_retries - 1:
-                    print(f"Retrying in 5 seconds... (Attempt {attempt + 2}/{max_retries})")
-                    time.sleep(5)
-                else:
-                    print(f"Failed to get embedding for '{text}' after {max_retries} attempts.")
-                    return None
+        try:
+            return self.embedding_service.embed_one(text)
+        except Exception as e:
+            print(f"Failed to get embedding for '{text}': {e}")
+            return None
 
     def calculate_similarity(self, keywords, target_keyword):
         print(f"Calculating similarity for {len(keywords)} keywords...")
-        target_embedding = self.get_embedding(target_keyword)
-        if target_embedding is None:
-            raise ValueError(f"Failed to get embedding for target keyword: {target_keyword}")
-
-        keyword_embeddings = []
-        for keyword in tqdm(keywords, desc="Getting embeddings", unit="keyword"):
-            embedding = self.get_embedding(keyword)
-            if embedding is not None:
-                keyword_embeddings.append(embedding)
-            else:
-                print(f"Skipping keyword '{keyword}' due to embedding failure.")
+        try:
+            return self._similarity(self.embedding_service, keywords, target_keyword)
+        except Exception as e:
+            if self.fallback_service is None:
+                raise
+            print(f"Embedding service failed ({e}); using the local similarity model instead.")
+            return self._similarity(self.fallback_service, keywords, target_keyword)
 
-        if not keyword_embeddings:
-            raise ValueError("Failed to get embeddings for all keywords.")
-
-        # Convert to numpy arrays for cosine_similarity function
-        target_embedding = np.array(target_embedding).reshape(1, -1)
-        keyword_embeddings = np.array(keyword_embeddings)
+    @staticmethod
+    def _similarity(embedding_service, keywords, target_keyword):
+        embeddings = embedding_service.embed([target_keyword] + list(keywords), normalize=True)
+        target_embedding = embeddings[0]
+        if not target_embedding.any():
+            raise ValueError(f"Failed to get embedding for target keyword: {target_keyword}")
 
-        similarities = cosine_similarity(target_embedding, keyword_embeddings)[0]
-        return similarities
\ No newline at end of file
+        # Rows are unit length, so cosine similarity reduces to a dot product
+        similarities = embeddings[1:] @ target_embedding
+        return similarities
@@ -0,0 +1,118 @@
+import glob
+import os
+import threading
+from hashlib import sha1
+from typing import Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from config.settings import (
+    URL_DATABASES_DIR, LOCAL_SIMILARITY_MODEL_PATH, LOCAL_SIMILARITY_FEATURES, LOCAL_SIMILARITY_DIMENSIONS
+)
+
+
+def url_database_h1s() -> List[str]:
+    # Default training corpus: every H1 in the URL databases
+    import pandas as pd
+    texts = []
+    for path in sorted(glob.glob(os.path.join(URL_DATABASES_DIR, '*.csv'))):
+        h1s = pd.read_csv(path, usecols=lambda column: column == 'h1')
+        if 'h1' in h1s:
+            texts.extend(h1.strip() for h1 in h1s['h1'].dropna().astype(str) if h1.strip())
+    return list(dict.fromkeys(texts))
+
+
+class LocalEmbeddingService:
+    """In-process drop-in for EmbeddingService that needs no network.
+
+    Texts are hashed into character n-grams (which copes with typos, inflections and mixed
+    languages), weighted with TF-IDF and reduced with LSA (truncated SVD) to dense vectors.
+    The IDF weights and SVD basis are fitted once on a corpus and persisted with joblib.
+    """
+
+    cache = None
+
+    def __init__(self, model_path: str = LOCAL_SIMILARITY_MODEL_PATH, n_features: int = LOCAL_SIMILARITY_FEATURES,
+                 dimensions: int = LOCAL_SIMILARITY_DIMENSIONS, corpus: Optional[Iterable[str]] = None):
+        self.model_path = model_path
+        self.n_features = n_features
+        self.dimensions = dimensions
+        self._corpus = corpus
+        self._pipeline = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self) -> str:
+        self._ensure_loaded()
+        return f"local-lsa-{self._version}"
+
+    @property
+    def cache_model(self) -> str:
+        return self.model
+
+    def _ensure_loaded(self, fallback_texts: Sequence[str] = ()) -> None:
+        with self._lock:
+            if self._pipeline is not None:
+                return
+            if os.path.exists(self.model_path):
+                import joblib
+                self._pipeline, self._version = joblib.load(self.model_path)
+                return
+            corpus = list(self._corpus) if self._corpus is not None else url_database_h1s()
+            if len(corpus) >= 2:
+                print(f"Fitting local similarity model on {len(corpus)} texts...")
+                self._fit(corpus)
+                self._save()
+            else:
+                # Nothing to learn from yet; fit on the texts at hand so a single call is still comparable
+                print("No corpus for the local similarity model; fitting on the current texts only.")
+                self._fit([text for text in fallback_texts if text] or ['', ' '])
+
+    def _fit(self, texts: List[str]) -> None:
+        # scikit-learn is only imported once a local model is actually needed
+        from sklearn.decomposition import TruncatedSVD
+        from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
+        from sklearn.pipeline import make_pipeline
+
+        hashing = HashingVectorizer(analyzer='char_wb', ngram_range=(3, 5), n_features=self.n_features,
+                                    alternate_sign=False, norm=None, dtype=np.float32)
+        n_components = max(1, min(self.dimensions, len(texts) - 1))
+        svd = TruncatedSVD(n_components=n_components, random_state=0)
+        pipeline = make_pipeline(hashing, TfidfTransformer(sublinear_tf=True), svd)
+        pipeline.fit(texts)
+        # Halves the persisted basis and speeds up transform; the precision loss is irrelevant for ranking
+        svd.components_ = svd.components_.astype(np.float32)
+        self._pipeline = pipeline
+        self._version = sha1('\n'.join(texts).encode('utf-8') + str((self.n_features, n_components)).encode()).hexdigest()[:12]
+
+    def _save(self) -> None:
+        import joblib
+        os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
+        temporary_path = f"{self.model_path}.tmp"
+        joblib.dump((self._pipeline, self._version), temporary_path)
+        os.replace(temporary_path, self.model_path)
+
+    def fit(self, texts: Iterable[str]) -> 'LocalEmbeddingService':
+        # Refits and persists the model; indexes built with the old model are rebuilt on next load
+        texts = list(dict.fromkeys(text for text in texts if text))
+        with self._lock:
+            self._fit(texts)
+            self._save()
+        return self
+
+    def embed(self, texts: Sequence[str], normalize: bool = False) -> np.ndarray:
+        self._ensure_loaded(texts)
+        texts = list(texts)
+        matrix = np.zeros((len(texts), self._pipeline[-1].n_components), dtype=np.float32)
+        rows = [i for i, text in enumerate(texts) if text]
+        if rows:
+            matrix[rows] = self._pipeline.transform([texts[i] for i in rows])
+
+        if normalize:
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+    def embed_one(self, text: str, normalize: bool = False) -> np.ndarray:
+        return self.embed([text], normalize=normalize)[0]
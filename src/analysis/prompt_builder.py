@@ -0,0 +1,281 @@
+import json
+import re
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from config.settings import GPT_MODEL, PROMPT_MAX_TOKENS, HEADING_SIMILARITY_THRESHOLD
+from src.utils.token_counter import count_tokens
+
+_HEADING_NUMBERING = re.compile(r'^\s*(?:step\s+)?(?:\d+|[ivx]+)\s*[.):\-]\s*|^\s*\d+\s+', re.IGNORECASE)
+_NON_WORD = re.compile(r'[^\w\s]', re.UNICODE)
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_heading(text: str) -> str:
+    # "2. Best Website Builders!" and "best website builders" compare equal
+    text = _HEADING_NUMBERING.sub('', text.lower())
+    return _WHITESPACE.sub(' ', _NON_WORD.sub(' ', text)).strip()
+
+
+def _heading_level(tag: str) -> int:
+    return int(tag[1]) if len(tag) == 2 and tag[0].lower() == 'h' and tag[1].isdigit() else 7
+
+
+class PromptSection:
+    """A prompt input made of items that can be dropped one by one when the prompt is over budget.
+
+    Sections with a lower ``priority`` are shrunk first. Within a section, items with the lowest
+    ``weights`` go first, but never below ``min_items``. ``render`` turns the kept items back into text.
+    """
+
+    def __init__(self, name: str, items: Sequence, priority: int, weights: Optional[Sequence] = None,
+                 min_items: int = 0, render: Callable = '\n'.join, item_text: Callable = str):
+        self.name = name
+        self.items = list(items)
+        self.priority = priority
+        # By default earlier items matter more
+        self.weights = list(weights) if weights is not None else [-i for i in range(len(self.items))]
+        self.min_items = min_items
+        self.render_items = render
+        self.item_text = item_text
+        self.kept = list(range(len(self.items)))
+
+    def render(self) -> str:
+        return self.render_items([self.items[i] for i in self.kept]) if self.kept else ''
+
+
+class PromptBuilder:
+    """Compacts the brief's input data into prompt sections that fit a token budget.
+
+    Competitor headings are collapsed across pages in three passes: exact matches, matches after
+    normalization (case, punctuation, numbering), and, when an embedding service is available,
+    headings whose embeddings are at least ``similarity_threshold`` apart in cosine similarity.
+    """
+
+    def __init__(self, embedding_service=None, model: str = GPT_MODEL, max_tokens: int = PROMPT_MAX_TOKENS,
+                 similarity_threshold: float = HEADING_SIMILARITY_THRESHOLD):
+        self.embedding_service = embedding_service
+        self.model = model
+        self.max_tokens = max_tokens
+        self.similarity_threshold = similarity_threshold
+
+    def count(self, text: str) -> int:
+        return count_tokens(text, self.model) if text else 0
+
+    def dedupe_headings(self, detailed_analysis: List[dict], seen_headings: Sequence[str] = ()) -> List[dict]:
+        # Returns the first occurrence of every distinct heading, in page order, with the number of
+        # pages using it. Headings in `seen_headings` (e.g. the reference page's) are dropped entirely.
+        occurrences = []
+        for analysis in detailed_analysis:
+            for tag, heading_list in (analysis.get('headings') or {}).items():
+                for heading in heading_list or []:
+                    if heading and heading.strip():
+                        occurrences.append({'url': analysis['url'], 'tag': tag.lower(), 'text': heading.strip()})
+
+        seen = [normalize_heading(heading) for heading in seen_headings if heading]
+        keys = list(dict.fromkeys(seen + [normalize_heading(occurrence['text']) for occurrence in occurrences]))
+        canonical = self._merge_similar(keys)
+        seen = {canonical[key] for key in seen}
+
+        entries = {}
+        for occurrence in occurrences:
+            group = canonical[normalize_heading(occurrence['text'])]
+            if group in seen:
+                continue
+            entry = entries.get(group)
+            if entry is None:
+                entries[group] = dict(occurrence, urls={occurrence['url']})
+            else:
+                entry['urls'].add(occurrence['url'])
+                # Keep the most prominent level any page used for this heading
+                if _heading_level(occurrence['tag']) < _heading_level(entry['tag']):
+                    entry['tag'] = occurrence['tag']
+        return [dict(entry, pages=len(entry.pop('urls'))) for entry in entries.values()]
+
+    def _merge_similar(self, keys: List[str]) -> Dict[str, str]:
+        # Maps every normalized heading to the first heading of its near-duplicate group
+        canonical = {key: key for key in keys}
+        if self.embedding_service is None or len(keys) < 2:
+            return canonical
+        try:
+            vectors = self.embedding_service.embed([key or ' ' for key in keys], normalize=True)
+        except Exception as e:
+            print(f"Could not embed headings for deduplication ({e}); using exact matches only.")
+            return canonical
+
+        similarities = vectors @ vectors.T
+        assigned = np.zeros(len(keys), dtype=bool)
+        for i, key in enumerate(keys):
+            if assigned[i]:
+                continue
+            group = np.flatnonzero((similarities[i] >= self.similarity_threshold) & ~assigned)
+            assigned[group] = True
+            for j in group:
+                canonical[keys[j]] = key
+        return canonical
+
+    def build_sections(self, compiled_data: dict, top_keywords: List[str], potential_outlinks,
+                       reference_data=None) -> Dict[str, PromptSection]:
+        sections = {}
+        sections['content_summary'] = PromptSection(
+            'content_summary', str(compiled_data.get('content_summary') or '').splitlines(), priority=4, min_items=1
+        )
+        sections['top_competitors'] = PromptSection(
+            'top_competitors', compiled_data.get('top_competitors', []), priority=5, min_items=3,
+            render=lambda urls: str(list(urls))
+        )
+
+        reference_headings = []
+        if reference_data:
+            reference_headings = [
+                (tag, heading) for tag, heading_list in (reference_data.get('headings') or {}).items()
+                for heading in heading_list or []
+            ]
+            sections['reference_headings'] = PromptSection(
+                'reference_headings', reference_headings, priority=6,
+                weights=[(-_heading_level(tag), -i) for i, (tag, _) in enumerate(reference_headings)],
+                min_items=min(len(reference_headings), 10), render=self._render_reference_headings,
+                item_text=lambda item: f'"{item[1]}",'
+            )
+
+        # The reference page's own headings are already in the prompt, so leave them out of the outline
+        outline = self.dedupe_headings(
+            [analysis for analysis in compiled_data.get('detailed_analysis', [])
+             if not reference_data or analysis['url'] != reference_data['url']],
+            [heading for _, heading in reference_headings]
+        )
+        sections['content_outline'] = PromptSection(
+            'content_outline', outline, priority=1,
+            weights=[(entry['pages'], -_heading_level(entry['tag']), -i) for i, entry in enumerate(outline)],
+            min_items=min(len(outline), 5), render=self._render_outline, item_text=self._outline_line
+        )
+        sections['related_keywords'] = PromptSection(
+            'related_keywords', top_keywords, priority=3, min_items=min(len(top_keywords), 10), render=', '.join
+        )
+        if potential_outlinks:
+            sections['potential_outlinks'] = PromptSection(
+                'potential_outlinks', potential_outlinks, priority=2, min_items=min(len(potential_outlinks), 3),
+                render=self._format_links, item_text=lambda link: self._format_links([link])
+            )
+        return sections
+
+    def fit(self, sections: Dict[str, PromptSection], budget: int) -> None:
+        # Drops the least important items, lowest-priority sections first, until the sections fit `budget`
+        item_tokens = {
+            name: [self.count(section.item_text(item)) + 1 for item in section.items]
+            for name, section in sections.items()
+        }
+        excess = sum(sum(tokens) for tokens in item_tokens.values()) - budget
+        for section in sorted(sections.values(), key=lambda section: section.priority):
+            if excess <= 0:
+                break
+            droppable = sorted(section.kept, key=lambda i: section.weights[i])
+            droppable = droppable[:max(len(section.kept) - section.min_items, 0)]
+            dropped = set()
+            for i in droppable:
+                if excess <= 0:
+                    break
+                dropped.add(i)
+                excess -= item_tokens[section.name][i]
+            section.kept = [i for i in section.kept if i not in dropped]
+
+    def truncate(self, sections: Dict[str, PromptSection], texts: Dict[str, str], budget: int) -> Dict[str, str]:
+        # Cuts rendered section texts, lowest-priority sections first, until they fit `budget`.
+        # Needed when the items kept for min_items alone are over it, e.g. a very long content summary
+        texts = dict(texts)
+        excess = sum(self.count(text) for text in texts.values()) - budget
+        for section in sorted(sections.values(), key=lambda section: section.priority):
+            if excess <= 0:
+                break
+            text = texts[section.name]
+            tokens = self.count(text)
+            keep = max(tokens - excess, 0)
+            cut = text
+            while cut and self.count(cut) > keep:
+                cut = cut[:len(cut) * keep // self.count(cut)]
+            texts[section.name] = cut
+            excess -= tokens - self.count(cut)
+        return texts
+
+    def build(self, render_prompt: Callable[[Dict[str, str]], str], system_prompt: str, compiled_data: dict,
+              top_keywords: List[str], potential_outlinks, reference_data=None):
+        # `render_prompt` fills the prompt template from section texts. Returns the prompt and a
+        # report of tokens per section.
+        sections = self.build_sections(compiled_data, top_keywords, potential_outlinks, reference_data)
+        texts = {name: section.render() for name, section in sections.items()}
+        section_tokens = {name: self.count(text) for name, text in texts.items()}
+        full_tokens = self.count(render_prompt(texts))
+        overhead = full_tokens - sum(section_tokens.values()) + self.count(system_prompt)
+
+        if overhead + sum(section_tokens.values()) > self.max_tokens:
+            self.fit(sections, self.max_tokens - overhead)
+            texts = {name: section.render() for name, section in sections.items()}
+            section_tokens = {name: self.count(text) for name, text in texts.items()}
+            total = overhead + sum(section_tokens.values())
+            if total > self.max_tokens:
+                print(f"Warning: the prompt is still {total} tokens after trimming to the minimum items "
+                      f"(budget {self.max_tokens}); truncating sections to fit.")
+                budget = self.max_tokens - overhead
+                while True:
+                    texts = self.truncate(sections, texts, budget)
+                    # Tokens can merge across section boundaries, so the whole prompt is checked again
+                    over = self.count(render_prompt(texts)) + self.count(system_prompt) - self.max_tokens
+                    if over <= 0 or not any(texts.values()):
+                        break
+                    budget -= over
+                section_tokens = {name: self.count(text) for name, text in texts.items()}
+
+        prompt = render_prompt(texts)
+        report = {
+            'sections': dict(section_tokens, instructions=overhead),
+            'total_tokens': self.count(prompt) + self.count(system_prompt),
+            'budget': self.max_tokens,
+            'items': {name: (len(section.kept), len(section.items)) for name, section in sections.items()},
+            'headings': sum(len((analysis.get('headings') or {}).get(tag) or [])
+                            for analysis in compiled_data.get('detailed_analysis', [])
+                            for tag in (analysis.get('headings') or {}))
+        }
+        return prompt, report
+
+    @staticmethod
+    def print_report(report: dict) -> None:
+        print(f"Prompt: {report['total_tokens']} tokens (budget {report['budget']})")
+        for name, tokens in sorted(report['sections'].items(), key=lambda item: -item[1]):
+            kept = report['items'].get(name)
+            detail = f" ({kept[0]}/{kept[1]} items)" if kept else ""
+            print(f"  {name:<20} {tokens:6d}{detail}")
+        outline = report['items'].get('content_outline')
+        if outline:
+            print(f"  {report['headings']} competitor headings collapsed to {outline[1]} distinct, {outline[0]} kept")
+
+    @staticmethod
+    def _outline_line(entry: dict) -> str:
+        shared = f" ({entry['pages']} pages)" if entry['pages'] > 1 else ""
+        return f"{entry['tag'].upper()}: {entry['text']}{shared}"
+
+    def _render_outline(self, entries: List[dict]) -> str:
+        lines = []
+        current_url = None
+        for entry in entries:
+            if entry['url'] != current_url:
+                current_url = entry['url']
+                lines.append(f"URL: {current_url}")
+            lines.append(self._outline_line(entry))
+        return "\n".join(lines)
+
+    @staticmethod
+    def _render_reference_headings(items) -> str:
+        headings = {}
+        for tag, heading in items:
+            headings.setdefault(tag, []).append(heading)
+        return json.dumps(headings, indent=2)
+
+    @staticmethod
+    def _format_links(links) -> str:
+        if not links:
+            return "No potential link sources available."
+        formatted_links = []
+        for link in links:
+            formatted_links.append(f"- {link['url']} (H1: {link['h1']}, Similarity: {link['similarity']:.2f}, Cluster: {link['cluster']})")
+        return "\n".join(formatted_links)
@@ -0,0 +1,11 @@
+import random
+
+
+def backoff_delays(initial, maximum, factor=2.0, jitter=0.5):
+    # Exponential backoff; each delay is randomly shortened by up to `jitter` so
+    # threads that started together do not keep polling in lockstep
+    delay = initial
+    while True:
+        yield delay * (1 - jitter * random.random())
+        delay = min(delay * factor, maximum)
+
@@ -0,0 +1,30 @@
+import threading
+
+from config.settings import (
+    OPENAI_API_KEY, OPENAI_BASE_URL, DATAFORSEO_USERNAME, DATAFORSEO_PASSWORD, DATAFORSEO_DOMAIN
+)
+
+# Process-wide API clients, created (and their SDKs imported) on first use so startup stays fast
+# and every component shares one set of connections, caches and rate-limit state
+_lock = threading.Lock()
+_openai_client = None
+_dataforseo_client = None
+
+
+def get_openai_client():
+    global _openai_client
+    with _lock:
+        if _openai_client is None:
+            from openai import OpenAI
+            # Retries are handled by the shared rate limiter, not the SDK
+            _openai_client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL, max_retries=0)
+        return _openai_client
+
+
+def get_dataforseo_client():
+    global _dataforseo_client
+    with _lock:
+        if _dataforseo_client is None:
+            from src.api.rest_client import RestClient
+            _dataforseo_client = RestClient(DATAFORSEO_USERNAME, DATAFORSEO_PASSWORD, DATAFORSEO_DOMAIN)
+        return _dataforseo_client
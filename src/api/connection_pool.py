@@ -0,0 +1,134 @@
+import queue
+import threading
+import time
+from http.client import HTTPConnection, HTTPSConnection, HTTPException
+
+from config.settings import HTTP_POOL_SIZE, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT
+
+# Errors that mean a kept-alive socket was closed by the server while it sat idle
+STALE_CONNECTION_ERRORS = (HTTPException, ConnectionResetError, ConnectionAbortedError, BrokenPipeError)
+# Methods that can be sent again when the connection fails after the request was written
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ConnectionPool:
+    """Thread-safe pool of keep-alive HTTP(S) connections to a single host."""
+
+    def __init__(self, host, port=None, max_size=HTTP_POOL_SIZE, connect_timeout=HTTP_CONNECT_TIMEOUT,
+                 read_timeout=HTTP_READ_TIMEOUT, use_https=True):
+        self.host = host
+        self.port = port
+        self.max_size = max_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.connection_class = HTTPSConnection if use_https else HTTPConnection
+        # LIFO so the most recently used (least likely to be stale) connection is handed out first
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+        self.requests = 0
+        self.wait_time = 0.0
+
+    def _connect(self):
+        connection = self.connection_class(self.host, self.port, timeout=self.connect_timeout)
+        connection.connect()
+        connection.sock.settimeout(self.read_timeout)
+        with self._lock:
+            self.created += 1
+        return connection
+
+    def _acquire(self):
+        start = time.perf_counter()
+        self._slots.acquire()
+        with self._lock:
+            self.wait_time += time.perf_counter() - start
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                return self._connect(), False
+            except Exception:
+                self._release_slot()
+                raise
+        with self._lock:
+            self.reused += 1
+        return connection, True
+
+    def _release_slot(self):
+        with self._lock:
+            self.in_use -= 1
+        self._slots.release()
+
+    def _release(self, connection):
+        self._idle.put(connection)
+        self._release_slot()
+
+    def _discard(self, connection):
+        connection.close()
+        with self._lock:
+            self.discarded += 1
+        self._release_slot()
+
+    def request(self, method, path, body=None, headers=None):
+        with self._lock:
+            self.requests += 1
+        while True:
+            connection, reused = self._acquire()
+            sent = False
+            try:
+                connection.request(method, path, body=body, headers=headers or {})
+                sent = True
+                response = connection.getresponse()
+                data = response.read()
+            except STALE_CONNECTION_ERRORS:
+                self._discard(connection)
+                # The server dropped an idle keep-alive socket; retry on a fresh connection, unless the
+                # request may have reached it and is not safe to repeat (e.g. a paid task_post)
+                if reused and (not sent or method in IDEMPOTENT_METHODS):
+                    continue
+                raise
+            except Exception:
+                self._discard(connection)
+                raise
+
+            if response.will_close:
+                self._discard(connection)
+            else:
+                self._release(connection)
+            return response.status, response.headers, data
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def utilisation(self):
+        with self._lock:
+            acquisitions = self.created + self.reused
+            return {
+                'max_size': self.max_size,
+                'in_use': self.in_use,
+                'idle': self._idle.qsize(),
+                'peak_in_use': self.peak_in_use,
+                'requests': self.requests,
+                'connections_created': self.created,
+                'connections_reused': self.reused,
+                'connections_discarded': self.discarded,
+                'reuse_ratio': self.reused / acquisitions if acquisitions else 0.0,
+                'avg_wait_seconds': self.wait_time / acquisitions if acquisitions else 0.0
+            }
+
+    def report(self):
+        stats = self.utilisation()
+        print(f"Connection pool {self.host}: peak {stats['peak_in_use']}/{stats['max_size']} in use, "
+              f"{stats['requests']} requests over {stats['connections_created']} connections "
+              f"(reuse {stats['reuse_ratio']:.0%}, avg wait {stats['avg_wait_seconds'] * 1000:.1f} ms)")
@@ -1,8 +1,27 @@
+import logging
+import time
+from src.api.backoff import backoff_delays
+
+logger = logging.getLogger(__name__)
+
 class ContentSummaryFetcher:
     def __init__(self, client):
         self.client = client
 
-    def get_content_summary(self, task_id, prompt="Provide a summary of the SERP results", include_links=True, fetch_content=True, support_extra=False):
+    def get_content_summary(self, task_id, prompt="Provide a summary of the SERP results", include_links=True, fetch_content=True, support_extra=False, retries=4):
+        # The summary can lag slightly behind the SERP task, so retry briefly instead of sleeping up front
+        delays = backoff_delays(2, 10)
+        for attempt in range(retries):
+            items, retryable = self._request_summary(task_id, prompt, include_links, fetch_content, support_extra)
+            if items is not None or not retryable:
+                return items
+            if attempt < retries - 1:
+                delay = next(delays)
+                print(f"AI summary not ready yet. Retrying in {delay:.1f} seconds...")
+                time.sleep(delay)
+        return None
+
+    def _request_summary(self, task_id, prompt, include_links, fetch_content, support_extra):
         print("Step 2 - Creating AI summary....")
         post_data = {
             0: {
@@ -22,15 +41,17 @@ class ContentSummaryFetcher:
                 if "result" in task and task["result"]:
                     if isinstance(task["result"], list) and task["result"] and "items" in task["result"][0]:
                         print("AI summary created successfully.")
-                        return task["result"][0]["items"]
+                        return task["result"][0]["items"], False
                     else:
-                        print("Unexpected result structure. Full task result:", task["result"])
+                        print("Unexpected result structure in the AI summary task.")
+                        logger.debug("AI summary task result: %s", task["result"])
                 else:
                     print("Task result is empty or not available yet.")
+                    return None, True
             else:
                 print("No tasks found in the response.")
         else:
             print(f"Error fetching content summary. Code: {response['status_code']} Message: {response.get('status_message', 'Unknown error')}")
         
-        print("Full API response:", response)
-        return None
\ No newline at end of file
+        logger.debug("AI summary response: %s", response)
+        return None, False
\ No newline at end of file
@@ -0,0 +1,192 @@
+import re
+import threading
+import time
+from collections import defaultdict
+from email.utils import parsedate_to_datetime
+
+from config.settings import RATE_LIMITS, RATE_LIMIT_MAX_RETRIES
+from src.api.backoff import backoff_delays
+from src.utils.tracing import span
+
+
+class TokenBucket:
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount):
+        # Takes the tokens immediately (the balance may go negative) and returns how long the
+        # caller must wait before spending them, so concurrent callers queue up fairly
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= min(amount, self.capacity)
+            return max(0.0, -self.tokens / self.rate)
+
+
+_DURATION_PART = re.compile(r'([\d.]+)(ms|s|m|h)')
+_DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+
+def _parse_duration(value):
+    # OpenAI reports resets as e.g. "20ms", "1s" or "6m0s"
+    parts = _DURATION_PART.findall(value)
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts) if parts else None
+
+
+def parse_retry_after(headers):
+    if not headers:
+        return None
+    retry_after_ms = headers.get('retry-after-ms')
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+    retry_after = headers.get('retry-after')
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    resets = [_parse_duration(headers.get(name) or '') for name in ('x-ratelimit-reset-requests', 'x-ratelimit-reset-tokens')]
+    resets = [reset for reset in resets if reset is not None]
+    return max(resets) if resets else None
+
+
+class RateLimiter:
+    """Process-wide requests-per-minute / tokens-per-minute budgets keyed by provider and endpoint class.
+
+    When any caller hits a rate limit, ``penalize`` pauses the whole key until the provider's
+    reset time, so all threads wait once together instead of each retrying blindly.
+    """
+
+    def __init__(self, limits):
+        self.limits = limits
+        self._buckets = {}
+        self._blocked_until = defaultdict(float)
+        self._lock = threading.Lock()
+        self.waits = defaultdict(int)
+        self.wait_time = defaultdict(float)
+        self.rate_limited = defaultdict(int)
+
+    def _get_buckets(self, key):
+        with self._lock:
+            if key not in self._buckets:
+                limit = self.limits.get(key) or self.limits.get(key.split(':')[0] + ':default') or {}
+                self._buckets[key] = (
+                    TokenBucket(limit['rpm']) if limit.get('rpm') else None,
+                    TokenBucket(limit['tpm']) if limit.get('tpm') else None
+                )
+            return self._buckets[key]
+
+    def acquire(self, key, tokens=0):
+        request_bucket, token_bucket = self._get_buckets(key)
+        delay = request_bucket.reserve(1) if request_bucket else 0.0
+        if token_bucket and tokens:
+            delay = max(delay, token_bucket.reserve(tokens))
+        with self._lock:
+            delay = max(delay, self._blocked_until[key] - time.monotonic())
+            if delay > 0:
+                self.waits[key] += 1
+                self.wait_time[key] += delay
+        if delay > 0:
+            time.sleep(delay)
+
+    def penalize(self, key, retry_after):
+        with self._lock:
+            self.rate_limited[key] += 1
+            self._blocked_until[key] = max(self._blocked_until[key], time.monotonic() + retry_after)
+
+    def update_from_headers(self, key, headers):
+        # Pause proactively when the provider says the current window is exhausted
+        if not headers:
+            return
+        for remaining_header, reset_header in (('x-ratelimit-remaining-requests', 'x-ratelimit-reset-requests'),
+                                               ('x-ratelimit-remaining-tokens', 'x-ratelimit-reset-tokens')):
+            remaining = headers.get(remaining_header)
+            if remaining is not None and remaining.strip() == '0':
+                reset = _parse_duration(headers.get(reset_header) or '')
+                if reset:
+                    with self._lock:
+                        self._blocked_until[key] = max(self._blocked_until[key], time.monotonic() + reset)
+
+    def reset(self):
+        # Forgets buckets, pauses and counters, e.g. between benchmark runs
+        with self._lock:
+            self._buckets.clear()
+            self._blocked_until.clear()
+            self.waits.clear()
+            self.wait_time.clear()
+            self.rate_limited.clear()
+
+    def stats(self):
+        with self._lock:
+            keys = set(self.waits) | set(self.rate_limited)
+            return {
+                key: {
+                    'waits': self.waits[key],
+                    'wait_time': self.wait_time[key],
+                    'rate_limited': self.rate_limited[key]
+                }
+                for key in keys
+            }
+
+    def report(self):
+        for key, stats in sorted(self.stats().items()):
+            print(f"Rate limiter {key}: {stats['waits']} throttled calls ({stats['wait_time']:.1f}s waiting), "
+                  f"{stats['rate_limited']} rate-limit responses")
+
+
+rate_limiter = RateLimiter(RATE_LIMITS)
+
+
+def is_retryable(error):
+    # Connection failures, timeouts, rate limits and server errors; anything else (a bad request,
+    # or a bug such as a TypeError) fails at once. openai is imported here to keep startup light
+    import openai
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and (error.status_code == 429 or error.status_code >= 500)
+
+
+def call_openai(key, request, tokens=0, max_retries=RATE_LIMIT_MAX_RETRIES):
+    # `request` must return an OpenAI raw response (client.<resource>.with_raw_response.create(...))
+    # so rate-limit headers can be read on success as well as on failure
+    delays = backoff_delays(1, 60)
+    with span(key, 'openai') as call:
+        for attempt in range(max_retries + 1):
+            call.set(retries=attempt)
+            rate_limiter.acquire(key, tokens)
+            try:
+                raw_response = request()
+            except Exception as e:
+                status = getattr(e, 'status_code', None)
+                if attempt == max_retries or not is_retryable(e):
+                    raise
+                headers = getattr(getattr(e, 'response', None), 'headers', None)
+                delay = parse_retry_after(headers) or next(delays)
+                if status == 429:
+                    print(f"OpenAI rate limit hit on {key}. Pausing all {key} calls for {delay:.1f} seconds...")
+                    rate_limiter.penalize(key, delay)
+                else:
+                    print(f"OpenAI request on {key} failed ({e}). Retrying in {delay:.1f} seconds...")
+                    time.sleep(delay)
+                continue
+            rate_limiter.update_from_headers(key, raw_response.headers)
+            response = raw_response.parse()
+            # Streamed responses have no length or usage yet; BriefStream accounts for those
+            content_length = raw_response.headers.get('content-length')
+            if content_length:
+                call.set(response_bytes=int(content_length))
+            usage = getattr(response, 'usage', None)
+            if usage is not None:
+                call.set(prompt_tokens=usage.prompt_tokens, completion_tokens=getattr(usage, 'completion_tokens', None) or 0)
+            return response
@@ -0,0 +1,118 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from hashlib import sha256
+from typing import Optional, Tuple
+
+from config.settings import (
+    RESPONSE_CACHE_PATH, RESPONSE_CACHE_IGNORED_FIELDS, RESPONSE_CACHE_TTLS, RESPONSE_CACHE_STALE_WHILE_REVALIDATE,
+    RESPONSE_CACHE_PURGE_INTERVAL
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key BLOB PRIMARY KEY,
+    endpoint TEXT NOT NULL,
+    response TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_endpoint_created ON responses (endpoint, created);
+"""
+
+
+class ResponseCache:
+    """Persistent cache of individual DataForSEO task responses keyed on endpoint + normalized task body.
+
+    Fields that differ between otherwise identical requests (tags, task ids) are dropped from the
+    key, so e.g. on-page results are shared by every brief that crawls the same URL. Entries past
+    their endpoint's TTL and stale-while-revalidate window are purged when the cache is opened and
+    every ``purge_interval`` writes.
+    """
+
+    def __init__(self, path: str = RESPONSE_CACHE_PATH, ignored_fields=RESPONSE_CACHE_IGNORED_FIELDS,
+                 ttls=RESPONSE_CACHE_TTLS, stale_windows=RESPONSE_CACHE_STALE_WHILE_REVALIDATE,
+                 purge_interval: int = RESPONSE_CACHE_PURGE_INTERVAL):
+        self.path = path
+        self.ignored_fields = ignored_fields
+        self.ttls = ttls
+        self.stale_windows = stale_windows
+        self.purge_interval = purge_interval
+        self._puts = 0
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connection().executescript(_SCHEMA)
+        self.purge_expired()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def key(self, endpoint: str, task: dict) -> bytes:
+        ignored = set(self.ignored_fields.get('*', ())) | set(self.ignored_fields.get(endpoint, ()))
+        normalized = {name: value for name, value in task.items() if name not in ignored}
+        payload = json.dumps(normalized, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+        return sha256(f"{endpoint}\x00{payload}".encode('utf-8')).digest()
+
+    def get(self, endpoint: str, task: dict) -> Optional[Tuple[dict, float]]:
+        row = self._connection().execute(
+            "SELECT response, created FROM responses WHERE key = ?", (self.key(endpoint, task),)
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), time.time() - row[1]
+
+    def put(self, endpoint: str, task: dict, task_response: dict) -> None:
+        self._connection().execute(
+            "INSERT OR REPLACE INTO responses (key, endpoint, response, created) VALUES (?, ?, ?, ?)",
+            (self.key(endpoint, task), endpoint, json.dumps(task_response), time.time())
+        )
+        with self._stats_lock:
+            self._puts += 1
+            purge = self._puts % self.purge_interval == 0
+        if purge:
+            self.purge_expired()
+
+    def record(self, hit: bool, stale: bool = False) -> None:
+        with self._stats_lock:
+            if not hit:
+                self.misses += 1
+            elif stale:
+                self.stale_hits += 1
+            else:
+                self.hits += 1
+
+    def purge(self, max_age: float) -> int:
+        cursor = self._connection().execute("DELETE FROM responses WHERE created < ?", (time.time() - max_age,))
+        return cursor.rowcount
+
+    def purge_expired(self) -> int:
+        # Entries that can no longer be served, fresh or stale; endpoints without a TTL are never served
+        now = time.time()
+        connection = self._connection()
+        purged = 0
+        for endpoint, ttl in self.ttls.items():
+            max_age = ttl + self.stale_windows.get(endpoint, 0)
+            purged += connection.execute(
+                "DELETE FROM responses WHERE endpoint = ? AND created < ?", (endpoint, now - max_age)
+            ).rowcount
+        purged += connection.execute(
+            f"DELETE FROM responses WHERE endpoint NOT IN ({','.join('?' * len(self.ttls))})", list(self.ttls)
+        ).rowcount if self.ttls else 0
+        return purged
+
+    def report(self) -> None:
+        with self._stats_lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            hit_rate = (self.hits + self.stale_hits) / lookups if lookups else 0.0
+            print(f"Response cache: {self.hits} fresh hits, {self.stale_hits} stale hits, {self.misses} misses "
+                  f"(hit rate {hit_rate:.1%})")
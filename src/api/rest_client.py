@@ -1,27 +1,154 @@
-from http.client import HTTPSConnection
+import threading
 from base64 import b64encode
 from json import loads, dumps
+from config.settings import (
+    RATE_LIMIT_MAX_RETRIES, RESPONSE_CACHE_ENABLED, RESPONSE_CACHE_BYPASS,
+    RESPONSE_CACHE_TTLS, RESPONSE_CACHE_STALE_WHILE_REVALIDATE
+)
+from src.api.backoff import backoff_delays
+from src.api.connection_pool import ConnectionPool
+from src.api.rate_limiter import rate_limiter, parse_retry_after
+from src.api.response_cache import ResponseCache
+from src.utils.tracing import span, endpoint_name
+
+# DataForSEO status code for "rate limit per minute exceeded"
+RATE_LIMIT_STATUS_CODE = 40202
+
+def endpoint_class(path):
+    if path.startswith('/v3/serp/'):
+        return 'dataforseo:serp'
+    if path.startswith('/v3/on_page/'):
+        return 'dataforseo:on_page'
+    return 'dataforseo:default'
 
 class RestClient:
-    def __init__(self, username, password, domain):
+    def __init__(self, username, password, domain, pool=None, port=None, use_https=True,
+                 cache=None, bypass_cache=RESPONSE_CACHE_BYPASS):
         self.username = username
         self.password = password
         self.domain = domain
+        self.pool = pool or ConnectionPool(domain, port, use_https=use_https)
+        self.cache = cache if cache is not None else (ResponseCache() if RESPONSE_CACHE_ENABLED else None)
+        self.bypass_cache = bypass_cache
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        base64_bytes = b64encode(f"{self.username}:{self.password}".encode("ascii")).decode("ascii")
+        self.headers = {'Authorization': f'Basic {base64_bytes}', 'Content-Encoding': 'gzip'}
 
     def request(self, path, method, data=None):
-        connection = HTTPSConnection(self.domain)
-        try:
-            base64_bytes = b64encode(f"{self.username}:{self.password}".encode("ascii")).decode("ascii")
-            headers = {'Authorization': f'Basic {base64_bytes}', 'Content-Encoding': 'gzip'}
-            connection.request(method, path, headers=headers, body=data)
-            response = connection.getresponse()
-            return loads(response.read().decode())
-        finally:
-            connection.close()
+        key = endpoint_class(path)
+        delays = backoff_delays(1, 60)
+        with span(endpoint_name(path), 'dataforseo', method=method) as call:
+            for attempt in range(RATE_LIMIT_MAX_RETRIES + 1):
+                rate_limiter.acquire(key)
+                status, headers, body = self.pool.request(method, path, body=data, headers=self.headers)
+                response = loads(body.decode()) if body else {}
+                call.add('response_bytes', len(body or b''))
+                call.set(http_status=status, status_code=response.get('status_code'), retries=attempt)
+                rate_limited = status == 429 or response.get('status_code') == RATE_LIMIT_STATUS_CODE
+                if not rate_limited or attempt == RATE_LIMIT_MAX_RETRIES:
+                    call.set(cost=response.get('cost') or 0.0, tasks=response.get('tasks_count'))
+                    if response.get('status_code') != 20000:
+                        call.fail(f"{response.get('status_code')} {response.get('status_message')}")
+                    return response
+
+                delay = parse_retry_after(headers) or next(delays)
+                print(f"DataForSEO rate limit hit on {path}. Pausing all {key} calls for {delay:.1f} seconds...")
+                rate_limiter.penalize(key, delay)
+        return response
 
     def get(self, path):
         return self.request(path, 'GET')
 
-    def post(self, path, data):
+    def post(self, path, data, bypass_cache=False):
+        ttl = RESPONSE_CACHE_TTLS.get(path)
+        # Only a list or {index: task} dict of tasks can be cached task by task; anything else is sent as is
+        if self.cache is None or ttl is None or bypass_cache or self.bypass_cache or not isinstance(data, (list, dict)):
+            return self._post(path, data)
+
+        # Each task in the body is cached on its own, so a batch only sends the tasks that missed
+        tasks = list(data.values()) if isinstance(data, dict) else data
+        stale_window = RESPONSE_CACHE_STALE_WHILE_REVALIDATE.get(path, 0)
+        task_responses = [None] * len(tasks)
+        for i, task in enumerate(tasks):
+            cached = self.cache.get(path, task)
+            if cached is None or cached[1] > ttl + stale_window:
+                self.cache.record(hit=False)
+                continue
+            stale = cached[1] > ttl
+            self.cache.record(hit=True, stale=stale)
+            # Hand back this request's own task data (tags differ between requests)
+            task_responses[i] = dict(cached[0], data=task)
+            if stale:
+                self._refresh_in_background(path, task)
+
+        missing = [i for i, task_response in enumerate(task_responses) if task_response is None]
+        if missing:
+            response = self._post(path, [tasks[i] for i in missing])
+            if response.get('status_code') != 20000 and len(missing) == len(tasks):
+                return response
+            for i, task_response in zip(missing, self._match_tasks([tasks[i] for i in missing], response)):
+                if task_response is None:
+                    # Keeps every task at its position; callers see it as a failed task
+                    failed = response.get('status_code') != 20000
+                    task_response = {
+                        'status_code': response.get('status_code') if failed else 50000,
+                        'status_message': response.get('status_message') if failed else 'No response for this task.',
+                        'data': tasks[i],
+                        'result': None
+                    }
+                else:
+                    self._store(path, tasks[i], task_response)
+                task_responses[i] = task_response
+
+        return {
+            'status_code': 20000,
+            'status_message': 'Ok.',
+            'tasks_count': len(tasks),
+            'tasks': task_responses
+        }
+
+    def peek(self, path, task):
+        # Fresh cached task response, without a request; used to skip work that is already cached
+        ttl = RESPONSE_CACHE_TTLS.get(path)
+        if self.cache is None or ttl is None or self.bypass_cache:
+            return None
+        cached = self.cache.get(path, task)
+        return cached[0] if cached is not None and cached[1] <= ttl else None
+
+    def _post(self, path, data):
         data_str = dumps(data) if not isinstance(data, str) else data
-        return self.request(path, 'POST', data_str)
\ No newline at end of file
+        return self.request(path, 'POST', data_str)
+
+    @staticmethod
+    def _match_tasks(tasks, response):
+        returned = response.get('tasks') or []
+        by_tag = {(task.get('data') or {}).get('tag'): task for task in returned}
+        if all(task.get('tag') and task['tag'] in by_tag for task in tasks):
+            return [by_tag[task['tag']] for task in tasks]
+        # DataForSEO answers tasks in the order they were posted
+        return returned + [None] * (len(tasks) - len(returned))
+
+    def _store(self, path, task, task_response):
+        if task_response.get('status_code') == 20000 and task_response.get('result'):
+            self.cache.put(path, task, task_response)
+
+    def _refresh_in_background(self, path, task):
+        key = self.cache.key(path, task)
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                response = self._post(path, [task])
+                if response.get('status_code') == 20000 and response.get('tasks'):
+                    self._store(path, task, response['tasks'][0])
+            except Exception as e:
+                print(f"Background refresh of {path} failed: {e}")
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
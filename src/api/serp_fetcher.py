@@ -1,4 +1,5 @@
 from config.settings import MAX_RETRIES, RETRY_DELAY
+from src.api.backoff import backoff_delays
 import time
 
 class SerpFetcher:
@@ -15,15 +16,17 @@ class SerpFetcher:
                 "calculate_rectangles": True
             }
         }
-        
+
+        delays = backoff_delays(5, RETRY_DELAY)
         for attempt in range(MAX_RETRIES):
             response = self.client.post("/v3/serp/google/organic/live/advanced", post_data)
             if response["status_code"] == 20000:
                 print("SERP results fetched successfully.")
                 return response["tasks"][0]
             elif response["status_code"] == 40400:
-                print(f"Task not ready yet. Retrying in {RETRY_DELAY} seconds...")
-                time.sleep(RETRY_DELAY)
+                delay = next(delays)
+                print(f"Task not ready yet. Retrying in {delay:.1f} seconds...")
+                time.sleep(delay)
             else:
                 print(f"Error fetching SERP results. Code: {response['status_code']} Message: {response['status_message']}")
                 return None
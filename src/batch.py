@@ -0,0 +1,175 @@
+import argparse
+import csv
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the project root directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+from config.settings import LOCATION_CSV_PATH, LANGUAGE_CSV_PATH, BATCH_CONCURRENCY, RESPONSE_CACHE_BYPASS, LOG_LEVEL
+from src.utils.csv_handler import CSVHandler
+from src.brief_pipeline import BriefPipeline
+from src.analysis.gpt_brief_generator import file_sink
+from src.utils.keyword_table import KeywordTable
+
+class InvalidJob:
+    # An input line that could not be read as a job; it is written out as a failed record
+    def __init__(self, line_number, error):
+        self.line_number = line_number
+        self.error = error
+
+def read_jobs(path):
+    # Jobs are read lazily so the input file can be arbitrarily large
+    with open(path, 'r', encoding='utf-8') as file:
+        if path.endswith('.jsonl'):
+            for line_number, line in enumerate(file, 1):
+                if not line.strip():
+                    continue
+                try:
+                    raw_job = json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield InvalidJob(line_number, f"Invalid JSON on line {line_number}: {e}")
+                    continue
+                if isinstance(raw_job, dict):
+                    yield raw_job
+                else:
+                    yield InvalidJob(line_number, f"Line {line_number} is not a JSON object")
+        else:
+            for row in csv.DictReader(file):
+                yield row
+
+def parse_clusters(value):
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = [cluster.strip() for cluster in value.replace('|', ';').split(';')]
+    return {cluster for cluster in value if cluster} or None
+
+def parse_bool(value):
+    return value if isinstance(value, bool) else str(value).strip().lower() in ('1', 'true', 'y', 'yes')
+
+def build_job(raw_job, csv_handler):
+    if not raw_job.get('keyword'):
+        raise ValueError("Job has no keyword")
+    location_name, location_code = csv_handler.resolve('location', raw_job['location'])
+    language_name, language_code = csv_handler.resolve('language', raw_job['language'])
+    return {
+        'keyword': raw_job['keyword'].strip(),
+        'reference_url': (raw_job.get('reference_url') or '').strip() or None,
+        'location_code': location_code,
+        'language_code': language_code,
+        'language_name': language_name,
+        'database': (raw_job.get('database') or '').strip() or None,
+        'clusters': parse_clusters(raw_job.get('clusters')),
+        'hard_clustering': parse_bool(raw_job.get('hard_clustering', False))
+    }
+
+def brief_filename(job_id):
+    # Job ids come from the input file; keep them from naming a path outside the brief directory
+    name = re.sub(r'[^\w.-]', '_', str(job_id)).lstrip('.')
+    return f"{name or 'job'}.md"
+
+def json_default(value):
+    if isinstance(value, set):
+        return sorted(value)
+    if isinstance(value, KeywordTable):
+        return value.to_dict()
+    return str(value)
+
+class BatchRunner:
+    def __init__(self, pipeline, csv_handler, output_path, concurrency=BATCH_CONCURRENCY, brief_dir=None):
+        self.pipeline = pipeline
+        self.brief_dir = brief_dir
+        self.csv_handler = csv_handler
+        self.output_path = output_path
+        self.concurrency = concurrency
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._write_lock = threading.Lock()
+        self.completed = 0
+        self.failed = 0
+
+    def run_job(self, job_id, raw_job):
+        started = time.time()
+        record = {'id': job_id, 'job': raw_job}
+        try:
+            job = build_job(raw_job, self.csv_handler)
+            if self.brief_dir:
+                # Stream the brief to its own file so long generations can be followed live
+                with open(os.path.join(self.brief_dir, brief_filename(job_id)), 'w', encoding='utf-8') as brief_file:
+                    result = self.pipeline.run(job, brief_sink=file_sink(brief_file))
+            else:
+                result = self.pipeline.run(job)
+            record.update(result)
+            record['status'] = 'ok' if result['brief'] is not None else 'error'
+            if result['brief'] is None:
+                record['error'] = result['stage_report']['errors']
+        except Exception as e:
+            record['status'] = 'error'
+            record['error'] = str(e)
+        record['elapsed'] = time.time() - started
+        return record
+
+    def _write(self, output, record):
+        with self._write_lock:
+            output.write(json.dumps(record, ensure_ascii=False, default=json_default) + '\n')
+            output.flush()
+            if record['status'] == 'ok':
+                self.completed += 1
+            else:
+                self.failed += 1
+            print(f"[batch] job {record['id']} ({record['job'].get('keyword')}): {record['status']} in {record['elapsed']:.1f}s "
+                  f"- {self.completed} ok, {self.failed} failed")
+
+    def run(self, jobs):
+        with open(self.output_path, 'a', encoding='utf-8') as output, \
+                ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for job_id, raw_job in enumerate(jobs, 1):
+                # Block until a slot frees up, so at most `concurrency` jobs are ever held in memory
+                if isinstance(raw_job, InvalidJob):
+                    self._write(output, {'id': job_id, 'job': {}, 'line': raw_job.line_number, 'status': 'error',
+                                         'error': raw_job.error, 'elapsed': 0.0})
+                    continue
+                self._slots.acquire()
+                job_id = raw_job.get('id') or job_id
+                future = executor.submit(self.run_job, job_id, raw_job)
+                future.add_done_callback(lambda done: self._finish(output, done))
+        return self.completed, self.failed
+
+    def _finish(self, output, future):
+        try:
+            self._write(output, future.result())
+        finally:
+            self._slots.release()
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate briefs for every job in a CSV or JSONL file.")
+    parser.add_argument('input', help="CSV or JSONL with keyword, location, language and optional "
+                                      "reference_url, database, clusters (';'-separated in CSV), hard_clustering")
+    parser.add_argument('output', help="JSONL file that finished briefs are appended to")
+    parser.add_argument('--concurrency', type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument('--brief-dir', help="Also stream each brief to <brief-dir>/<job id>.md as it is generated")
+    parser.add_argument('--no-cache', action='store_true', help="Ignore cached DataForSEO responses and fetch everything fresh")
+    args = parser.parse_args()
+    logging.basicConfig(level=LOG_LEVEL, format='%(levelname)s %(name)s: %(message)s')
+
+    csv_handler = CSVHandler()
+    csv_handler.load_csv(LOCATION_CSV_PATH, 'location')
+    csv_handler.load_csv(LANGUAGE_CSV_PATH, 'language')
+
+    pipeline = BriefPipeline.from_settings(bypass_cache=args.no_cache or RESPONSE_CACHE_BYPASS)
+    if args.brief_dir:
+        os.makedirs(args.brief_dir, exist_ok=True)
+    runner = BatchRunner(pipeline, csv_handler, args.output, args.concurrency, args.brief_dir)
+    completed, failed = runner.run(read_jobs(args.input))
+    print(f"\nBatch finished: {completed} briefs written to {args.output}, {failed} failed.")
+    pipeline.print_resource_report()
+
+if __name__ == "__main__":
+    main()
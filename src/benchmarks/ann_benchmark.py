@@ -0,0 +1,47 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+
+# Add the project root directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+
+from config.settings import OPENAI_API_KEY, MAX_POTENTIAL_OUTLINKS, ANN_PARTITIONS
+from src.utils.url_similarity import URLSimilarityAnalyzer
+from src.utils.partitioned_index import PartitionedIndex
+
+def parse_partitions(value):
+    return value if value == 'cluster' else int(value)
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k versus latency of ANN outlink search against the exact scan.")
+    parser.add_argument('--db', help="Database name (defaults to every database)")
+    parser.add_argument('--k', type=int, default=MAX_POTENTIAL_OUTLINKS)
+    parser.add_argument('--probes', default='1,2,4,8,16', help="Comma-separated n_probe values to try")
+    parser.add_argument('--partitions', type=parse_partitions, default=ANN_PARTITIONS)
+    parser.add_argument('--queries', type=int, default=200, help="Number of database H1s sampled as queries")
+    args = parser.parse_args()
+
+    url_analyzer = URLSimilarityAnalyzer(OPENAI_API_KEY)
+    db_names = [args.db] if args.db else url_analyzer.get_available_databases()
+    probes = [int(p) for p in args.probes.split(',')]
+    rng = np.random.default_rng(0)
+
+    for db_name in db_names:
+        index = url_analyzer.get_index(db_name)
+        partitioned_index = PartitionedIndex(index, args.partitions).load()
+        # Database rows stand in for queries so the benchmark needs no extra embedding calls;
+        # each query's own row is excluded from the exact and ANN results so it cannot inflate recall
+        sample = np.sort(rng.choice(len(index), size=min(args.queries, len(index)), replace=False))
+        queries = np.asarray(index.matrix[sample])
+
+        print(f"\n{db_name}: {len(index)} rows, {partitioned_index.n_partitions} partitions, k={args.k}")
+        print(f"{'mode':<6} {'n_probe':>7} {'recall@k':>9} {'mean ms':>8} {'p95 ms':>8} {'scanned':>8}")
+        for row in partitioned_index.benchmark(queries, args.k, probes, sample.tolist()):
+            print(f"{row['mode']:<6} {row['n_probe']:>7} {row['recall_at_k']:>9.3f} "
+                  f"{row['mean_ms']:>8.3f} {row['p95_ms']:>8.3f} {row['scanned_fraction']:>8.1%}")
+
+if __name__ == "__main__":
+    main()
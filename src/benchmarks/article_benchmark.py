@@ -0,0 +1,91 @@
+import argparse
+import json
+import os
+import random
+import sys
+
+# Add the project root directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+
+from config.settings import ARTICLE_MAX_WORKERS, ARTICLE_SECTION_MAX_TOKENS, GPT_MODEL
+from src.analysis.article_generator import ArticleGenerator, parse_outline
+from src.api.rate_limiter import rate_limiter
+from src.benchmarks.fake_dataforseo import WORDS
+from src.benchmarks.fake_openai import FakeOpenAI
+from src.benchmarks.fake_server import Latency
+
+def sample_brief(sections, seed):
+    # A brief whose Content Structure has `sections` H2s with a few H3s each
+    rng = random.Random(seed)
+    lines = ["# SEO Content Brief: website builder", "", "## Content Structure",
+             f"H1: {' '.join(rng.sample(WORDS, 4)).capitalize()}"]
+    for _ in range(sections):
+        lines.append(f"H2: {' '.join(rng.sample(WORDS, 3)).capitalize()}")
+        lines.extend(f"  H3: {' '.join(rng.sample(WORDS, 3)).capitalize()}" for _ in range(rng.randint(1, 3)))
+    lines += ["", "## Key Points to Address", "- Point"]
+    return {'brief': '\n'.join(lines), 'keyword': 'website builder', 'top_keywords': rng.sample(WORDS, 15),
+            'potential_outlinks': [], 'language': 'English'}
+
+def load_brief(path):
+    # A Markdown brief, or the first finished brief in src/batch.py output
+    with open(path, 'r', encoding='utf-8') as file:
+        if not path.endswith('.jsonl'):
+            return {'brief': file.read(), 'keyword': os.path.splitext(os.path.basename(path))[0],
+                    'top_keywords': [], 'potential_outlinks': [], 'language': 'English'}
+        for line in file:
+            record = json.loads(line)
+            if record.get('brief'):
+                return {'brief': record['brief'], 'keyword': record['keyword'], 'top_keywords': record.get('top_keywords'),
+                        'potential_outlinks': record.get('potential_outlinks'),
+                        'language': (record.get('job') or {}).get('language', 'English')}
+    raise ValueError(f"No brief found in {path}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare section-parallel and single-call article generation against a local OpenAI stand-in.")
+    parser.add_argument('--brief', help="Markdown brief or batch output JSONL (default: a generated outline)")
+    parser.add_argument('--sections', type=int, default=8, help="H2 sections of the generated outline")
+    parser.add_argument('--workers', type=int, default=ARTICLE_MAX_WORKERS)
+    parser.add_argument('--section-tokens', type=int, default=ARTICLE_SECTION_MAX_TOKENS, help="Completion tokens per section")
+    parser.add_argument('--openai-latency', type=Latency.parse, default='lognormal:0.4:0.3',
+                        help="Per-request delay: fixed:S, uniform:MIN:MAX, lognormal:MEDIAN:SIGMA or exponential:MEAN")
+    parser.add_argument('--token-latency', type=Latency.parse, default='fixed:0.002', help="Generation time per token")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of requests that fail")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Also write the section-parallel article to this Markdown file")
+    args = parser.parse_args()
+
+    data = load_brief(args.brief) if args.brief else sample_brief(args.sections, args.seed)
+    n_sections = len(parse_outline(data['brief'])['sections'])
+    # Every completion runs to its max_tokens, so both modes write the same amount of text
+    fake = FakeOpenAI(latency=args.openai_latency, token_latency=args.token_latency, seed=args.seed,
+                      completion_tokens=args.section_tokens * (n_sections + 1), error_rate=args.error_rate,
+                      rate_limit_rate=args.rate_limit_rate).start()
+    from openai import OpenAI
+    generator = ArticleGenerator(OpenAI(api_key='benchmark', base_url=fake.base_url, max_retries=0),
+                                 max_workers=args.workers, section_max_tokens=args.section_tokens)
+    rate_limiter.reset()
+    random.seed(args.seed)
+    arguments = (data['brief'], data['keyword'], data['top_keywords'], data['potential_outlinks'], data['language'])
+    try:
+        single = generator.generate_single_call(*arguments)
+        article = generator.generate_article(*arguments)
+    finally:
+        fake.stop()
+
+    print(f"\n{n_sections} sections, {args.section_tokens} tokens each, {args.workers} workers, model {GPT_MODEL}")
+    print(f"  single call:     {single['wall_time']:6.1f}s  {len(single['text'].split()):6d} words")
+    print(f"  section-parallel:{article['wall_time']:6.1f}s  {len(article['text'].split()):6d} words")
+    print(f"  speedup:         {single['wall_time'] / article['wall_time']:6.1f}x")
+    ArticleGenerator.print_report(article)
+    requests = fake.stats().get('/v1/chat/completions', {})
+    print(f"  chat requests: {requests.get('calls', 0)} ({requests.get('errors', 0)} errors, "
+          f"{requests.get('rate_limited', 0)} rate limited)")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(article['text'])
+        print(f"Article written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+from hashlib import md5
+
+# Add the project root directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+
+from src.benchmarks.fake_server import FakeServer, Latency
+
+WORDS = [
+    "website", "builder", "design", "template", "domain", "hosting", "seo", "blog", "online", "store",
+    "business", "free", "create", "page", "guide", "best", "tips", "marketing", "content", "mobile",
+    "ecommerce", "portfolio", "logo", "brand", "small", "examples", "ideas", "step", "tools", "easy"
+]
+
+# Approximate price per task in USD, so cost accounting can be checked
+COSTS = {
+    '/v3/serp/google/organic/live/advanced': 0.002,
+    '/v3/serp/ai_summary': 0.001,
+    '/v3/on_page/instant_pages': 0.000125,
+    '/v3/on_page/task_post': 0.000125,
+}
+
+
+def _seeded(text):
+    return random.Random(int(md5(text.encode('utf-8')).hexdigest()[:8], 16))
+
+
+def _tasks_from_body(body):
+    return list(body.values()) if isinstance(body, dict) else list(body)
+
+
+class FakeDataForSEO(FakeServer):
+    """In-process stand-in for the DataForSEO endpoints used by this project.
+
+    On-page tasks become ready after a delay drawn from ``completion_time`` and every request
+    waits a delay drawn from ``latency`` (see ``Latency``), so readiness polling and concurrency
+    can be exercised without spending credits. Injected rate limits are answered with HTTP 429
+    and status 40202, injected errors with HTTP 500 and status 50000.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=(0.0, 0.0), completion_time=(1.0, 5.0), seed=None,
+                 error_rate=0.0, rate_limit_rate=0.0, retry_after=1.0, competitor_pool=1000):
+        super().__init__(host, port, latency, error_rate, rate_limit_rate, retry_after, seed)
+        self.completion_time = Latency.parse(completion_time)
+        # SERPs draw their URLs from this many pages; a small pool makes keywords share competitors
+        self.competitor_pool = competitor_pool
+        self.tasks = {}
+        self.routes = {
+            '/v3/serp/google/organic/live/advanced': self._serp,
+            '/v3/serp/ai_summary': self._ai_summary,
+            '/v3/on_page/instant_pages': self._instant_pages,
+            '/v3/on_page/task_post': self._task_post,
+            '/v3/on_page/tasks_ready': self._tasks_ready,
+            '/v3/on_page/summary': self._summary,
+            '/v3/on_page/keyword_density': self._keyword_density,
+        }
+
+    def _task_envelope(self, task_data, result, status_code=20000, status_message="Ok.", task_id=None):
+        return {
+            "id": task_id or str(uuid.uuid4()),
+            "status_code": status_code,
+            "status_message": status_message,
+            "cost": 0.0,
+            "data": task_data,
+            "result": result
+        }
+
+    def _response(self, tasks):
+        return {
+            "status_code": 20000,
+            "status_message": "Ok.",
+            "cost": sum(task["cost"] for task in tasks),
+            "tasks_count": len(tasks),
+            "tasks": tasks
+        }
+
+    def route(self, endpoint):
+        return '/v3/on_page/summary' if endpoint.startswith('/v3/on_page/summary/') else endpoint
+
+    def handle(self, method, route, path, body):
+        handler = self.routes.get(route)
+        if handler is None:
+            return 404, {"status_code": 40400, "status_message": "Not Found.", "tasks": []}, {}
+        tasks = handler(path.split('?')[0], body)
+        for task in tasks:
+            task["cost"] = COSTS.get(route, 0.0)
+        return 200, self._response(tasks), {}
+
+    def error_response(self):
+        return 500, {"status_code": 50000, "status_message": "Internal Error.", "tasks": []}, {}
+
+    def rate_limit_response(self):
+        return 429, {"status_code": 40202, "status_message": "Rate limit per minute exceeded.", "tasks": []}, \
+            {'Retry-After': f"{self.retry_after:g}"}
+
+    def _serp(self, path, body):
+        tasks = []
+        for task in _tasks_from_body(body):
+            rng = _seeded(task.get("keyword", ""))
+            pages = rng.sample(range(self.competitor_pool), min(10, self.competitor_pool))
+            items = [
+                {"type": "organic", "rank_group": i + 1, "url": f"https://competitor{page // 10}.example/{page % 10}"}
+                for i, page in enumerate(pages)
+            ]
+            tasks.append(self._task_envelope(task, [{"keyword": task.get("keyword"), "items": items}]))
+        return tasks
+
+    def _ai_summary(self, path, body):
+        return [
+            self._task_envelope(task, [{"items": [{"summary": f"Summary of SERP task {task.get('task_id')}."}]}])
+            for task in _tasks_from_body(body)
+        ]
+
+    def _instant_pages(self, path, body):
+        tasks = []
+        for task in _tasks_from_body(body):
+            url = task.get("url", "")
+            rng = _seeded(url)
+            htags = {
+                "h1": [" ".join(rng.sample(WORDS, 4)).capitalize()],
+                "h2": [" ".join(rng.sample(WORDS, 3)).capitalize() for _ in range(rng.randint(3, 8))]
+            }
+            item = {
+                "url": url,
+                "meta": {
+                    "htags": htags,
+                    "images_count": rng.randint(0, 30),
+                    "content": {"plain_text_word_count": rng.randint(500, 4000)}
+                }
+            }
+            tasks.append(self._task_envelope(task, [{"items": [item]}]))
+        return tasks
+
+    def _task_post(self, path, body):
+        tasks = []
+        for task in _tasks_from_body(body):
+            task_id = str(uuid.uuid4())
+            with self._lock:
+                self.tasks[task_id] = {
+                    "ready_at": time.monotonic() + self.completion_time.sample(self.random),
+                    "data": task
+                }
+            tasks.append(self._task_envelope(task, None, 20100, "Task Created.", task_id))
+        return tasks
+
+    def _is_ready(self, task_id):
+        with self._lock:
+            task = self.tasks.get(task_id)
+        return task is not None and time.monotonic() >= task["ready_at"]
+
+    def _tasks_ready(self, path, body):
+        with self._lock:
+            now = time.monotonic()
+            ready = [
+                {"id": task_id, "target": task["data"].get("target"), "tag": task["data"].get("tag")}
+                for task_id, task in self.tasks.items() if now >= task["ready_at"]
+            ]
+        return [self._task_envelope(None, ready)]
+
+    def _summary(self, path, body):
+        task_id = path.rsplit('/', 1)[-1]
+        if task_id not in self.tasks:
+            return [self._task_envelope(None, None, 40400, "Not Found.", task_id)]
+        progress = "finished" if self._is_ready(task_id) else "in_progress"
+        return [self._task_envelope(None, [{"crawl_progress": progress}], task_id=task_id)]
+
+    def _keyword_density(self, path, body):
+        tasks = []
+        for task in _tasks_from_body(body):
+            if not self._is_ready(task.get("id")):
+                tasks.append(self._task_envelope(task, None))
+                continue
+            length = task.get("keyword_length", 1)
+            rng = _seeded(f"{task.get('url')}|{length}")
+            items = [
+                {"keyword": " ".join(rng.sample(WORDS, length)), "frequency": rng.randint(6, 60), "density": rng.random() / 10}
+                for _ in range(rng.randint(5, 25))
+            ]
+            tasks.append(self._task_envelope(task, [{"items_count": len(items), "items": items}]))
+        return tasks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the DataForSEO API.")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=Latency.parse, default='uniform:0.05:0.3',
+                        help="Per-request delay: fixed:S, uniform:MIN:MAX, lognormal:MEDIAN:SIGMA or exponential:MEAN")
+    parser.add_argument('--completion-time', type=Latency.parse, default='uniform:3:40',
+                        help="Time until an on-page task is ready, same format as --latency")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of requests answered with an error")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="Share of requests answered with HTTP 429")
+    parser.add_argument('--competitor-pool', type=int, default=1000, help="Distinct pages SERP results are drawn from")
+    args = parser.parse_args()
+
+    fake = FakeDataForSEO(port=args.port, latency=args.latency, completion_time=args.completion_time,
+                          error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+                          competitor_pool=args.competitor_pool)
+    print(f"Fake DataForSEO listening on http://{fake.host}:{fake.port}")
+    try:
+        fake.httpd.serve_forever()
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import argparse
+import base64
+import json
+import os
+import random
+import re
+import sys
+import time
+import uuid
+from functools import lru_cache
+from hashlib import md5
+
+import numpy as np
+
+# Add the project root directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+
+from src.benchmarks.fake_server import FakeServer, Latency
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+@lru_cache(maxsize=65536)
+def _word_vector(word, dimensions):
+    seed = int(md5(word.encode('utf-8')).hexdigest()[:8], 16)
+    return np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+
+
+def fake_embedding(text, dimensions):
+    # Sum of per-word random vectors: texts sharing words get similar embeddings, so ranking still means something
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for word in _WORD.findall(text.lower()):
+        vector += _word_vector(word, dimensions)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else _word_vector(text, dimensions)
+
+
+class FakeOpenAI(FakeServer):
+    """In-process stand-in for the OpenAI embeddings and chat completions endpoints.
+
+    Chat completions generate ``completion_tokens`` tokens (fewer if ``max_tokens`` is lower), each
+    taking a delay drawn from ``token_latency``; with ``stream=True`` they are sent as chunks, so
+    time-to-first-token and streaming sinks can be measured.
+    Injected rate limits are answered with HTTP 429 and a ``retry-after-ms`` header.
+    Point a client at it with ``OpenAI(base_url=fake.base_url, api_key=...)``.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, token_latency=0.0, completion_tokens=300,
+                 dimensions=256, seed=None, error_rate=0.0, rate_limit_rate=0.0, retry_after=1.0):
+        super().__init__(host, port, latency, error_rate, rate_limit_rate, retry_after, seed)
+        self.token_latency = Latency.parse(token_latency)
+        self.completion_tokens = completion_tokens
+        self.dimensions = dimensions
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}/v1"
+
+    def handle(self, method, route, path, body):
+        if route == '/v1/embeddings':
+            return 200, self._embeddings(body), {}
+        if route == '/v1/chat/completions':
+            if body.get('stream'):
+                return 200, self._chat_stream(body), {}
+            return 200, self._chat(body), {}
+        return 404, {"error": {"message": f"Unknown route {route}", "type": "invalid_request_error", "code": None}}, {}
+
+    def error_response(self):
+        return 500, {"error": {"message": "The server had an error while processing your request.",
+                               "type": "server_error", "code": None}}, {}
+
+    def rate_limit_response(self):
+        return 429, {"error": {"message": "Rate limit reached.", "type": "requests", "code": "rate_limit_exceeded"}}, \
+            {'retry-after-ms': str(int(self.retry_after * 1000))}
+
+    def _embeddings(self, body):
+        texts = body['input'] if isinstance(body['input'], list) else [body['input']]
+        dimensions = body.get('dimensions') or self.dimensions
+        data = []
+        for i, text in enumerate(texts):
+            vector = fake_embedding(text, dimensions)
+            if body.get('encoding_format') == 'base64':
+                embedding = base64.b64encode(vector.astype('<f4').tobytes()).decode('ascii')
+            else:
+                embedding = vector.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+        tokens = sum(len(_WORD.findall(text)) for text in texts)
+        return {"object": "list", "data": data, "model": body.get('model'),
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens}}
+
+    def _completion_length(self, body):
+        # Like a real model, a completion stops at max_tokens
+        limit = body.get('max_tokens') or body.get('max_completion_tokens')
+        return min(self.completion_tokens, limit) if limit else self.completion_tokens
+
+    def _finish_reason(self, body):
+        return 'length' if self._completion_length(body) < self.completion_tokens else 'stop'
+
+    def _completion_words(self, body):
+        # A deterministic markdown "brief" built from the prompt's own words
+        prompt = ' '.join(message.get('content') or '' for message in body.get('messages', []))
+        rng = random.Random(int(md5(prompt.encode('utf-8')).hexdigest()[:8], 16))
+        vocabulary = _WORD.findall(prompt) or ['brief']
+        words = []
+        for i in range(self._completion_length(body)):
+            if i % 40 == 0:
+                words.append(f"\n\n## {rng.choice(vocabulary).capitalize()}\n")
+            words.append(rng.choice(vocabulary) + ' ')
+        return words
+
+    def _usage(self, body):
+        prompt_tokens = sum(len(_WORD.findall(message.get('content') or '')) for message in body.get('messages', []))
+        completion_tokens = self._completion_length(body)
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens}
+
+    def _chat(self, body):
+        words = self._completion_words(body)
+        # Without streaming the whole generation time passes before the response is sent
+        time.sleep(sum(self.sample(self.token_latency) for _ in words))
+        text = ''.join(words)
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}", "object": "chat.completion", "created": int(time.time()),
+            "model": body.get('model'),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text},
+                         "finish_reason": self._finish_reason(body)}],
+            "usage": self._usage(body)
+        }
+
+    def _chat_stream(self, body):
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+
+        def event(delta, finish_reason=None):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": body.get('model'),
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+            return f"data: {json.dumps(chunk)}\n\n"
+
+        yield event({"role": "assistant", "content": ""})
+        for word in self._completion_words(body):
+            time.sleep(self.sample(self.token_latency))
+            yield event({"content": word})
+        yield event({}, self._finish_reason(body))
+        if (body.get('stream_options') or {}).get('include_usage'):
+            usage = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": body.get('model'),
+                     "choices": [], "usage": self._usage(body)}
+            yield f"data: {json.dumps(usage)}\n\n"
+        yield "data: [DONE]\n\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the OpenAI embeddings and chat APIs.")
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--latency', type=Latency.parse, default='lognormal:0.2:0.5',
+                        help="Per-request delay: fixed:S, uniform:MIN:MAX, lognormal:MEDIAN:SIGMA or exponential:MEAN")
+    parser.add_argument('--token-latency', type=Latency.parse, default='fixed:0.01',
+                        help="Delay between streamed chat chunks, same format as --latency")
+    parser.add_argument('--completion-tokens', type=int, default=300)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of requests answered with HTTP 500")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="Share of requests answered with HTTP 429")
+    args = parser.parse_args()
+
+    fake = FakeOpenAI(port=args.port, latency=args.latency, token_latency=args.token_latency,
+                      completion_tokens=args.completion_tokens, error_rate=args.error_rate,
+                      rate_limit_rate=args.rate_limit_rate)
+    print(f"Fake OpenAI listening on {fake.base_url} (set OPENAI_BASE_URL to use it)")
+    try:
+        fake.httpd.serve_forever()
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import json
+import math
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class Latency:
+    """Random delay in seconds drawn from a named distribution.
+
+    Parsed from ``fixed:S``, ``uniform:MIN:MAX``, ``lognormal:MEDIAN:SIGMA`` or ``exponential:MEAN``;
+    a plain number is a fixed delay and a (min, max) pair is uniform. Heavy-tailed distributions
+    such as lognormal are closer to real API latencies than uniform ones.
+    """
+
+    KINDS = {'fixed': 1, 'uniform': 2, 'lognormal': 2, 'exponential': 1}
+
+    def __init__(self, kind='fixed', *params):
+        if kind not in self.KINDS or len(params) != self.KINDS[kind]:
+            raise ValueError(f"Invalid latency {kind}{params}; expected one of {self.KINDS}")
+        self.kind = kind
+        self.params = tuple(float(param) for param in params)
+
+    @classmethod
+    def parse(cls, spec):
+        if isinstance(spec, Latency):
+            return spec
+        if isinstance(spec, (int, float)):
+            return cls('fixed', spec)
+        if isinstance(spec, (tuple, list)):
+            return cls('uniform', *spec)
+        kind, *params = spec.split(':')
+        if not params:
+            return cls('fixed', kind)
+        return cls(kind, *params)
+
+    def sample(self, rng):
+        if self.kind == 'fixed':
+            return self.params[0]
+        if self.kind == 'uniform':
+            return rng.uniform(*self.params)
+        if self.kind == 'lognormal':
+            median, sigma = self.params
+            return rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+        mean = self.params[0]
+        return rng.expovariate(1 / mean) if mean > 0 else 0.0
+
+    def __str__(self):
+        return ':'.join([self.kind] + [f"{param:g}" for param in self.params])
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, payload, status=200, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, events, status=200, headers=None):
+        # Server-sent events over chunked transfer encoding; each event is written as soon as it is produced
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        for event in events:
+            data = event.encode('utf-8')
+            self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _handle(self, method):
+        fake = self.server.fake
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'null') if length else None
+        status, payload, headers = fake.dispatch(method, self.path, body)
+        if isinstance(payload, dict):
+            self._send(payload, status, headers)
+        else:
+            self._stream(payload, status, headers)
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+
+class FakeServer:
+    """Threaded local HTTP server base for the API stand-ins used by the benchmarks.
+
+    Every request waits a delay drawn from ``latency``. A share of requests given by
+    ``rate_limit_rate`` is answered with a rate-limit response, and a share given by
+    ``error_rate`` with a server error. Calls, injected errors and rate limits are counted per route.
+    Subclasses implement ``route``, ``handle``, ``error_response`` and ``rate_limit_response``.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, error_rate=0.0, rate_limit_rate=0.0,
+                 retry_after=1.0, seed=None):
+        self.latency = Latency.parse(latency)
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.calls = Counter()
+        self.errors = Counter()
+        self.rate_limited = Counter()
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.fake = self
+        self._thread = None
+
+    @property
+    def host(self):
+        return self.httpd.server_address[0]
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def sample(self, latency):
+        with self._lock:
+            return latency.sample(self.random)
+
+    def reset_stats(self):
+        with self._lock:
+            self.calls.clear()
+            self.errors.clear()
+            self.rate_limited.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                route: {'calls': self.calls[route], 'errors': self.errors[route], 'rate_limited': self.rate_limited[route]}
+                for route in sorted(self.calls)
+            }
+
+    def dispatch(self, method, path, body):
+        route = self.route(path.split('?')[0])
+        with self._lock:
+            self.calls[route] += 1
+            fault = self.random.random()
+        time.sleep(self.sample(self.latency))
+
+        if fault < self.rate_limit_rate:
+            with self._lock:
+                self.rate_limited[route] += 1
+            return self.rate_limit_response()
+        if fault < self.rate_limit_rate + self.error_rate:
+            with self._lock:
+                self.errors[route] += 1
+            return self.error_response()
+        return self.handle(method, route, path, body)
+
+    def route(self, endpoint):
+        return endpoint
+
+    def handle(self, method, route, path, body):
+        raise NotImplementedError
+
+    def error_response(self):
+        raise NotImplementedError
+
+    def rate_limit_response(self):
+        raise NotImplementedError
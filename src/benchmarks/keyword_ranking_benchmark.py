@@ -0,0 +1,61 @@
+import argparse
+import json
+import os
+import sys
+
+# Add the project root directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+
+from config.settings import TOP_KEYWORDS_COUNT
+from src.analysis.keyword_candidates import select_candidates
+from src.analysis.keyword_density_analyzer import KeywordDensityAnalyzer
+from src.utils.keyword_table import KeywordTable
+
+def rank(analyzer, candidates, target_keyword, k):
+    similarities = analyzer.calculate_similarity([kw['keyword'] for kw in candidates], target_keyword)
+    ranked = sorted(zip(candidates, similarities), key=lambda item: (item[1], item[0]['frequency']), reverse=True)
+    return [kw['keyword'] for kw, _ in ranked[:k]]
+
+def main():
+    parser = argparse.ArgumentParser(description="Overlap of the two-stage keyword ranking with embedding every keyword.")
+    parser.add_argument('briefs', help="JSONL written by src/batch.py (uses each record's compiled_data)")
+    parser.add_argument('--k', type=int, default=TOP_KEYWORDS_COUNT)
+    parser.add_argument('--limits', default='50,100,200,400', help="Comma-separated candidate counts to try")
+    args = parser.parse_args()
+
+    analyzer = KeywordDensityAnalyzer()
+    limits = [int(limit) for limit in args.limits.split(',')]
+    totals = {limit: [0.0, 0] for limit in limits}
+    briefs = 0
+    all_embedded = 0
+
+    with open(args.briefs, 'r', encoding='utf-8') as file:
+        for line in file:
+            record = json.loads(line)
+            if record.get('status') != 'ok':
+                continue
+            compiled_data = record['compiled_data']
+            keyword = record['keyword']
+            everything = select_candidates(KeywordTable.from_dict(compiled_data['keywords']),
+                                           len(compiled_data['detailed_analysis']), limit=None).records()
+            exact = set(rank(analyzer, everything, keyword, args.k))
+            briefs += 1
+            all_embedded += len(everything)
+            for limit in limits:
+                candidates = everything[:limit]
+                overlap = len(exact & set(rank(analyzer, candidates, keyword, args.k))) / max(len(exact), 1)
+                totals[limit][0] += overlap
+                totals[limit][1] += len(candidates)
+
+    if not briefs:
+        print("No successful briefs found.")
+        return
+    print(f"{briefs} briefs, {all_embedded / briefs:.0f} keywords embedded per brief without prefiltering")
+    print(f"{'candidates':>10} {'overlap@k':>10} {'embedded':>9}")
+    for limit in limits:
+        overlap, embedded = totals[limit]
+        print(f"{limit:>10} {overlap / briefs:>10.3f} {embedded / briefs:>9.0f}")
+
+if __name__ == "__main__":
+    main()
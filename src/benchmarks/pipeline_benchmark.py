@@ -0,0 +1,215 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+
+import numpy as np
+
+# Add the project root directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+
+from config.settings import BATCH_CONCURRENCY
+from src.api.connection_pool import ConnectionPool
+from src.api.rate_limiter import rate_limiter
+from src.api.response_cache import ResponseCache
+from src.api.rest_client import RestClient
+from src.api.serp_fetcher import SerpFetcher
+from src.api.content_summary_fetcher import ContentSummaryFetcher
+from src.analysis.embedding_service import EmbeddingService
+from src.analysis.gpt_brief_generator import GPTBriefGenerator
+from src.analysis.keyword_density_analyzer import KeywordDensityAnalyzer
+from src.analysis.prompt_builder import PromptBuilder
+from src.benchmarks.fake_dataforseo import FakeDataForSEO, WORDS
+from src.benchmarks.fake_openai import FakeOpenAI
+from src.benchmarks.fake_server import Latency
+from src.brief_pipeline import BriefPipeline
+from src.utils.embedding_cache import EmbeddingCache
+from src.utils.run_store import RunStore
+from src.utils.url_analysis_store import URLAnalysisStore
+from src.utils.url_processor import URLProcessor
+
+PERCENTILES = (50, 90, 99)
+
+def make_jobs(count):
+    keywords = [f"{WORDS[i % len(WORDS)]} {WORDS[(i * 7 + 3) % len(WORDS)]}" for i in range(count)]
+    return [
+        {'keyword': keyword, 'location_code': 2840, 'language_code': 'en', 'language_name': 'English'}
+        for keyword in keywords
+    ]
+
+def build_pipeline(dataforseo, openai_fake, max_workers, cache_dir, share_analyses=True):
+    # Same components as BriefPipeline.from_settings, pointed at the fakes with empty caches
+    from openai import OpenAI
+    client = RestClient('benchmark', 'benchmark', dataforseo.host,
+                        pool=ConnectionPool(dataforseo.host, dataforseo.port, use_https=False),
+                        cache=ResponseCache(os.path.join(cache_dir, 'responses.sqlite3')))
+    openai_client = OpenAI(api_key='benchmark', base_url=openai_fake.base_url, max_retries=0)
+    embedding_service = EmbeddingService(client=openai_client, cache=EmbeddingCache(os.path.join(cache_dir, 'embeddings.sqlite3')))
+    return BriefPipeline(
+        SerpFetcher(client),
+        ContentSummaryFetcher(client),
+        URLProcessor(client, 'benchmark', 'benchmark', max_workers=max_workers,
+                     analysis_store=URLAnalysisStore() if share_analyses else None),
+        KeywordDensityAnalyzer(embedding_service),
+        GPTBriefGenerator(PromptBuilder(embedding_service), client=openai_client),
+        # Traces and metrics stay in the temporary directory instead of replacing the production ones
+        trace_dir=os.path.join(cache_dir, 'traces'),
+        metrics_path=os.path.join(cache_dir, 'metrics', 'brief_gen.prom')
+    )
+
+def percentiles(values):
+    if not values:
+        return {}
+    return {f"p{q}": float(np.percentile(values, q)) for q in PERCENTILES}
+
+def run_jobs(pipeline, jobs, concurrency, verbose, runs_dir):
+    def run_job(job):
+        started = time.perf_counter()
+        try:
+            # Checkpoints are written as in production, but into the run's temporary directory
+            result = pipeline.run(job, store=RunStore.create(job, root=runs_dir))
+        except Exception as e:
+            return {'status': 'error', 'error': str(e), 'elapsed': time.perf_counter() - started}
+        return {
+            'status': 'ok' if result['brief'] is not None else 'error',
+            'elapsed': time.perf_counter() - started,
+            'stage_times': result['stage_report']['stage_times'],
+            'time_to_first_token': (result['brief_timings'] or {}).get('time_to_first_token')
+        }
+
+    with open(os.devnull, 'w') as devnull, redirect_stdout(sys.stdout if verbose else devnull), \
+            ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(run_job, jobs))
+
+def benchmark(args, max_workers, jobs):
+    dataforseo = FakeDataForSEO(latency=args.dataforseo_latency, completion_time=args.completion_time, seed=args.seed,
+                                error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+                                competitor_pool=args.competitor_pool).start()
+    openai_fake = FakeOpenAI(latency=args.openai_latency, token_latency=args.token_latency, seed=args.seed,
+                             completion_tokens=args.completion_tokens, error_rate=args.error_rate,
+                             rate_limit_rate=args.rate_limit_rate).start()
+    rate_limiter.reset()
+    # Poll backoff jitter uses the global generator; seeding it keeps runs comparable
+    random.seed(args.seed)
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            pipeline = build_pipeline(dataforseo, openai_fake, max_workers, cache_dir, not args.no_sharing)
+            started = time.perf_counter()
+            records = run_jobs(pipeline, jobs, args.concurrency, args.verbose, cache_dir)
+            wall_time = time.perf_counter() - started
+            pool = pipeline.url_processor.client.pool.utilisation()
+            store = pipeline.url_processor.analysis_store
+    finally:
+        dataforseo.stop()
+        openai_fake.stop()
+
+    stage_times = defaultdict(list)
+    for record in records:
+        for name, seconds in (record.get('stage_times') or {}).items():
+            stage_times[name].append(seconds)
+    ok = sum(record['status'] == 'ok' for record in records)
+    return {
+        'max_workers': max_workers,
+        'jobs': len(records),
+        'ok': ok,
+        'wall_time': wall_time,
+        'briefs_per_minute': 60 * ok / wall_time if wall_time else 0.0,
+        'stages': {name: percentiles(times) for name, times in stage_times.items()},
+        'job_time': percentiles([record['elapsed'] for record in records]),
+        'time_to_first_token': percentiles([record['time_to_first_token'] for record in records
+                                            if record.get('time_to_first_token') is not None]),
+        'api': {'dataforseo': dataforseo.stats(), 'openai': openai_fake.stats()},
+        'connection_pool': pool,
+        'rate_limiter': rate_limiter.stats(),
+        'url_analyses': store.stats() if store is not None else None
+    }
+
+def print_run(run, baseline=None):
+    print(f"\nMAX_WORKERS={run['max_workers']}: {run['ok']}/{run['jobs']} briefs in {run['wall_time']:.1f}s "
+          f"({run['briefs_per_minute']:.1f} briefs/min)")
+    header = ''.join(f"{f'p{q}':>9}" for q in PERCENTILES)
+    print(f"  {'stage':<20}{header}" + (f"{'p50 vs base':>13}" if baseline else ''))
+    rows = list(run['stages'].items()) + [('job', run['job_time']), ('first token', run['time_to_first_token'])]
+    base_rows = dict(baseline['stages'], job=baseline['job_time'], **{'first token': baseline['time_to_first_token']}) \
+        if baseline else {}
+    for name, stats in rows:
+        if not stats:
+            continue
+        line = f"  {name:<20}" + ''.join(f"{stats[f'p{q}']:8.2f}s" for q in PERCENTILES)
+        base = base_rows.get(name)
+        if base and base.get('p50'):
+            line += f"{(stats['p50'] / base['p50'] - 1):+12.0%}"
+        print(line)
+    for api, routes in run['api'].items():
+        calls = sum(route['calls'] for route in routes.values())
+        errors = sum(route['errors'] for route in routes.values())
+        limited = sum(route['rate_limited'] for route in routes.values())
+        print(f"  {api} calls: {calls} ({errors} errors, {limited} rate limited)")
+        for route, stats in routes.items():
+            print(f"    {route:<40} {stats['calls']:6d}")
+    analyses = run.get('url_analyses')
+    if analyses:
+        print(f"  URL analyses: {analyses['requested']} requested, {analyses['analysed']} crawled "
+              f"(dedup {analyses['dedup_ratio']:.1%})")
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=project_root,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark against local stand-in DataForSEO and OpenAI servers.")
+    parser.add_argument('--workers', default='1,5,10', help="Comma-separated MAX_WORKERS values to compare")
+    parser.add_argument('--jobs', type=int, default=8, help="Briefs per MAX_WORKERS value")
+    parser.add_argument('--concurrency', type=int, default=BATCH_CONCURRENCY, help="Briefs run at once")
+    parser.add_argument('--dataforseo-latency', type=Latency.parse, default='lognormal:0.15:0.5',
+                        help="Per-request delay: fixed:S, uniform:MIN:MAX, lognormal:MEDIAN:SIGMA or exponential:MEAN")
+    parser.add_argument('--completion-time', type=Latency.parse, default='uniform:1:6',
+                        help="Time until an on-page crawl is ready, same format")
+    parser.add_argument('--openai-latency', type=Latency.parse, default='lognormal:0.2:0.5', help="Same format")
+    parser.add_argument('--token-latency', type=Latency.parse, default='fixed:0.005', help="Delay between streamed chunks")
+    parser.add_argument('--completion-tokens', type=int, default=300)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of requests to either API that fail")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="Share of requests to either API answered with 429")
+    parser.add_argument('--competitor-pool', type=int, default=1000,
+                        help="Distinct competitor pages in the fake SERPs; lower it to make briefs share URLs")
+    parser.add_argument('--no-sharing', action='store_true', help="Crawl every URL per brief instead of sharing analyses")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write the results as JSON, e.g. to compare commits with --baseline")
+    parser.add_argument('--baseline', help="JSON written by an earlier --output; prints p50 changes per stage")
+    parser.add_argument('--verbose', action='store_true', help="Show the pipeline's own output")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            baseline = {run['max_workers']: run for run in json.load(file)['runs']}
+
+    jobs = make_jobs(args.jobs)
+    commit = git_commit()
+    print(f"{len(jobs)} briefs per run, concurrency {args.concurrency}, commit {commit or 'unknown'}")
+    runs = []
+    for max_workers in [int(value) for value in args.workers.split(',')]:
+        run = benchmark(args, max_workers, jobs)
+        print_run(run, baseline.get(max_workers))
+        runs.append(run)
+
+    if args.output:
+        settings = {name: str(value) if isinstance(value, Latency) else value
+                    for name, value in vars(args).items() if name not in ('output', 'baseline', 'verbose')}
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump({'commit': commit, 'settings': settings, 'runs': runs}, file, indent=2)
+        print(f"\nResults written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import os
+import sys
+import threading
+
+# Add the project root directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+
+from src.analysis.prompt_builder import PromptBuilder
+
+SYSTEM_PROMPT = "You are an SEO analyst."
+
+def render_prompt(texts):
+    return (f"Summary:\n{texts['content_summary']}\nCompetitors: {texts['top_competitors']}\n"
+            f"Keywords: {texts['related_keywords']}\nOutline:\n{texts['content_outline']}")
+
+def oversized_input():
+    # Every section's min_items alone is far over any small budget: a one-line summary of
+    # 3000 words, ten long keywords and five long outline headings
+    headings = {'h2': [f"heading {i} " + 'word ' * 80 for i in range(5)]}
+    compiled_data = {
+        'content_summary': 'summary ' * 3000,
+        'top_competitors': [f"https://competitor{i}.example/page" for i in range(3)],
+        'detailed_analysis': [{'url': 'https://competitor0.example/page', 'headings': headings}]
+    }
+    keywords = [f"keyword {i} " + 'term ' * 40 for i in range(10)]
+    return compiled_data, keywords
+
+def build(max_tokens, timeout=60):
+    # Run on a thread so a budget loop that never ends fails the check instead of hanging it
+    outcome = {}
+    def target():
+        compiled_data, keywords = oversized_input()
+        outcome['result'] = PromptBuilder(max_tokens=max_tokens).build(render_prompt, SYSTEM_PROMPT, compiled_data, keywords, [])
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), f"PromptBuilder.build did not finish within {timeout}s (budget {max_tokens})"
+    return outcome['result']
+
+def check_minimum_items_over_budget():
+    for budget in (400, 800, 2000):
+        _, report = build(budget)
+        assert report['total_tokens'] <= budget, f"{report['total_tokens']} tokens for a budget of {budget}"
+
+def check_everything_truncated():
+    # A budget below the template and system prompt alone cannot be met; every section is cut to
+    # nothing and the build still returns
+    prompt, report = build(5)
+    assert all(tokens == 0 for name, tokens in report['sections'].items() if name != 'instructions'), report['sections']
+    assert prompt == render_prompt({'content_summary': '', 'top_competitors': '', 'related_keywords': '', 'content_outline': ''})
+
+def main():
+    checks = [check_minimum_items_over_budget, check_everything_truncated]
+    failed = 0
+    for check in checks:
+        try:
+            check()
+        except AssertionError as e:
+            failed += 1
+            print(f"FAIL {check.__name__}: {e}")
+        else:
+            print(f"ok   {check.__name__}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from scipy.stats import spearmanr
+
+# Add the project root directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+
+from config.settings import TOP_KEYWORDS_COUNT
+from src.analysis.embedding_service import EmbeddingService
+from src.analysis.keyword_candidates import select_candidates
+from src.analysis.local_embedding import LocalEmbeddingService, url_database_h1s
+from src.utils.keyword_table import KeywordTable
+
+def load_rankings(args):
+    # (query, candidates) pairs: keywords of saved briefs, or database H1s ranked against sampled H1s
+    if args.briefs:
+        with open(args.briefs, 'r', encoding='utf-8') as file:
+            for line in file:
+                record = json.loads(line)
+                if record.get('status') == 'ok':
+                    compiled_data = record['compiled_data']
+                    candidates = select_candidates(KeywordTable.from_dict(compiled_data['keywords']),
+                                                   len(compiled_data['detailed_analysis']))
+                    yield record['keyword'], list(candidates['keyword'])
+    else:
+        h1s = url_database_h1s()
+        rng = np.random.default_rng(0)
+        for i in rng.choice(len(h1s), size=min(args.queries, len(h1s)), replace=False):
+            yield h1s[i], h1s[:i] + h1s[i + 1:]
+
+def score(service, query, candidates):
+    started = time.perf_counter()
+    embeddings = service.embed([query] + candidates, normalize=True)
+    similarities = embeddings[1:] @ embeddings[0]
+    return similarities, time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description="Ranking agreement and latency of the local similarity backend versus OpenAI embeddings.")
+    parser.add_argument('--briefs', help="JSONL written by src/batch.py; ranks each brief's keyword candidates (default: URL database H1s)")
+    parser.add_argument('--queries', type=int, default=20, help="Number of H1s used as queries when --briefs is not given")
+    parser.add_argument('--k', type=int, default=TOP_KEYWORDS_COUNT)
+    args = parser.parse_args()
+
+    remote = EmbeddingService()
+    local = LocalEmbeddingService()
+    overlaps, correlations, remote_times, local_times, counts = [], [], [], [], []
+
+    for query, candidates in load_rankings(args):
+        if len(candidates) < 2:
+            continue
+        remote_scores, remote_time = score(remote, query, candidates)
+        local_scores, local_time = score(local, query, candidates)
+        k = min(args.k, len(candidates))
+        remote_top = set(np.argsort(-remote_scores)[:k])
+        local_top = set(np.argsort(-local_scores)[:k])
+        overlaps.append(len(remote_top & local_top) / k)
+        correlations.append(spearmanr(remote_scores, local_scores).correlation)
+        remote_times.append(remote_time)
+        local_times.append(local_time)
+        counts.append(len(candidates))
+
+    if not overlaps:
+        print("Nothing to compare.")
+        return
+    per_thousand = lambda times: 1000 * 1000 * sum(times) / sum(counts)
+    print(f"{len(overlaps)} rankings, {np.mean(counts):.0f} candidates each, k={args.k}")
+    print(f"overlap@k:         {np.mean(overlaps):.3f}")
+    print(f"Spearman rho:      {np.nanmean(correlations):.3f}")
+    print(f"remote ms / 1000:  {per_thousand(remote_times):.1f}  (embedding cache hits make this optimistic)")
+    print(f"local ms / 1000:   {per_thousand(local_times):.1f}")
+    remote.cache.report()
+
+if __name__ == "__main__":
+    main()
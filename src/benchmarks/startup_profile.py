@@ -0,0 +1,54 @@
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+# Modules that should only be imported once a feature actually needs them
+HEAVY_MODULES = ['openai', 'pandas', 'sklearn', 'scipy', 'nltk', 'tldextract', 'joblib', 'tiktoken']
+
+_IMPORT_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+def profile(module):
+    # Cumulative import time (microseconds) per top-level import chain, from a fresh interpreter
+    env = dict(os.environ, PYTHONPATH=project_root)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+        cwd=project_root, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    timings = {}
+    for line in result.stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match:
+            timings[match.group(4)] = int(match.group(2))
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how long the entry points take to import.")
+    parser.add_argument('modules', nargs='*', default=['src.main', 'src.batch'])
+    parser.add_argument('--runs', type=int, default=5, help="Fresh interpreters per module; the fastest run is reported")
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--budget-ms', type=float, help="Exit with status 1 if any module takes longer than this to import")
+    args = parser.parse_args()
+
+    over_budget = False
+    for module in args.modules:
+        runs = [profile(module) for _ in range(args.runs)]
+        timings = min(runs, key=lambda run: run.get(module, 0))
+        total_ms = timings.get(module, 0) / 1000
+        print(f"\n{module}: {total_ms:.0f} ms (best of {args.runs})")
+        for name, micros in sorted(timings.items(), key=lambda item: -item[1])[1:args.top + 1]:
+            print(f"  {micros / 1000:8.1f} ms  {name}")
+        heavy = [name for name in HEAVY_MODULES if name in timings]
+        print(f"  heavy modules imported at startup: {', '.join(heavy) if heavy else 'none'}")
+        if args.budget_ms is not None and total_ms > args.budget_ms:
+            print(f"  over the {args.budget_ms:.0f} ms budget")
+            over_budget = True
+    sys.exit(1 if over_budget else 0)
+
+if __name__ == "__main__":
+    main()
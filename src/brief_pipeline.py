@@ -0,0 +1,297 @@
+import logging
+from config.settings import (
+    DATAFORSEO_USERNAME, DATAFORSEO_PASSWORD, DATAFORSEO_DOMAIN, OPENAI_API_KEY,
+    TOP_KEYWORDS_COUNT, MAX_COMPETITORS, KEYWORD_CANDIDATES, RESPONSE_CACHE_BYPASS,
+    SIMILARITY_BACKEND, SIMILARITY_FALLBACK_TO_LOCAL, URL_INDEX_DIR, LOCAL_URL_INDEX_DIR,
+    TRACE_ENABLED, TRACE_DIR, PROMETHEUS_TEXTFILE_PATH, CHECKPOINT_ENABLED, URL_ANALYSIS_SHARING
+)
+from src.api.rate_limiter import rate_limiter
+from src.api.clients import get_dataforseo_client
+from src.api.rest_client import RestClient
+from src.api.serp_fetcher import SerpFetcher
+from src.api.content_summary_fetcher import ContentSummaryFetcher
+from src.analysis.embedding_service import EmbeddingService
+from src.analysis.local_embedding import LocalEmbeddingService
+from src.analysis.gpt_brief_generator import GPTBriefGenerator, BriefStream
+from src.analysis.prompt_builder import PromptBuilder
+from src.analysis.keyword_density_analyzer import KeywordDensityAnalyzer
+from src.analysis.keyword_candidates import select_candidates
+from src.utils.keyword_table import KeywordTable
+from src.utils.url_analysis_store import URLAnalysisStore
+from src.utils.url_processor import URLProcessor
+from src.utils.url_similarity import URLSimilarityAnalyzer
+from src.utils.stage_graph import StageGraph
+from src.utils.run_store import RunStore
+from src.utils import tracing
+
+logger = logging.getLogger(__name__)
+
+class BriefPipeline:
+    def __init__(self, serp_fetcher, content_summary_fetcher, url_processor, keyword_density_analyzer,
+                 gpt_brief_generator, url_analyzer=None, trace_dir=TRACE_DIR if TRACE_ENABLED else None,
+                 metrics_path=PROMETHEUS_TEXTFILE_PATH if TRACE_ENABLED else None):
+        self.serp_fetcher = serp_fetcher
+        self.content_summary_fetcher = content_summary_fetcher
+        self.url_processor = url_processor
+        self.keyword_density_analyzer = keyword_density_analyzer
+        self.gpt_brief_generator = gpt_brief_generator
+        self.url_analyzer = url_analyzer
+        # Where each run's JSON trace and the process-wide Prometheus totals are written; None to skip
+        self.trace_dir = trace_dir
+        self.metrics_path = metrics_path
+
+    @classmethod
+    def from_settings(cls, bypass_cache=RESPONSE_CACHE_BYPASS):
+        client = get_dataforseo_client()
+        if bypass_cache:
+            # Same connections and cache, but every request goes to the API
+            client = RestClient(DATAFORSEO_USERNAME, DATAFORSEO_PASSWORD, DATAFORSEO_DOMAIN,
+                                pool=client.pool, cache=client.cache, bypass_cache=True)
+        if SIMILARITY_BACKEND == 'local':
+            embedding_service = LocalEmbeddingService()
+            fallback_service = None
+            index_dir = LOCAL_URL_INDEX_DIR
+        else:
+            embedding_service = EmbeddingService()
+            fallback_service = LocalEmbeddingService() if SIMILARITY_FALLBACK_TO_LOCAL else None
+            index_dir = URL_INDEX_DIR
+        return cls(
+            SerpFetcher(client),
+            ContentSummaryFetcher(client),
+            URLProcessor(client, DATAFORSEO_USERNAME, DATAFORSEO_PASSWORD,
+                         analysis_store=URLAnalysisStore() if URL_ANALYSIS_SHARING else None),
+            KeywordDensityAnalyzer(embedding_service, fallback_service),
+            GPTBriefGenerator(PromptBuilder(embedding_service)),
+            URLSimilarityAnalyzer(OPENAI_API_KEY, embedding_service, index_dir=index_dir)
+        )
+
+    def print_resource_report(self):
+        embedding_cache = self.keyword_density_analyzer.embedding_service.cache
+        if embedding_cache is not None:
+            embedding_cache.report()
+        client = self.url_processor.client
+        if client.cache is not None:
+            client.cache.report()
+        client.pool.report()
+        rate_limiter.report()
+        if self.url_processor.analysis_store is not None:
+            self.url_processor.analysis_store.report()
+
+    def build_graph(self, job, brief_sink=None, store=None):
+        # job keys: keyword, location_code, language_code, language_name and optionally
+        # reference_url, database, clusters, hard_clustering. With a RunStore, each competitor
+        # analysis is checkpointed as it arrives and reused when the run is resumed.
+        keyword = job['keyword']
+        reference_url = job.get('reference_url')
+
+        def fetch_serp():
+            print("\nFetching SERP results...")
+            serp_results = self.serp_fetcher.get_serp_results(keyword, job['language_code'], job['location_code'])
+            if not serp_results:
+                raise RuntimeError("Failed to fetch SERP results.")
+            return serp_results
+
+        def fetch_content_summary(serp):
+            print("Fetching content summary...")
+            content_summary = self.content_summary_fetcher.get_content_summary(serp['id'])
+            if content_summary is None:
+                raise RuntimeError("Failed to fetch content summary.")
+            return content_summary[0]['summary'] if content_summary else ""
+
+        def analyze_competitors(serp):
+            print("Processing URLs...")
+            urls_to_process = [result['url'] for result in serp['result'][0]['items'][:MAX_COMPETITORS] if result['type'] == 'organic']
+            if reference_url:
+                urls_to_process.append(reference_url)
+
+            if store is None:
+                return process_urls(self.url_processor, urls_to_process, keyword, language=job['language_name'])
+            previous = store.load_urls()
+            if previous:
+                print(f"Reusing {len(previous)} URL analyses from run {store.run_id}.")
+            return process_urls(self.url_processor, urls_to_process, keyword, on_url_data=store.save_url,
+                                language=job['language_name'], previous=previous)
+
+        def rank_keywords(competitors):
+            print("Analyzing keywords...")
+            return analyze_keywords(self.keyword_density_analyzer, competitors, keyword)
+
+        def find_outlinks():
+            if not job.get('database') or self.url_analyzer is None:
+                return None
+            print("\nFinding potential outlinks...")
+            potential_outlinks = self.url_analyzer.find_potential_outlinks(
+                keyword,
+                job['database'],
+                job.get('clusters'),
+                hard_clustering=job.get('hard_clustering', False)
+            )
+            print(f"Potential outlinks found: {len(potential_outlinks or [])}")
+            logger.debug("Potential outlinks: %s", potential_outlinks)
+            return potential_outlinks
+
+        def build_prompt(content_summary, competitors, keywords, outlinks):
+            compiled_data = dict(competitors, content_summary=content_summary)
+            reference_data = next((data for data in compiled_data['detailed_analysis'] if data['url'] == reference_url), None)
+            messages, report = self.gpt_brief_generator.build_messages(
+                keyword,
+                compiled_data,
+                keywords[:TOP_KEYWORDS_COUNT],
+                outlinks,
+                reference_data,
+                job['language_name']
+            )
+            return {'messages': messages, 'report': report}
+
+        def generate_brief(prompt):
+            print("\nGenerating brief...")
+            stream = self.gpt_brief_generator.stream_messages(prompt['messages'], prompt['report'], sinks=[brief_sink])
+            stream.consume()
+            print(f"\nBrief generated in {stream.total_time:.2f}s (first token after {stream.time_to_first_token or 0:.2f}s)")
+            return stream
+
+        graph = StageGraph()
+        graph.add('serp', fetch_serp)
+        graph.add('outlinks', find_outlinks)
+        graph.add('content_summary', fetch_content_summary, deps=['serp'])
+        graph.add('competitors', analyze_competitors, deps=['serp'])
+        graph.add('keywords', rank_keywords, deps=['competitors'])
+        graph.add('prompt', build_prompt, deps=['content_summary', 'competitors', 'keywords', 'outlinks'])
+        graph.add('brief', generate_brief, deps=['prompt'])
+        return graph
+
+    def run(self, job, brief_sink=None, store=None, on_stage=None):
+        # brief_sink, if given, is called with each chunk of the brief as it is generated,
+        # and on_stage with the name of each stage as it finishes.
+        # Stage outputs are checkpointed to `store` (a new RunStore when checkpointing is on);
+        # stages already saved in it, e.g. by an interrupted run, are not run again. The
+        # checkpoints are deleted once the brief is generated.
+        if store is None and CHECKPOINT_ENABLED:
+            store = RunStore.create(job)
+        if store is not None:
+            print(f"Run ID: {store.run_id}")
+        graph = self.build_graph(job, brief_sink, store)
+        checkpoints = store.load_stages(graph.stages) if store is not None else {}
+        if 'brief' in checkpoints:
+            checkpoints['brief'] = BriefStream.completed(**checkpoints['brief'])
+            if brief_sink is not None:
+                brief_sink(checkpoints['brief'].text)
+
+        def on_result(name, result):
+            if store is not None:
+                save_checkpoint(store, name, result)
+            if on_stage is not None:
+                on_stage(name)
+
+        with tracing.trace('brief', keyword=job['keyword'], language=job.get('language_name'),
+                           run_id=store.run_id if store is not None else None) as trace:
+            results = graph.run(checkpoints, on_result=on_result)
+        graph.print_report()
+        trace.print_summary()
+        if self.trace_dir is not None:
+            print(f"Trace written to {trace.write_json(self.trace_dir)}")
+        if self.metrics_path is not None:
+            tracing.metrics.write_textfile(self.metrics_path)
+        brief = results.get('brief')
+        if store is not None and brief is not None:
+            # Checkpoints are only needed to resume a run that did not finish
+            store.delete()
+        return {
+            'keyword': job['keyword'],
+            'run_id': store.run_id if store is not None else None,
+            'trace_id': trace.trace_id,
+            'trace_summary': trace.summary(),
+            'brief': brief.text if brief is not None else None,
+            'brief_timings': brief.timings() if brief is not None else None,
+            'prompt_report': brief.prompt_report if brief is not None else None,
+            'content_summary': results.get('content_summary'),
+            'compiled_data': results.get('competitors'),
+            'top_keywords': (results.get('keywords') or [])[:TOP_KEYWORDS_COUNT],
+            'potential_outlinks': results.get('outlinks'),
+            'stage_report': graph.report()
+        }
+
+def save_checkpoint(store, name, result):
+    if name == 'brief':
+        result = {'text': result.text, 'timings': result.timings(), 'prompt_report': result.prompt_report}
+    store.save_stage(name, result)
+
+def process_urls(url_processor, urls, keyword, on_url_data=None, language=None, previous=None):
+    # `previous` holds URL analyses from an earlier, interrupted attempt; their URLs are not crawled again
+    compiled_data = {
+        'top_competitors': [],
+        'detailed_analysis': [],
+        'content_outline': "",
+        'avg_image_count': 0
+    }
+    image_counts = []
+    word_counts = []
+
+    processed_urls = set()
+
+    def add(url_data):
+        processed_urls.add(url_data['url'])
+        compiled_data['top_competitors'].append(f"{url_data['url']}")
+        compiled_data['detailed_analysis'].append(url_data)
+        image_counts.append(url_data.get('images_count', 0))
+        word_counts.append(url_data.get('plain_text_word_count', 0))
+
+    for url_data in previous or []:
+        if url_data['url'] in urls:
+            add(url_data)
+
+    # URLs are submitted to DataForSEO in bulk and come back as their crawls finish
+    remaining = [url for url in urls if url not in processed_urls]
+    try:
+        for url_data in url_processor.process_urls(keyword, remaining, language) if remaining else ():
+            if on_url_data:
+                on_url_data(url_data)
+            add(url_data)
+    except Exception as e:
+        print(f"Error processing URLs: {str(e)}")
+
+    for url in urls:
+        if url not in processed_urls:
+            print(f"No data returned for URL: {url}")
+
+    # One table for all pages (it has a url column), so per-page copies are not kept around
+    compiled_data['keywords'] = KeywordTable.concat([analysis.pop('keywords') for analysis in compiled_data['detailed_analysis']])
+    compiled_data['content_outline'] = generate_content_outline(compiled_data['detailed_analysis'])
+    compiled_data['avg_image_count'] = sum(image_counts) / len(image_counts) if image_counts else 0
+    return compiled_data
+
+def analyze_keywords(keyword_density_analyzer, compiled_data, target_keyword):
+    # Only the best lexical candidates are embedded; the rest could not reach the top keywords anyway
+    candidates = select_candidates(compiled_data['keywords'], len(compiled_data['detailed_analysis']), KEYWORD_CANDIDATES)
+
+    print(f"Calculating keyword similarities for the top {len(candidates)} candidates...")
+    try:
+        candidates['similarity'] = keyword_density_analyzer.calculate_similarity(list(candidates['keyword']), target_keyword)
+        ranked = candidates.top(None, by=('similarity', 'frequency'))
+    except Exception as e:
+        print(f"Error calculating similarities: {e}")
+        print("Proceeding with sorting based on frequency only.")
+        ranked = candidates.top(None, by=('frequency',))
+
+    all_keywords = ranked.records()
+    print("\nTop Keywords:")
+    for i, kw in enumerate(all_keywords[:TOP_KEYWORDS_COUNT], 1):
+        similarity = kw.get('similarity', 'N/A')
+        similarity_str = f"{similarity:.2f}" if isinstance(similarity, float) else similarity
+        print(f"{i}. {kw['keyword']} (Similarity: {similarity_str}, Frequency: {kw['frequency']})")
+
+    return all_keywords
+
+def generate_content_outline(detailed_analysis):
+    content_outline = []
+    for analysis in detailed_analysis:
+        content_outline.append(f"URL: {analysis['url']}")
+        headings = analysis.get('headings', {})
+        if headings:
+            for tag, heading_list in headings.items():
+                if heading_list:
+                    for heading in heading_list:
+                        content_outline.append(f"{tag.upper()}: {heading}")
+        else:
+            content_outline.append("No headings found for this URL")
+    return "\n".join(content_outline)
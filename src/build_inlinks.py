@@ -0,0 +1,61 @@
+import argparse
+import csv
+import sys
+import os
+
+# Add the project root directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+from config.settings import (
+    OPENAI_API_KEY, SIMILARITY_BACKEND, LOCAL_URL_INDEX_DIR, INLINK_NEIGHBOURS, INLINK_SCOPE, INLINK_PROCESSES,
+    INLINK_BLOCK_MEMORY, SIMILARITY_THRESHOLD
+)
+from src.analysis.local_embedding import LocalEmbeddingService
+from src.utils.broad_inlinks import BroadInlinkAnalyzer
+from src.utils.neighbour_table import SCOPES
+from src.utils.url_similarity import URLSimilarityAnalyzer
+
+def main():
+    parser = argparse.ArgumentParser(description="Recommend inlinks between the pages of each URL database.")
+    parser.add_argument('databases', nargs='*', help="Databases to analyse (default: all)")
+    parser.add_argument('--backend', choices=['openai', 'local'], default=SIMILARITY_BACKEND)
+    parser.add_argument('--scope', choices=SCOPES, default=INLINK_SCOPE,
+                        help="Link within the same cluster, across clusters, or between any pages")
+    parser.add_argument('--k', type=int, default=INLINK_NEIGHBOURS, help="Neighbours kept per page")
+    parser.add_argument('--processes', type=int, default=INLINK_PROCESSES, help="Worker processes (default: one per CPU)")
+    parser.add_argument('--memory-mb', type=int, default=INLINK_BLOCK_MEMORY // (1024 * 1024),
+                        help="Memory ceiling per worker process")
+    parser.add_argument('--min-similarity', type=float, default=SIMILARITY_THRESHOLD)
+    parser.add_argument('--output', help="Write the recommendations as CSV (target_url, source_url, similarity, ...)")
+    args = parser.parse_args()
+
+    if args.backend == 'local':
+        url_analyzer = URLSimilarityAnalyzer(OPENAI_API_KEY, LocalEmbeddingService(), index_dir=LOCAL_URL_INDEX_DIR)
+    else:
+        url_analyzer = URLSimilarityAnalyzer(OPENAI_API_KEY)
+    inlink_analyzer = BroadInlinkAnalyzer(url_analyzer, args.k, args.processes, args.memory_mb * 1024 * 1024)
+
+    rows = []
+    for db_name in args.databases or url_analyzer.get_available_databases():
+        for page in inlink_analyzer.recommend_inlinks(db_name, args.scope, args.min_similarity):
+            for inlink in page['inlinks']:
+                rows.append({
+                    'database': db_name,
+                    'target_url': page['url'],
+                    'target_cluster': page['cluster'],
+                    'source_url': inlink['url'],
+                    'source_cluster': inlink['cluster'],
+                    'similarity': f"{inlink['similarity']:.4f}"
+                })
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=['database', 'target_url', 'target_cluster',
+                                                      'source_url', 'source_cluster', 'similarity'])
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"{len(rows)} recommendations written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import argparse
+import sys
+import os
+
+# Add the project root directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+from config.settings import OPENAI_API_KEY, SIMILARITY_BACKEND, LOCAL_URL_INDEX_DIR
+from src.analysis.local_embedding import LocalEmbeddingService, url_database_h1s
+from src.utils.url_similarity import URLSimilarityAnalyzer
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the H1 similarity index of every URL database.")
+    parser.add_argument('--backend', choices=['openai', 'local'], default=SIMILARITY_BACKEND)
+    parser.add_argument('--refit', action='store_true', help="Refit the local similarity model on the current H1s first")
+    args = parser.parse_args()
+
+    if args.backend == 'local':
+        embedding_service = LocalEmbeddingService()
+        if args.refit:
+            embedding_service.fit(url_database_h1s())
+        url_analyzer = URLSimilarityAnalyzer(OPENAI_API_KEY, embedding_service, index_dir=LOCAL_URL_INDEX_DIR)
+    else:
+        url_analyzer = URLSimilarityAnalyzer(OPENAI_API_KEY)
+
+    for db_name in url_analyzer.get_available_databases():
+        index = url_analyzer.get_index(db_name)
+        print(f"{db_name}: {len(index)} rows indexed in {index.directory}")
+    if url_analyzer.embedding_service.cache is not None:
+        url_analyzer.embedding_service.cache.report()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+import argparse
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+# Add the project root directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+from config.settings import (
+    LOCATION_CSV_PATH, LANGUAGE_CSV_PATH, LOG_LEVEL, RESPONSE_CACHE_BYPASS,
+    SERVER_HOST, SERVER_PORT, SERVER_WORKERS, SERVER_QUEUE_SIZE, SERVER_JOB_RETENTION, SERVER_EXPIRE_INTERVAL
+)
+from src.utils.csv_handler import CSVHandler
+from src.brief_pipeline import BriefPipeline
+from src.batch import build_job, json_default
+
+class QueueFull(Exception):
+    pass
+
+class BriefJob:
+    """A submitted brief and everything that happened to it so far.
+
+    Progress is kept as a list of events ('status', 'stage' and 'brief' chunks) so a client
+    streaming the job gets the full history first and then follows it live. Once the job is
+    done and nobody is streaming it, the brief chunks are collapsed into one event and the
+    bulky parts of the result are dropped, since finished jobs are kept for a while.
+    """
+
+    def __init__(self, job_id, job):
+        self.id = job_id
+        self.job = job
+        self.status = 'queued'
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None
+        self.events = []
+        self.readers = 0
+        self.compacted = False
+        self._changed = threading.Condition()
+
+    @property
+    def done(self):
+        return self.status in ('ok', 'failed')
+
+    def publish(self, event, data):
+        with self._changed:
+            self.events.append({'event': event, 'data': data})
+            self._changed.notify_all()
+
+    def set_status(self, status, error=None):
+        with self._changed:
+            if status == 'running':
+                self.started = time.time()
+            elif status in ('ok', 'failed'):
+                self.finished = time.time()
+            self.status = status
+            self.error = error
+            self.publish('status', {'status': status, 'error': error})
+            self.compact()
+
+    def expired(self, cutoff):
+        with self._changed:
+            return self.done and self.finished is not None and self.finished < cutoff
+
+    @contextmanager
+    def follow(self):
+        # Held while a client streams the events; their indexes must not change under it
+        with self._changed:
+            self.readers += 1
+        try:
+            yield self
+        finally:
+            with self._changed:
+                self.readers -= 1
+                self.compact()
+
+    def compact(self):
+        with self._changed:
+            if not self.done or self.readers or self.compacted:
+                return
+            chunks = [event['data'] for event in self.events if event['event'] == 'brief']
+            events = []
+            for event in self.events:
+                if event['event'] != 'brief':
+                    events.append(event)
+                elif chunks:
+                    events.append({'event': 'brief', 'data': ''.join(chunks)})
+                    chunks = None
+            self.events = events
+            if self.result is not None and self.result.get('compiled_data'):
+                # Per-URL analyses and the keyword table are only needed while the brief is generated
+                self.result = dict(self.result, compiled_data={
+                    name: value for name, value in self.result['compiled_data'].items()
+                    if name not in ('keywords', 'detailed_analysis')
+                })
+            self.compacted = True
+
+    def wait_for_events(self, start, timeout):
+        # Events from index `start` on; blocks up to `timeout` seconds while there are none and the job is running
+        with self._changed:
+            self._changed.wait_for(lambda: len(self.events) > start or self.done, timeout)
+            return self.events[start:], self.done
+
+    def summary(self):
+        with self._changed:
+            return {
+                'id': self.id,
+                'keyword': self.job['keyword'],
+                'status': self.status,
+                'error': self.error,
+                'submitted': self.submitted,
+                'started': self.started,
+                'finished': self.finished,
+                'stages': [event['data'] for event in self.events if event['event'] == 'stage'],
+                'brief_chars': sum(len(event['data']) for event in self.events if event['event'] == 'brief')
+            }
+
+class BriefService:
+    """Runs brief jobs on a warm pipeline from a bounded queue.
+
+    The pipeline (clients, connection pools, caches, URL indexes) and the location/language
+    lookups are built once and shared by every job. ``submit`` raises QueueFull instead of
+    blocking when ``queue_size`` jobs are already waiting, so callers see backpressure.
+    """
+
+    def __init__(self, pipeline, csv_handler, workers=SERVER_WORKERS, queue_size=SERVER_QUEUE_SIZE,
+                 retention=SERVER_JOB_RETENTION):
+        self.pipeline = pipeline
+        self.csv_handler = csv_handler
+        self.retention = retention
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._stopped = threading.Event()
+        self.workers = [threading.Thread(target=self._work, daemon=True) for _ in range(workers)]
+        for worker in self.workers:
+            worker.start()
+        threading.Thread(target=self._sweep, daemon=True).start()
+
+    def _sweep(self):
+        # Finished jobs also expire while no new jobs are submitted
+        while not self._stopped.wait(SERVER_EXPIRE_INTERVAL):
+            with self._lock:
+                self._expire()
+
+    def submit(self, raw_job):
+        # ValueError for jobs that cannot be resolved (missing keyword, unknown location or language)
+        brief_job = BriefJob(uuid.uuid4().hex[:12], build_job(raw_job, self.csv_handler))
+        with self._lock:
+            try:
+                self.queue.put_nowait(brief_job)
+            except queue.Full:
+                self.rejected += 1
+                raise QueueFull(f"{self.queue.maxsize} jobs are already waiting")
+            self.jobs[brief_job.id] = brief_job
+            self._expire()
+        brief_job.publish('status', {'status': 'queued'})
+        return brief_job
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def _expire(self):
+        cutoff = time.time() - self.retention
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.expired(cutoff)]:
+            del self.jobs[job_id]
+
+    def _work(self):
+        while True:
+            brief_job = self.queue.get()
+            if brief_job is None:
+                return
+            with self._lock:
+                self.running += 1
+            brief_job.set_status('running')
+            try:
+                result = self.pipeline.run(brief_job.job, brief_sink=lambda text: brief_job.publish('brief', text),
+                                           on_stage=lambda name: brief_job.publish('stage', name))
+            except Exception as e:
+                result, error = None, str(e)
+            else:
+                error = None if result['brief'] is not None else result['stage_report']['errors']
+            brief_job.result = result
+            with self._lock:
+                self.running -= 1
+                if error is None:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+            brief_job.set_status('ok' if error is None else 'failed', error)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': len(self.workers),
+                'queued': self.queue.qsize(),
+                'queue_size': self.queue.maxsize,
+                'running': self.running,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'jobs': len(self.jobs)
+            }
+
+    def stop(self):
+        self._stopped.set()
+        for _ in self.workers:
+            self.queue.put(None)
+
+class BriefRequestHandler(BaseHTTPRequestHandler):
+    """
+    POST /jobs                 submit a job (same fields as a src/batch.py row); 202, or 503 while the queue is full
+    GET  /jobs/<id>            status and finished stages
+    GET  /jobs/<id>/events     server-sent events: status changes, finished stages and brief chunks as they arrive
+    GET  /jobs/<id>/result     the pipeline result once the job is done (202 with the status until then)
+    GET  /health               queue and worker counts
+    """
+
+    service = None
+
+    def _send_json(self, status, value, headers=None):
+        body = json.dumps(value, ensure_ascii=False, default=json_default).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, header in (headers or {}).items():
+            self.send_header(name, header)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _job_or_404(self, job_id):
+        brief_job = self.service.get(job_id)
+        if brief_job is None:
+            self._send_json(404, {'error': f"No job '{job_id}'"})
+        return brief_job
+
+    def do_POST(self):
+        if urlparse(self.path).path.rstrip('/') != '/jobs':
+            self._send_json(404, {'error': 'Not found'})
+            return
+        try:
+            raw_job = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+            brief_job = self.service.submit(raw_job)
+        except QueueFull as e:
+            self._send_json(503, {'error': f"Queue full: {e}"}, {'Retry-After': '30'})
+            return
+        except KeyError as e:
+            self._send_json(400, {'error': f"Invalid job: missing {e}"})
+            return
+        except (ValueError, AttributeError) as e:
+            self._send_json(400, {'error': f"Invalid job: {e}"})
+            return
+        self._send_json(202, brief_job.summary(), {'Location': f"/jobs/{brief_job.id}"})
+
+    def do_GET(self):
+        parts = [part for part in urlparse(self.path).path.split('/') if part]
+        if parts == ['health']:
+            self._send_json(200, self.service.stats())
+        elif len(parts) == 2 and parts[0] == 'jobs':
+            brief_job = self._job_or_404(parts[1])
+            if brief_job:
+                self._send_json(200, brief_job.summary())
+        elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'result':
+            brief_job = self._job_or_404(parts[1])
+            if brief_job:
+                if brief_job.done:
+                    self._send_json(200, {**brief_job.summary(), 'result': brief_job.result})
+                else:
+                    self._send_json(202, brief_job.summary())
+        elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'events':
+            brief_job = self._job_or_404(parts[1])
+            if brief_job:
+                self._stream_events(brief_job)
+        else:
+            self._send_json(404, {'error': 'Not found'})
+
+    def _stream_events(self, brief_job):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        sent = 0
+        try:
+            with brief_job.follow():
+                while True:
+                    events, done = brief_job.wait_for_events(sent, timeout=15)
+                    if events:
+                        self.wfile.write(''.join(
+                            f"event: {event['event']}\ndata: {json.dumps(event['data'], ensure_ascii=False)}\n\n"
+                            for event in events).encode('utf-8'))
+                        sent += len(events)
+                    elif not done:
+                        # Keeps idle connections (and proxies) from timing out while a stage runs
+                        self.wfile.write(b": keep-alive\n\n")
+                    self.wfile.flush()
+                    if done and not events:
+                        return
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve brief generation over HTTP from one warm process.")
+    parser.add_argument('--host', default=SERVER_HOST)
+    parser.add_argument('--port', type=int, default=SERVER_PORT)
+    parser.add_argument('--workers', type=int, default=SERVER_WORKERS, help="Briefs run at once")
+    parser.add_argument('--queue-size', type=int, default=SERVER_QUEUE_SIZE,
+                        help="Jobs that may wait for a worker before submissions are refused")
+    parser.add_argument('--no-cache', action='store_true', help="Ignore cached DataForSEO responses and fetch everything fresh")
+    parser.add_argument('--no-warm', action='store_true', help="Load URL database indexes on first use instead of at startup")
+    args = parser.parse_args()
+    logging.basicConfig(level=LOG_LEVEL, format='%(levelname)s %(name)s: %(message)s')
+
+    csv_handler = CSVHandler()
+    csv_handler.load_csv(LOCATION_CSV_PATH, 'location')
+    csv_handler.load_csv(LANGUAGE_CSV_PATH, 'language')
+
+    pipeline = BriefPipeline.from_settings(bypass_cache=args.no_cache or RESPONSE_CACHE_BYPASS)
+    if not args.no_warm and pipeline.url_analyzer is not None:
+        # Indexes load in the background; jobs needing one before it is ready simply wait for it
+        for database in pipeline.url_analyzer.get_available_databases():
+            pipeline.url_analyzer.warm(database)
+
+    service = BriefService(pipeline, csv_handler, args.workers, args.queue_size)
+    BriefRequestHandler.service = service
+    httpd = ThreadingHTTPServer((args.host, args.port), BriefRequestHandler)
+    httpd.daemon_threads = True
+    print(f"Brief server listening on http://{args.host}:{args.port} "
+          f"({args.workers} workers, queue of {args.queue_size})")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        service.stop()
+        pipeline.print_resource_report()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import threading
+from typing import Dict, List, Optional
+from config.settings import (
+    INLINK_NEIGHBOURS, INLINK_SCOPE, INLINK_PROCESSES, INLINK_BLOCK_MEMORY, SIMILARITY_THRESHOLD
+)
+from src.utils.neighbour_table import NeighbourTable
+from src.utils.url_similarity import URLSimilarityAnalyzer
+
+class BroadInlinkAnalyzer:
+    """Inlink recommendations for every page of a URL database.
+
+    Similarity between H1s is symmetric, so the pages most similar to a page are also the
+    best places to link to it from. The neighbours come from the database's NeighbourTable,
+    which is computed once per index and scope and then loaded from disk.
+    """
+
+    def __init__(self, url_analyzer: URLSimilarityAnalyzer, k: int = INLINK_NEIGHBOURS,
+                 processes: Optional[int] = INLINK_PROCESSES, memory_limit: int = INLINK_BLOCK_MEMORY):
+        self.url_analyzer = url_analyzer
+        self.k = k
+        self.processes = processes
+        self.memory_limit = memory_limit
+        self.tables: Dict[tuple, NeighbourTable] = {}
+        self._lock = threading.Lock()
+
+    def get_neighbour_table(self, db_name: str, scope: str = INLINK_SCOPE) -> NeighbourTable:
+        index = self.url_analyzer.get_index(db_name)
+        with self._lock:
+            table = self.tables.get((db_name, scope))
+            if table is None or table.index is not index:
+                table = NeighbourTable(index, self.k, scope).load(self.processes, self.memory_limit)
+                self.tables[(db_name, scope)] = table
+            return table
+
+    def recommend_inlinks(self, db_name: str, scope: str = INLINK_SCOPE,
+                          min_similarity: float = SIMILARITY_THRESHOLD) -> List[Dict]:
+        if not self.url_analyzer.has_database(db_name):
+            print(f"Error: Database '{db_name}' not found.")
+            return []
+
+        table = self.get_neighbour_table(db_name, scope)
+        index = table.index
+        recommendations = []
+        for row in range(len(index)):
+            sources, scores = table.neighbours(row)
+            inlinks = [
+                {
+                    "url": index.urls[source],
+                    "similarity": float(score),
+                    "cluster": index.clusters[source],
+                    "h1": index.h1s[source]
+                }
+                for source, score in zip(sources, scores) if score >= min_similarity
+            ]
+            if inlinks:
+                recommendations.append({
+                    "url": index.urls[row],
+                    "cluster": index.clusters[row],
+                    "h1": index.h1s[row],
+                    "inlinks": inlinks
+                })
+
+        print(f"Recommended {sum(len(page['inlinks']) for page in recommendations)} inlinks "
+              f"to {len(recommendations)} of {len(index)} pages in {db_name} ({scope})")
+        return recommendations
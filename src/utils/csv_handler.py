@@ -29,6 +29,15 @@ class CSVHandler:
         else:
             raise ValueError("Invalid option type. Use 'location' or 'language'.")
 
+    def resolve(self, option_type: str, value: Union[int, str]) -> tuple:
+        # Accepts either the option name or its code, case-insensitively
+        options = self.get_options(option_type)
+        needle = str(value).strip().lower()
+        for name, code in options.items():
+            if name.lower() == needle or str(code).lower() == needle:
+                return name, code
+        raise ValueError(f"Unknown {option_type}: {value}")
+
     def display_options(self, option_type: str) -> None:
         options = self.get_options(option_type)
         print(f"\nAvailable {option_type}s:")
@@ -0,0 +1,162 @@
+import os
+import sqlite3
+import threading
+import time
+from hashlib import sha256
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from config.settings import EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_BYTES, EMBEDDING_CACHE_DTYPE
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    key BLOB PRIMARY KEY,
+    model TEXT NOT NULL,
+    dtype TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access);
+CREATE TABLE IF NOT EXISTS cache_size (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    bytes INTEGER NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS embeddings_insert AFTER INSERT ON embeddings
+BEGIN UPDATE cache_size SET bytes = bytes + NEW.size WHERE id = 0; END;
+CREATE TRIGGER IF NOT EXISTS embeddings_delete AFTER DELETE ON embeddings
+BEGIN UPDATE cache_size SET bytes = bytes - OLD.size WHERE id = 0; END;
+INSERT OR IGNORE INTO cache_size (id, bytes) SELECT 0, COALESCE(SUM(size), 0) FROM embeddings;
+"""
+
+
+class EmbeddingCache:
+    """Content-addressed on-disk store of embedding vectors keyed on (model, text).
+
+    Backed by SQLite in WAL mode so several threads and processes can share one file.
+    Vectors are stored as raw float16/float32 blobs and evicted least-recently-used
+    once the total blob size exceeds ``max_bytes``. The total is kept in ``cache_size`` by
+    triggers, so a write does not have to sum the whole table.
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_bytes: int = EMBEDDING_CACHE_MAX_BYTES,
+                 dtype: str = EMBEDDING_CACHE_DTYPE):
+        if dtype not in ('float16', 'float32'):
+            raise ValueError("Invalid cache dtype. Use 'float16' or 'float32'.")
+        self.path = path
+        self.max_bytes = max_bytes
+        self.dtype = dtype
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # One transaction, so the running total is counted from exactly the rows the triggers have not seen
+        self._connection().executescript(f"BEGIN IMMEDIATE; {_SCHEMA} COMMIT;")
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections cannot be shared between threads, so each thread gets its own
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            # INSERT OR REPLACE only fires the delete trigger for the replaced row with recursive triggers on
+            connection.execute("PRAGMA recursive_triggers=ON")
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def _key(model: str, text: str) -> bytes:
+        return sha256(f"{model}\x00{text}".encode('utf-8')).digest()
+
+    def get(self, model: str, text: str) -> Optional[np.ndarray]:
+        return self.get_many(model, [text]).get(text)
+
+    def get_many(self, model: str, texts: Iterable[str]) -> Dict[str, np.ndarray]:
+        keys = {self._key(model, text): text for text in texts}
+        found = {}
+        connection = self._connection()
+        key_list = list(keys)
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(key_list), 500):
+            chunk = key_list[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows = connection.execute(
+                f"SELECT key, dtype, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+            ).fetchall()
+            for key, dtype, blob in rows:
+                found[keys[key]] = np.frombuffer(blob, dtype=dtype).astype(np.float32)
+            if rows:
+                now = time.time()
+                connection.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(now, row[0]) for row in rows]
+                )
+
+        with self._stats_lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put(self, model: str, text: str, vector) -> None:
+        self.put_many(model, [(text, vector)])
+
+    def put_many(self, model: str, items: Iterable[Tuple[str, object]]) -> None:
+        now = time.time()
+        rows = []
+        for text, vector in items:
+            blob = np.asarray(vector, dtype=self.dtype).tobytes()
+            rows.append((self._key(model, text), model, self.dtype, blob, len(blob), now))
+        if not rows:
+            return
+
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, dtype, vector, size, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._evict(connection)
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _evict(self, connection: sqlite3.Connection) -> None:
+        total = connection.execute("SELECT bytes FROM cache_size WHERE id = 0").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Evict down to 90% of the budget so we don't evict again on the very next write
+        excess = total - int(self.max_bytes * 0.9)
+        freed = 0
+        stale_keys: List[bytes] = []
+        for key, size in connection.execute("SELECT key, size FROM embeddings ORDER BY last_access ASC"):
+            stale_keys.append(key)
+            freed += size
+            if freed >= excess:
+                break
+        connection.executemany("DELETE FROM embeddings WHERE key = ?", [(key,) for key in stale_keys])
+
+    def stats(self) -> Dict[str, float]:
+        entries, size = self._connection().execute(
+            "SELECT (SELECT COUNT(*) FROM embeddings), bytes FROM cache_size WHERE id = 0"
+        ).fetchone()
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': entries,
+                'bytes': size
+            }
+
+    def report(self) -> None:
+        stats = self.stats()
+        print(f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses "
+              f"(hit rate {stats['hit_rate']:.1%}), {stats['entries']} entries, "
+              f"{stats['bytes'] / (1024 * 1024):.1f} MiB on disk")
@@ -0,0 +1,129 @@
+import sys
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+# Column name -> dtype; keyword and url hold interned Python strings shared across rows and pages
+COLUMN_TYPES = {
+    'keyword': object,
+    'url': object,
+    'ngram': np.int8,
+    'frequency': np.int32,
+    'density': np.float32,
+    'document_frequency': np.int32,
+    'score': np.float64,
+    'similarity': np.float32,
+}
+
+
+class KeywordTable:
+    """Keyword-density rows stored column-wise as NumPy arrays.
+
+    Page tables have keyword, url, ngram, frequency and density columns. ``aggregate``
+    collapses them to one row per keyword with a document_frequency column, to which
+    score and similarity columns are added during ranking.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        self.columns = {name: np.asarray(values, dtype=COLUMN_TYPES.get(name)) for name, values in columns.items()}
+
+    @classmethod
+    def from_items(cls, url: str, items: Iterable[dict], keep=None) -> 'KeywordTable':
+        # Builds a page table from DataForSEO keyword_density items; `keep(keyword)` filters rows
+        keywords, frequencies, densities = [], [], []
+        for item in items:
+            keyword = item['keyword']
+            if keep is not None and not keep(keyword):
+                continue
+            keywords.append(sys.intern(keyword))
+            frequencies.append(item.get('frequency') or 0)
+            densities.append(item.get('density') or 0.0)
+        url = sys.intern(url)
+        return cls({
+            'keyword': _object_array(keywords),
+            'url': _object_array([url] * len(keywords)),
+            'ngram': [keyword.count(' ') + 1 for keyword in keywords],
+            'frequency': frequencies,
+            'density': densities,
+        })
+
+    @classmethod
+    def concat(cls, tables: Sequence['KeywordTable']) -> 'KeywordTable':
+        tables = [table for table in tables if table is not None and len(table)]
+        if not tables:
+            return cls.empty()
+        names = [name for name in tables[0].columns if all(name in table.columns for table in tables)]
+        return cls({name: np.concatenate([table.columns[name] for table in tables]) for name in names})
+
+    @classmethod
+    def empty(cls) -> 'KeywordTable':
+        return cls({name: np.empty(0, dtype=COLUMN_TYPES[name]) for name in ('keyword', 'url', 'ngram', 'frequency', 'density')})
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, list]) -> 'KeywordTable':
+        if 'keyword' in data:
+            data = dict(data, keyword=_object_array([sys.intern(keyword) for keyword in data['keyword']]))
+        return cls(data)
+
+    def __len__(self) -> int:
+        return len(self.columns['keyword'])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def __setitem__(self, name: str, values) -> None:
+        self.columns[name] = np.asarray(values, dtype=COLUMN_TYPES.get(name))
+
+    def take(self, indices) -> 'KeywordTable':
+        return KeywordTable({name: values[indices] for name, values in self.columns.items()})
+
+    def filter(self, mask) -> 'KeywordTable':
+        return self.take(np.flatnonzero(mask))
+
+    def order(self, by: Sequence[str], descending: bool = True) -> np.ndarray:
+        # Stable row order by the numeric `by` columns, the first being the primary key
+        keys = [self.columns[name] for name in reversed(by)]
+        return np.lexsort([-key for key in keys] if descending else keys)
+
+    def top(self, n: Optional[int], by: Sequence[str] = ('frequency',)) -> 'KeywordTable':
+        if n is not None and n < len(self) and len(by) == 1:
+            # Partial sort: only the n best rows get fully ordered
+            values = self.columns[by[0]]
+            candidates = np.argpartition(-values, n - 1)[:n] if n else np.empty(0, dtype=np.int64)
+            return self.take(candidates[np.argsort(-values[candidates], kind='stable')])
+        return self.take(self.order(by)[:n])
+
+    def aggregate(self) -> 'KeywordTable':
+        # One row per keyword: frequency summed over pages, density maxed, pages counted
+        if not len(self):
+            return KeywordTable({'keyword': _object_array([]), 'ngram': [], 'frequency': [], 'density': [], 'document_frequency': []})
+        import pandas as pd
+        keyword_ids, keywords = pd.factorize(self.columns['keyword'])
+        url_ids, _ = pd.factorize(self.columns['url'])
+        n = len(keywords)
+        density = np.zeros(n, dtype=np.float32)
+        np.maximum.at(density, keyword_ids, self.columns['density'])
+        pages = np.unique(keyword_ids.astype(np.int64) * (url_ids.max() + 1) + url_ids) // (url_ids.max() + 1)
+        first_rows = np.unique(keyword_ids, return_index=True)[1]
+        return KeywordTable({
+            'keyword': _object_array(keywords),
+            'ngram': self.columns['ngram'][first_rows],
+            'frequency': np.bincount(keyword_ids, weights=self.columns['frequency'], minlength=n),
+            'density': density,
+            'document_frequency': np.bincount(pages, minlength=n),
+        })
+
+    def records(self, limit: Optional[int] = None) -> List[dict]:
+        # Plain dicts for the prompt, printing and JSON output
+        rows = len(self) if limit is None else min(limit, len(self))
+        columns = {name: values[:rows].tolist() for name, values in self.columns.items()}
+        return [{name: columns[name][i] for name in columns} for i in range(rows)]
+
+    def to_dict(self) -> Dict[str, list]:
+        return {name: values.tolist() for name, values in self.columns.items()}
+
+
+def _object_array(values) -> np.ndarray:
+    array = np.empty(len(values), dtype=object)
+    array[:] = list(values)
+    return array
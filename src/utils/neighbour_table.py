@@ -0,0 +1,146 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from zipfile import BadZipFile
+from typing import Optional, Tuple
+
+import numpy as np
+
+from config.settings import INLINK_BLOCK_MEMORY
+from src.utils.url_index import URLEmbeddingIndex
+
+SCOPES = ('all', 'same', 'cross')
+
+# Per-process state of the block workers, set once by _init_worker so the matrix is not pickled per task
+_worker = {}
+
+
+def block_size(dimensions: int, k: int, memory_limit: int = INLINK_BLOCK_MEMORY) -> int:
+    # Rows per query/candidate block so one worker stays under `memory_limit` bytes: a block of
+    # float32 scores and its cluster mask, the merge buffers (float32 scores + int64 ids over
+    # k + block columns) and both blocks' vectors
+    per_pair = 4 + 2 + 4 + 8
+    per_row = 2 * dimensions * 4 + k * (4 + 8)
+    size = int((-per_row + np.sqrt(per_row ** 2 + 4 * per_pair * memory_limit)) / (2 * per_pair))
+    return max(size, 1)
+
+
+def _init_worker(matrix_path: str, labels: np.ndarray, order: np.ndarray, size: int, k: int, scope: str) -> None:
+    _worker.update(matrix=np.load(matrix_path, mmap_mode='r'), labels=labels, order=order, size=size, k=k, scope=scope)
+
+
+def _top_k_block(start: int, stop: int) -> Tuple[int, np.ndarray, np.ndarray]:
+    # Top-k neighbours of rows order[start:stop] against every candidate block the scope allows
+    matrix, labels, order, size, k, scope = (_worker[name] for name in ('matrix', 'labels', 'order', 'size', 'k', 'scope'))
+    query_rows = order[start:stop]
+    queries = np.asarray(matrix[query_rows], dtype=np.float32)
+    query_labels = labels[query_rows]
+    best_scores = np.full((len(query_rows), k), -np.inf, dtype=np.float32)
+    best_rows = np.full((len(query_rows), k), -1, dtype=np.int64)
+
+    for candidate_start in range(0, len(order), size):
+        candidate_rows = order[candidate_start:candidate_start + size]
+        candidate_labels = labels[candidate_rows]
+        # Rows are sorted by cluster, so most block pairs can be ruled out from their label ranges alone
+        if scope == 'same' and (candidate_labels[0] > query_labels[-1] or candidate_labels[-1] < query_labels[0]):
+            continue
+        if scope == 'cross' and query_labels[0] == query_labels[-1] == candidate_labels[0] == candidate_labels[-1]:
+            continue
+
+        scores = queries @ np.asarray(matrix[candidate_rows], dtype=np.float32).T
+        if scope == 'same':
+            scores[query_labels[:, None] != candidate_labels[None, :]] = -np.inf
+        elif scope == 'cross':
+            scores[query_labels[:, None] == candidate_labels[None, :]] = -np.inf
+        scores[query_rows[:, None] == candidate_rows[None, :]] = -np.inf
+
+        merged_scores = np.concatenate([best_scores, scores], axis=1)
+        merged_rows = np.concatenate([best_rows, np.broadcast_to(candidate_rows, scores.shape)], axis=1)
+        top = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(merged_scores, top, axis=1)
+        best_rows = np.take_along_axis(merged_rows, top, axis=1)
+
+    ranking = np.argsort(-best_scores, axis=1, kind='stable')
+    best_scores = np.take_along_axis(best_scores, ranking, axis=1)
+    best_rows = np.take_along_axis(best_rows, ranking, axis=1)
+    best_rows[~np.isfinite(best_scores)] = -1
+    return start, best_rows.astype(np.int32), best_scores
+
+
+class NeighbourTable:
+    """Top-k most similar rows for every row of a URLEmbeddingIndex.
+
+    ``scope`` constrains neighbours by ``cluster_name``: 'same' keeps rows of the page's own
+    cluster, 'cross' only rows of other clusters and 'all' any row. The table is computed
+    with blocked matrix products, so memory stays under ``memory_limit`` per process whatever
+    the database size, and the query blocks are spread over a process pool. It is stored as
+    ``neighbours_<scope>_k<k>.npz`` (int32 row ids, -1 for missing, and float16 scores) and
+    rebuilt when the index fingerprint changes.
+    """
+
+    def __init__(self, index: URLEmbeddingIndex, k: int, scope: str = 'all'):
+        if scope not in SCOPES:
+            raise ValueError(f"Invalid scope '{scope}'. Use one of {', '.join(SCOPES)}.")
+        self.index = index
+        self.k = k
+        self.scope = scope
+        self.path = os.path.join(index.directory, f"neighbours_{scope}_k{k}.npz")
+        self.rows: Optional[np.ndarray] = None
+        self.scores: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return 0 if self.rows is None else len(self.rows)
+
+    def load(self, processes: Optional[int] = None, memory_limit: int = INLINK_BLOCK_MEMORY) -> 'NeighbourTable':
+        if os.path.exists(self.path):
+            try:
+                with np.load(self.path) as stored:
+                    if str(stored['fingerprint']) == self.index.fingerprint:
+                        self.rows, self.scores = stored['rows'], stored['scores']
+                        return self
+            except (OSError, ValueError, KeyError, EOFError, BadZipFile) as e:
+                print(f"Could not read {self.path} ({e}); rebuilding.")
+        return self.build(processes, memory_limit)
+
+    def build(self, processes: Optional[int] = None, memory_limit: int = INLINK_BLOCK_MEMORY) -> 'NeighbourTable':
+        n_rows = len(self.index)
+        k = min(self.k, max(n_rows - 1, 1))
+        _, labels = np.unique(np.asarray(self.index.clusters, dtype=object), return_inverse=True)
+        order = np.argsort(labels, kind='stable')
+        size = block_size(self.index.matrix.shape[1], k, memory_limit)
+        processes = processes or os.cpu_count() or 1
+        # Query blocks are split smaller than candidate blocks when that is what keeps every process busy
+        query_size = max(min(size, -(-n_rows // processes)), 1)
+        blocks = [(start, min(start + query_size, n_rows)) for start in range(0, n_rows, query_size)]
+        processes = min(processes, len(blocks)) or 1
+        settings = (self.index.matrix_path, labels, order, size, k, self.scope)
+
+        started = time.perf_counter()
+        self.rows = np.full((n_rows, self.k), -1, dtype=np.int32)
+        self.scores = np.zeros((n_rows, self.k), dtype=np.float16)
+
+        def store(start, rows, scores):
+            query_rows = order[start:start + len(rows)]
+            self.rows[query_rows, :k] = rows
+            self.scores[query_rows, :k] = np.where(rows >= 0, scores, 0)
+
+        if processes == 1:
+            _init_worker(*settings)
+            for block in blocks:
+                store(*_top_k_block(*block))
+        else:
+            with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=settings) as executor:
+                for result in executor.map(_top_k_block, *zip(*blocks)):
+                    store(*result)
+
+        # Written to a temporary file and swapped in, like the index itself
+        temporary_path = self.path + '.tmp.npz'
+        np.savez(temporary_path, rows=self.rows, scores=self.scores, fingerprint=np.array(self.index.fingerprint))
+        os.replace(temporary_path, self.path)
+        print(f"Neighbour table for {self.index.db_name} ({self.scope}, k={self.k}): {n_rows} rows in "
+              f"{len(blocks)} blocks on {processes} process(es), {time.perf_counter() - started:.1f}s")
+        return self
+
+    def neighbours(self, row: int) -> Tuple[np.ndarray, np.ndarray]:
+        found = self.rows[row] >= 0
+        return self.rows[row][found], self.scores[row][found].astype(np.float32)
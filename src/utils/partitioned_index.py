@@ -0,0 +1,135 @@
+import os
+import time
+from zipfile import BadZipFile
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from src.utils.url_index import URLEmbeddingIndex
+
+
+class PartitionedIndex:
+    """IVF-style approximate search over a URLEmbeddingIndex.
+
+    Rows are grouped into partitions (either the database's ``cluster_name`` values or
+    k-means cells) and each partition is summarised by its normalized centroid. A query
+    is scored against the centroids first and only the rows of the ``n_probe`` closest
+    partitions are scored exactly.
+    """
+
+    def __init__(self, index: URLEmbeddingIndex, partitions: Union[str, int] = 'cluster'):
+        self.index = index
+        self.partitions = partitions
+        self.path = os.path.join(index.directory, f"partitions_{partitions}.npz")
+        self.centroids: Optional[np.ndarray] = None
+        self.order: Optional[np.ndarray] = None
+        self.offsets: Optional[np.ndarray] = None
+
+    @property
+    def n_partitions(self) -> int:
+        return 0 if self.centroids is None else len(self.centroids)
+
+    def load(self) -> 'PartitionedIndex':
+        if os.path.exists(self.path):
+            try:
+                with np.load(self.path) as stored:
+                    if str(stored['fingerprint']) == self.index.fingerprint:
+                        self.centroids, self.order, self.offsets = stored['centroids'], stored['order'], stored['offsets']
+                        return self
+            except (OSError, ValueError, KeyError, EOFError, BadZipFile) as e:
+                # e.g. a file cut short by a crash; it is simply rebuilt
+                print(f"Could not read {self.path} ({e}); rebuilding.")
+        return self.build()
+
+    def _assign(self) -> np.ndarray:
+        if self.partitions == 'cluster':
+            _, labels = np.unique(np.asarray(self.index.clusters), return_inverse=True)
+            return labels
+        from sklearn.cluster import MiniBatchKMeans
+        n_clusters = min(int(self.partitions), len(self.index))
+        kmeans = MiniBatchKMeans(n_clusters=n_clusters, random_state=0, n_init=3, batch_size=4096)
+        return kmeans.fit_predict(np.asarray(self.index.matrix))
+
+    def build(self) -> 'PartitionedIndex':
+        labels = self._assign()
+        self.order = np.argsort(labels, kind='stable')
+        counts = np.bincount(labels)
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+
+        matrix = self.index.matrix
+        centroids = np.zeros((len(counts), matrix.shape[1]), dtype=np.float32)
+        for p in range(len(counts)):
+            rows = self.order[self.offsets[p]:self.offsets[p + 1]]
+            if len(rows):
+                centroids[p] = np.asarray(matrix[rows]).mean(axis=0)
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        np.divide(centroids, norms, out=centroids, where=norms > 0)
+        self.centroids = centroids
+
+        # Written to a temporary file and swapped in so a crash never leaves a half-written file behind
+        temporary_path = self.path + '.tmp.npz'
+        np.savez(temporary_path, centroids=self.centroids, order=self.order, offsets=self.offsets,
+                 fingerprint=np.array(self.index.fingerprint))
+        os.replace(temporary_path, self.path)
+        print(f"Partitioned {self.index.db_name} into {len(counts)} partitions ({self.partitions})")
+        return self
+
+    def candidates(self, query_vector: np.ndarray, n_probe: int) -> np.ndarray:
+        centroid_scores = self.centroids @ query_vector
+        n_probe = min(n_probe, len(centroid_scores))
+        probed = np.argpartition(-centroid_scores, n_probe - 1)[:n_probe]
+        return np.concatenate([self.order[self.offsets[p]:self.offsets[p + 1]] for p in probed])
+
+    def search(self, query_vector: np.ndarray, k: int, n_probe: int, rows: Optional[np.ndarray] = None,
+               boost_rows: Optional[np.ndarray] = None, boost: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+        candidate_rows = self.candidates(query_vector, n_probe)
+        if rows is not None:
+            filtered_rows = np.intersect1d(candidate_rows, rows, assume_unique=True)
+            # A narrow filter can fall outside the probed partitions; the filtered rows are then cheap to scan exactly
+            if len(filtered_rows) < k or len(rows) <= len(candidate_rows):
+                return self.index.search(query_vector, k, rows, boost_rows, boost)
+            return self.index.search(query_vector, k, filtered_rows, boost_rows, boost)
+        return self.index.search(query_vector, k, np.sort(candidate_rows), boost_rows, boost)
+
+    def benchmark(self, queries: np.ndarray, k: int, probes: Sequence[int],
+                  query_rows: Optional[Sequence[int]] = None) -> List[Dict[str, float]]:
+        # Queries taken from the index pass their rows as `query_rows`: a row always finds itself
+        # (in its own partition), so that match is left out of both result sets
+        query_rows = [None] * len(queries) if query_rows is None else list(query_rows)
+        fetch = k + 1 if any(row is not None for row in query_rows) else k
+
+        def neighbours(indices, query_row):
+            return set([row for row in indices.tolist() if row != query_row][:k])
+
+        exact_results, exact_times = [], []
+        for query_vector, query_row in zip(queries, query_rows):
+            start = time.perf_counter()
+            indices, _ = self.index.search(query_vector, fetch)
+            exact_times.append(time.perf_counter() - start)
+            exact_results.append(neighbours(indices, query_row))
+
+        report = [{
+            'n_probe': self.n_partitions,
+            'mode': 'exact',
+            'recall_at_k': 1.0,
+            'mean_ms': 1000 * float(np.mean(exact_times)),
+            'p95_ms': 1000 * float(np.percentile(exact_times, 95)),
+            'scanned_fraction': 1.0
+        }]
+        for n_probe in probes:
+            recalls, times, scanned = [], [], []
+            for query_vector, query_row, expected in zip(queries, query_rows, exact_results):
+                start = time.perf_counter()
+                indices, _ = self.search(query_vector, fetch, n_probe)
+                times.append(time.perf_counter() - start)
+                recalls.append(len(expected & neighbours(indices, query_row)) / max(len(expected), 1))
+                scanned.append(len(self.candidates(query_vector, n_probe)) / len(self.index))
+            report.append({
+                'n_probe': n_probe,
+                'mode': 'ann',
+                'recall_at_k': float(np.mean(recalls)),
+                'mean_ms': 1000 * float(np.mean(times)),
+                'p95_ms': 1000 * float(np.percentile(times, 95)),
+                'scanned_fraction': float(np.mean(scanned))
+            })
+        return report
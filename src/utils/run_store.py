@@ -0,0 +1,141 @@
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config.settings import RUNS_DIR, RUNS_MAX_AGE
+from src.utils.keyword_table import KeywordTable
+
+
+def _encode(value):
+    if isinstance(value, KeywordTable):
+        return {'__keyword_table__': value.to_dict()}
+    if isinstance(value, set):
+        return sorted(value)
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Cannot checkpoint {type(value).__name__}")
+
+
+def _decode(value: dict):
+    if '__keyword_table__' in value:
+        return KeywordTable.from_dict(value['__keyword_table__'])
+    return value
+
+
+class RunStore:
+    """Checkpoints of one brief run, kept in ``<RUNS_DIR>/<run id>/``.
+
+    ``job.json`` holds the job, ``<stage>.json`` the output of each finished stage and
+    ``urls.jsonl`` every competitor analysis as soon as its crawl is processed, so a resumed
+    run only crawls the URLs that had not finished. Files are replaced atomically, so an
+    interrupted write never leaves a half-written checkpoint behind. A finished run deletes
+    its checkpoints; creating a run purges those left by runs older than ``RUNS_MAX_AGE``.
+    """
+
+    def __init__(self, run_id: str, root: str = RUNS_DIR):
+        self.run_id = run_id
+        self.path = os.path.join(root, run_id)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, job: dict, root: str = RUNS_DIR) -> 'RunStore':
+        purge_runs(root)
+        store = cls(f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}", root)
+        os.makedirs(store.path)
+        store._write('job.json', {'job': job, 'created': time.time()})
+        return store
+
+    @classmethod
+    def open(cls, run_id: str, root: str = RUNS_DIR) -> 'RunStore':
+        store = cls(run_id, root)
+        if not os.path.exists(os.path.join(store.path, 'job.json')):
+            raise ValueError(f"No run '{run_id}' in {root}")
+        return store
+
+    @property
+    def job(self) -> dict:
+        job = self._read('job.json')['job']
+        if job.get('clusters') is not None:
+            job['clusters'] = set(job['clusters'])
+        return job
+
+    def _write(self, name: str, value) -> None:
+        temporary_path = os.path.join(self.path, f"{name}.tmp")
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            json.dump(value, file, ensure_ascii=False, default=_encode)
+        os.replace(temporary_path, os.path.join(self.path, name))
+
+    def _read(self, name: str):
+        with open(os.path.join(self.path, name), 'r', encoding='utf-8') as file:
+            return json.load(file, object_hook=_decode)
+
+    def save_stage(self, name: str, result) -> None:
+        with self._lock:
+            self._write(f"{name}.json", {'result': result, 'saved': time.time()})
+
+    def load_stages(self, names) -> Dict[str, object]:
+        return {
+            name: self._read(f"{name}.json")['result']
+            for name in names if os.path.exists(os.path.join(self.path, f"{name}.json"))
+        }
+
+    def save_url(self, url_data: dict) -> None:
+        line = json.dumps(url_data, ensure_ascii=False, default=_encode)
+        with self._lock, open(os.path.join(self.path, 'urls.jsonl'), 'a', encoding='utf-8') as file:
+            file.write(line + '\n')
+
+    def load_urls(self) -> List[dict]:
+        path = os.path.join(self.path, 'urls.jsonl')
+        if not os.path.exists(path):
+            return []
+        url_data = {}
+        with open(path, 'r', encoding='utf-8') as file:
+            for line in file:
+                try:
+                    data = json.loads(line, object_hook=_decode)
+                except ValueError:
+                    # A line cut short by a crash; that URL is simply processed again
+                    continue
+                url_data[data['url']] = data
+        return list(url_data.values())
+
+    def delete(self) -> None:
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def completed_stages(self) -> List[str]:
+        return sorted(name[:-len('.json')] for name in os.listdir(self.path)
+                      if name.endswith('.json') and name != 'job.json')
+
+
+def latest_run_id(root: str = RUNS_DIR) -> Optional[str]:
+    # Run ids start with their creation time, so the last one in name order is the newest
+    if not os.path.isdir(root):
+        return None
+    run_ids = sorted(name for name in os.listdir(root) if os.path.exists(os.path.join(root, name, 'job.json')))
+    return run_ids[-1] if run_ids else None
+
+
+def purge_runs(root: str = RUNS_DIR, max_age: float = RUNS_MAX_AGE) -> int:
+    # Checkpoints of failed or interrupted runs nobody resumed; a run's directory changes with every checkpoint
+    if not os.path.isdir(root):
+        return 0
+    cutoff = time.time() - max_age
+    purged = 0
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        try:
+            if os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+                purged += 1
+        except OSError:
+            # Removed by another process in the meantime
+            continue
+    return purged
@@ -0,0 +1,134 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.utils.tracing import span, propagate
+
+
+class Stage:
+    def __init__(self, name: str, fn: Callable, deps: Iterable[str] = ()):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+
+
+class StageGraph:
+    """Runs named stages on a thread pool as soon as the stages they depend on have finished.
+
+    Each stage function is called with its dependencies' results as keyword arguments.
+    A failing stage is recorded in ``errors`` and every stage downstream of it is skipped.
+    Stages whose results are passed to ``run`` (e.g. from a checkpoint) are not run again.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, Stage] = {}
+        self.results: Dict[str, object] = {}
+        self.errors: Dict[str, Exception] = {}
+        self.skipped: List[str] = []
+        self.resumed: List[str] = []
+        self.timings: Dict[str, Tuple[float, float]] = {}
+        self.wall_time = 0.0
+
+    def add(self, name: str, fn: Callable, deps: Iterable[str] = ()) -> 'StageGraph':
+        deps = tuple(deps)
+        unknown = [dep for dep in deps if dep not in self.stages]
+        if unknown:
+            raise ValueError(f"Stage '{name}' depends on unknown stages: {unknown}")
+        self.stages[name] = Stage(name, fn, deps)
+        return self
+
+    def _run_stage(self, stage: Stage, started_at: float):
+        start = time.perf_counter() - started_at
+        try:
+            with span(stage.name, 'stage'):
+                return stage.fn(**{dep: self.results[dep] for dep in stage.deps})
+        finally:
+            self.timings[stage.name] = (start, time.perf_counter() - started_at)
+
+    def run(self, results: Optional[Dict[str, object]] = None,
+            on_result: Optional[Callable[[str, object], None]] = None) -> Dict[str, object]:
+        # `on_result(name, result)` is called as each stage succeeds, e.g. to checkpoint it
+        started_at = time.perf_counter()
+        self.results.update({name: result for name, result in (results or {}).items() if name in self.stages})
+        self.resumed = [name for name in self.stages if name in self.results]
+        remaining = {name: stage for name, stage in self.stages.items() if name not in self.results}
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=max(len(self.stages), 1)) as executor:
+            while remaining or running:
+                for name, stage in list(remaining.items()):
+                    if any(dep in self.errors or dep in self.skipped for dep in stage.deps):
+                        self.skipped.append(name)
+                        del remaining[name]
+                    elif all(dep in self.results for dep in stage.deps):
+                        running[executor.submit(propagate(self._run_stage), stage, started_at)] = name
+                        del remaining[name]
+
+                if not running:
+                    # Only stages downstream of a skip are left; the next pass skips them too
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        self.results[name] = future.result()
+                    except Exception as e:
+                        print(f"Stage '{name}' failed: {e}")
+                        self.errors[name] = e
+                        continue
+                    if on_result is not None:
+                        try:
+                            on_result(name, self.results[name])
+                        except Exception as e:
+                            print(f"Could not save the result of stage '{name}': {e}")
+
+        self.wall_time = time.perf_counter() - started_at
+        return self.results
+
+    def critical_path(self) -> Tuple[float, List[str]]:
+        # Longest chain of stage durations through the dependency graph (stages are added in topological order)
+        finish: Dict[str, float] = {}
+        previous: Dict[str, str] = {}
+        for name, stage in self.stages.items():
+            if name not in self.timings:
+                continue
+            start, end = self.timings[name]
+            timed_deps = [dep for dep in stage.deps if dep in finish]
+            longest_dep = max(timed_deps, key=finish.get, default=None)
+            finish[name] = (end - start) + (finish[longest_dep] if longest_dep else 0.0)
+            if longest_dep:
+                previous[name] = longest_dep
+        if not finish:
+            return 0.0, []
+
+        name = max(finish, key=finish.get)
+        length = finish[name]
+        path = [name]
+        while path[-1] in previous:
+            path.append(previous[path[-1]])
+        return length, path[::-1]
+
+    def report(self) -> Dict[str, object]:
+        length, path = self.critical_path()
+        stage_times = {name: end - start for name, (start, end) in self.timings.items()}
+        return {
+            'wall_time': self.wall_time,
+            'stage_times': stage_times,
+            'serial_time': sum(stage_times.values()),
+            'critical_path_time': length,
+            'critical_path': path,
+            'errors': {name: str(error) for name, error in self.errors.items()},
+            'skipped': list(self.skipped),
+            'resumed': list(self.resumed)
+        }
+
+    def print_report(self) -> None:
+        report = self.report()
+        if self.resumed:
+            print(f"\nResumed from checkpoint: {', '.join(self.resumed)}")
+        print("\nStage timings:")
+        for name, (start, end) in sorted(self.timings.items(), key=lambda item: item[1][0]):
+            print(f"  {name:<24} {end - start:8.2f}s  (started at {start:.2f}s)")
+        print(f"Wall time: {report['wall_time']:.2f}s, sum of stage times: {report['serial_time']:.2f}s")
+        print(f"Critical path ({report['critical_path_time']:.2f}s): {' -> '.join(report['critical_path'])}")
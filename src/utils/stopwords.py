@@ -0,0 +1,43 @@
+import re
+from functools import lru_cache
+from typing import FrozenSet, Optional
+
+
+# Language codes whose NLTK stopword list is not simply the lowercased language name
+_NLTK_LANGUAGES = {
+    'ar': 'arabic', 'az': 'azerbaijani', 'da': 'danish', 'de': 'german', 'el': 'greek', 'en': 'english',
+    'es': 'spanish', 'fi': 'finnish', 'fr': 'french', 'hu': 'hungarian', 'id': 'indonesian', 'it': 'italian',
+    'kk': 'kazakh', 'ne': 'nepali', 'nl': 'dutch', 'no': 'norwegian', 'nb': 'norwegian', 'pt': 'portuguese',
+    'ro': 'romanian', 'ru': 'russian', 'sl': 'slovene', 'sv': 'swedish', 'tg': 'tajik', 'tr': 'turkish',
+    'he': 'hebrew', 'iw': 'hebrew', 'ca': 'catalan', 'eu': 'basque', 'zh': 'chinese', 'sq': 'albanian',
+}
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def _nltk_language(language: Optional[str]) -> Optional[str]:
+    if not language:
+        return None
+    language = language.strip().lower()
+    # "Norwegian (Bokmål)" -> "norwegian", "pt-BR" -> "pt"
+    name = language.split('(')[0].strip()
+    return _NLTK_LANGUAGES.get(name.split('-')[0], name)
+
+
+@lru_cache(maxsize=None)
+def stopwords_for(language: Optional[str] = None) -> FrozenSet[str]:
+    # Stopwords for a language name or code, always including English since competitor pages mix both
+    from nltk.corpus import stopwords  # NLTK is slow to import; only load it when stopwords are needed
+    words = set()
+    for name in dict.fromkeys(['english', _nltk_language(language)]):
+        if name is None:
+            continue
+        try:
+            words.update(stopwords.words(name))
+        except (LookupError, OSError):
+            print(f"No NLTK stopword list for '{name}'; run nltk.download('stopwords') to add it.")
+    return frozenset(words)
+
+
+def is_stopword_ngram(keyword: str, stop_words: FrozenSet[str]) -> bool:
+    # True for n-grams like "of the" that are made only of stopwords (or of no words at all)
+    return all(token in stop_words for token in _TOKEN.findall(keyword.lower()))
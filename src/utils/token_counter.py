@@ -0,0 +1,22 @@
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model: str):
+    # tiktoken is optional and imported on first use; without it a character-based estimate is used
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model: str = "text-embedding-3-large") -> int:
+    encoding = _get_encoding(model)
+    if encoding is None:
+        # Roughly four characters per token for English-like text
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
@@ -0,0 +1,252 @@
+import contextvars
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+# Numeric span attributes that are summed per span name and exported as metrics
+METRIC_ATTRIBUTES = ('retries', 'response_bytes', 'prompt_tokens', 'completion_tokens', 'cost')
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+_TASK_ID = re.compile(r'/[0-9a-f]{8}-?[0-9a-f-]{12,}$', re.IGNORECASE)
+
+
+def endpoint_name(path: str) -> str:
+    # "/v3/on_page/summary/<task id>" -> "/v3/on_page/summary/{id}", so calls group by endpoint
+    return _TASK_ID.sub('/{id}', path.split('?')[0])
+
+
+class Span:
+    """A timed operation within a trace, e.g. a pipeline stage or one outbound API call."""
+
+    def __init__(self, trace: Optional['Trace'], name: str, kind: str, parent_id: Optional[str], attributes: dict):
+        self.trace = trace
+        self.name = name
+        self.kind = kind
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = dict(attributes)
+        self.start_time = time.time()
+        self._started = time.perf_counter()
+        self.duration = None
+        self.error = None
+
+    def set(self, **attributes) -> 'Span':
+        self.attributes.update(attributes)
+        return self
+
+    def add(self, name: str, value=1) -> 'Span':
+        self.attributes[name] = self.attributes.get(name, 0) + value
+        return self
+
+    def fail(self, message: str) -> 'Span':
+        # For calls that return an error status instead of raising
+        self.error = message
+        return self
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._started
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        if self.trace is not None:
+            self.trace.record(self)
+        metrics.observe(self)
+
+    def to_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'kind': self.kind,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start_time': self.start_time,
+            'duration': self.duration,
+            'error': self.error,
+            'attributes': self.attributes
+        }
+
+
+class Trace:
+    """Spans recorded during one brief run, written out as a JSON document."""
+
+    def __init__(self, name: str, trace_id: Optional[str] = None, **attributes):
+        self.name = name
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.attributes = attributes
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def record(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def summary(self) -> Dict[str, dict]:
+        # Totals per kind ('stage', 'dataforseo', 'openai', ...): calls, seconds, errors and METRIC_ATTRIBUTES
+        with self._lock:
+            spans = list(self.spans)
+        totals = defaultdict(lambda: defaultdict(float))
+        for span in spans:
+            kind = totals[span.kind]
+            kind['calls'] += 1
+            kind['seconds'] += span.duration or 0.0
+            kind['errors'] += span.error is not None
+            for name in METRIC_ATTRIBUTES:
+                kind[name] += span.attributes.get(name) or 0
+        return {name: dict(values) for name, values in totals.items()}
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span.start_time)
+        return {
+            'trace_id': self.trace_id,
+            'name': self.name,
+            'attributes': self.attributes,
+            'summary': self.summary(),
+            'spans': [span.to_dict() for span in spans]
+        }
+
+    def write_json(self, directory: str) -> str:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.trace_id}.json")
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.to_dict(), file, ensure_ascii=False, default=str)
+        return path
+
+    def print_summary(self) -> None:
+        summary = self.summary()
+        for kind in ('dataforseo', 'openai'):
+            totals = summary.get(kind)
+            if not totals:
+                continue
+            details = [f"{totals['seconds']:.1f}s", f"{totals['response_bytes'] / 1024:.0f} KiB"]
+            if totals['retries']:
+                details.append(f"{totals['retries']:.0f} retries")
+            if totals['cost']:
+                details.append(f"${totals['cost']:.4f}")
+            print(f"{kind} calls: {totals['calls']:.0f} ({', '.join(details)}), {totals['errors']:.0f} failed")
+        llm = summary.get('llm')
+        openai = summary.get('openai') or {}
+        prompt_tokens = openai.get('prompt_tokens', 0) + (llm or {}).get('prompt_tokens', 0)
+        completion_tokens = openai.get('completion_tokens', 0) + (llm or {}).get('completion_tokens', 0)
+        if prompt_tokens or completion_tokens:
+            print(f"OpenAI tokens: {prompt_tokens:.0f} prompt, {completion_tokens:.0f} completion")
+
+
+class Metrics:
+    """Process-wide totals of finished spans per (kind, name), exported in the Prometheus text format.
+
+    The textfile is meant for node_exporter's textfile collector; counters accumulate over every
+    run in the process, so a batch exports its running totals after each brief.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = defaultdict(lambda: defaultdict(float))
+
+    def observe(self, span: Span) -> None:
+        with self._lock:
+            totals = self._totals[(span.kind, span.name)]
+            totals['count'] += 1
+            totals['seconds'] += span.duration or 0.0
+            totals['errors'] += span.error is not None
+            for name in METRIC_ATTRIBUTES:
+                value = span.attributes.get(name)
+                if isinstance(value, (int, float)):
+                    totals[name] += value
+
+    def reset(self) -> None:
+        with self._lock:
+            self._totals.clear()
+
+    def prometheus(self) -> str:
+        families = [
+            ('count', 'brief_span_total', 'counter', "Finished spans"),
+            ('seconds', 'brief_span_seconds_total', 'counter', "Time spent in spans"),
+            ('errors', 'brief_span_errors_total', 'counter', "Spans that ended with an error"),
+            ('retries', 'brief_span_retries_total', 'counter', "Retries made by outbound calls"),
+            ('response_bytes', 'brief_span_response_bytes_total', 'counter', "Response body bytes received"),
+            ('prompt_tokens', 'brief_span_prompt_tokens_total', 'counter', "OpenAI prompt tokens"),
+            ('completion_tokens', 'brief_span_completion_tokens_total', 'counter', "OpenAI completion tokens"),
+            ('cost', 'brief_span_cost_dollars_total', 'counter', "Cost reported by DataForSEO"),
+        ]
+        with self._lock:
+            totals = {key: dict(values) for key, values in self._totals.items()}
+        lines = []
+        for field, metric, metric_type, description in families:
+            samples = [(key, values[field]) for key, values in sorted(totals.items()) if values.get(field)]
+            if not samples and field != 'count':
+                continue
+            lines.append(f"# HELP {metric} {description}")
+            lines.append(f"# TYPE {metric} {metric_type}")
+            for (kind, name), value in samples:
+                lines.append(f'{metric}{{kind="{_label(kind)}",name="{_label(name)}"}} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path: str) -> None:
+        # Written to a temporary file and renamed so the collector never reads a partial file
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            file.write(self.prometheus())
+        os.replace(temporary_path, path)
+
+
+def _label(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+metrics = Metrics()
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def start_span(name: str, kind: str = 'internal', **attributes) -> Span:
+    # Starts a span under the current one without making it current; the caller must call end()
+    parent = _current_span.get()
+    return Span(parent.trace if parent else None, name, kind, parent.span_id if parent else None, attributes)
+
+
+@contextmanager
+def span(name: str, kind: str = 'internal', **attributes):
+    current = start_span(name, kind, **attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.end(e)
+        raise
+    else:
+        current.end()
+    finally:
+        _current_span.reset(token)
+
+
+@contextmanager
+def trace(name: str, trace_id: Optional[str] = None, **attributes):
+    # Root of a run: spans opened inside it (and in threads started with `propagate`) belong to the trace
+    run = Trace(name, trace_id, **attributes)
+    root = Span(run, name, 'run', None, attributes)
+    token = _current_span.set(root)
+    try:
+        yield run
+    except BaseException as e:
+        root.end(e)
+        raise
+    else:
+        root.end()
+    finally:
+        _current_span.reset(token)
+
+
+def propagate(fn):
+    # Wraps `fn` so it runs in the caller's tracing context when called from a worker thread
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.copy().run(fn, *args, **kwargs)
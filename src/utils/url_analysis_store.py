@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, Hashable, Iterable, List, Tuple
+
+from config.settings import URL_ANALYSIS_MAX_AGE, URL_ANALYSIS_MAX_ENTRIES
+
+
+class URLAnalysisStore:
+    """Competitor URL analyses shared by every brief in the process, with single-flight semantics.
+
+    The first brief to ``claim`` a URL owns its crawl; briefs claiming it meanwhile get the
+    owner's Future instead of starting their own on-page task. Finished analyses are reused
+    for ``max_age`` seconds; a failed analysis is dropped so the next claim tries again.
+    """
+
+    def __init__(self, max_age: float = URL_ANALYSIS_MAX_AGE, max_entries: int = URL_ANALYSIS_MAX_ENTRIES):
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Hashable, Tuple[Future, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.requested = 0
+        self.analysed = 0
+        self.reused = 0
+        self.coalesced = 0
+
+    def claim(self, keys: Iterable[Hashable]) -> Tuple[List[Hashable], Dict[Hashable, Future]]:
+        # Returns the keys the caller must analyse itself (and then resolve) and Futures for the rest
+        owned, shared = [], {}
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                self.requested += 1
+                entry = self._entries.get(key)
+                if entry is not None:
+                    future, finished = entry
+                    if not future.done():
+                        self.coalesced += 1
+                        shared[key] = future
+                        continue
+                    if now - finished <= self.max_age:
+                        self.reused += 1
+                        self._entries.move_to_end(key)
+                        shared[key] = future
+                        continue
+                self.analysed += 1
+                self._entries[key] = (Future(), float('inf'))
+                self._entries.move_to_end(key)
+                owned.append(key)
+            self._evict()
+        return owned, shared
+
+    def resolve(self, key: Hashable, analysis) -> None:
+        # Hands the owner's result (None if the URL could not be analysed) to every waiting brief
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0].done():
+                return
+            future = entry[0]
+            if analysis is None:
+                del self._entries[key]
+            else:
+                self._entries[key] = (future, time.monotonic())
+        future.set_result(analysis)
+
+    def _evict(self) -> None:
+        # Oldest finished entries go first; in-flight crawls are never evicted
+        excess = len(self._entries) - self.max_entries
+        for key in list(self._entries):
+            if excess <= 0:
+                break
+            if self._entries[key][0].done():
+                del self._entries[key]
+                excess -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            saved = self.reused + self.coalesced
+            return {
+                'requested': self.requested,
+                'analysed': self.analysed,
+                'reused': self.reused,
+                'coalesced': self.coalesced,
+                'dedup_ratio': saved / self.requested if self.requested else 0.0
+            }
+
+    def report(self) -> None:
+        stats = self.stats()
+        print(f"URL analyses: {stats['requested']} requested, {stats['analysed']} crawled, {stats['reused']} reused, "
+              f"{stats['coalesced']} joined in flight (dedup {stats['dedup_ratio']:.1%})")
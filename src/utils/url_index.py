@@ -0,0 +1,170 @@
+import json
+import os
+import uuid
+from hashlib import sha1
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from config.settings import URL_INDEX_DIR
+
+
+# build() reads the manifest itself unless it is given the one load() already read (which may be None)
+_UNREAD = object()
+
+
+def _row_hash(url: str, h1: str) -> str:
+    return sha1(f"{url}\t{h1}".encode('utf-8')).hexdigest()
+
+
+class URLEmbeddingIndex:
+    """Normalized H1 embedding matrix for one URL database, stored next to a row manifest.
+
+    The matrix lives in ``embeddings-<version>.npy`` and is memory-mapped on load; ``manifest.json``
+    names that file and holds the url/h1/cluster of each row plus a hash of url+h1 so a rebuild
+    only embeds rows that were added or changed in the CSV.
+    """
+
+    def __init__(self, db_name: str, csv_path: str, embedding_service, index_dir: str = URL_INDEX_DIR):
+        self.db_name = db_name
+        self.csv_path = csv_path
+        self.embedding_service = embedding_service
+        self.directory = os.path.join(index_dir, db_name)
+        self.matrix_path = os.path.join(self.directory, 'embeddings.npy')
+        self.manifest_path = os.path.join(self.directory, 'manifest.json')
+        self.urls: List[str] = []
+        self.h1s: List[str] = []
+        self.clusters: List[str] = []
+        self.matrix: Optional[np.ndarray] = None
+        self.fingerprint = ''
+        self.postings: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.urls)
+
+    def _matrix_path(self, manifest: dict) -> str:
+        # Indexes written before matrix files were versioned use the fixed name
+        return os.path.join(self.directory, manifest.get('matrix', 'embeddings.npy'))
+
+    def _read_manifest(self) -> Optional[dict]:
+        if not os.path.exists(self.manifest_path):
+            return None
+        with open(self.manifest_path, 'r') as file:
+            manifest = json.load(file)
+        if not os.path.exists(self._matrix_path(manifest)):
+            return None
+        if 'fingerprint' not in manifest or manifest.get('model') != self.embedding_service.cache_model:
+            print(f"Index for {self.db_name} was built with {manifest.get('model')}; rebuilding.")
+            return None
+        return manifest
+
+    def load(self) -> 'URLEmbeddingIndex':
+        manifest = self._read_manifest()
+        stat = os.stat(self.csv_path)
+        if manifest is None or manifest['csv_mtime'] != stat.st_mtime or manifest['csv_size'] != stat.st_size:
+            manifest = self.build(manifest)
+        self.urls, self.h1s, self.clusters = manifest['urls'], manifest['h1s'], manifest['clusters']
+        self.fingerprint = manifest['fingerprint']
+        self.matrix_path = self._matrix_path(manifest)
+        self.matrix = np.load(self.matrix_path, mmap_mode='r')
+        self._build_postings()
+        return self
+
+    def _build_postings(self) -> None:
+        # cluster -> sorted row indices, so cluster selection never has to scan every row
+        names, labels = np.unique(np.asarray(self.clusters, dtype=object), return_inverse=True)
+        order = np.argsort(labels, kind='stable')
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(labels, minlength=len(names)))))
+        self.postings = {name: order[offsets[i]:offsets[i + 1]] for i, name in enumerate(names)}
+
+    def cluster_rows(self, clusters: Iterable[str]) -> np.ndarray:
+        selected = [self.postings[cluster] for cluster in set(clusters) if cluster in self.postings]
+        if not selected:
+            return np.empty(0, dtype=np.int64)
+        return selected[0] if len(selected) == 1 else np.sort(np.concatenate(selected))
+
+    def build(self, previous: Optional[dict] = _UNREAD) -> dict:
+        if previous is _UNREAD:
+            previous = self._read_manifest()
+
+        import pandas as pd
+        db_data = pd.read_csv(self.csv_path)
+        db_data = db_data[db_data['h1'].notna() & (db_data['h1'].astype(str).str.strip() != '')]
+        urls = db_data['url'].astype(str).tolist()
+        h1s = db_data['h1'].astype(str).tolist()
+        clusters = db_data['cluster_name'].fillna('').astype(str).tolist()
+        hashes = [_row_hash(url, h1) for url, h1 in zip(urls, h1s)]
+
+        old_rows = {}
+        old_matrix = None
+        if previous is not None:
+            old_rows = {row_hash: i for i, row_hash in enumerate(previous['hashes'])}
+            old_matrix = np.load(self._matrix_path(previous), mmap_mode='r')
+
+        delta = [i for i, row_hash in enumerate(hashes) if row_hash not in old_rows]
+        print(f"Building index for {self.db_name}: {len(hashes)} rows, {len(delta)} new or changed")
+        new_vectors = self.embedding_service.embed([h1s[i] for i in delta], normalize=True) if delta else None
+
+        dim = new_vectors.shape[1] if new_vectors is not None else (old_matrix.shape[1] if old_matrix is not None else 0)
+        matrix = np.zeros((len(hashes), dim), dtype=np.float32)
+        reused = [(i, old_rows[row_hash]) for i, row_hash in enumerate(hashes) if row_hash in old_rows]
+        if reused:
+            new_idx, old_idx = map(list, zip(*reused))
+            matrix[new_idx] = old_matrix[old_idx]
+        if delta:
+            matrix[delta] = new_vectors
+        del old_matrix
+
+        stat = os.stat(self.csv_path)
+        matrix_name = f"embeddings-{uuid.uuid4().hex[:12]}.npy"
+        manifest = {
+            'model': self.embedding_service.cache_model,
+            'matrix': matrix_name,
+            'fingerprint': sha1('\n'.join(hashes).encode('utf-8')).hexdigest(),
+            'csv_mtime': stat.st_mtime,
+            'csv_size': stat.st_size,
+            'hashes': hashes,
+            'urls': urls,
+            'h1s': h1s,
+            'clusters': clusters
+        }
+
+        # The new matrix gets its own file and the manifest pointing to it is swapped in last, so a crash
+        # at any point leaves either the old index or the new one, never a matrix with the wrong manifest
+        os.makedirs(self.directory, exist_ok=True)
+        matrix_path = os.path.join(self.directory, matrix_name)
+        tmp_matrix_path = matrix_path + '.tmp.npy'
+        tmp_manifest_path = self.manifest_path + '.tmp'
+        np.save(tmp_matrix_path, matrix)
+        os.replace(tmp_matrix_path, matrix_path)
+        with open(tmp_manifest_path, 'w') as file:
+            json.dump(manifest, file)
+        os.replace(tmp_manifest_path, self.manifest_path)
+        for name in os.listdir(self.directory):
+            if name.startswith('embeddings') and name.endswith('.npy') and name != matrix_name:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    # Still mapped by another process on platforms that forbid it; removed by a later build
+                    pass
+        return manifest
+
+    def search(self, query_vector: np.ndarray, k: int, rows: Optional[np.ndarray] = None,
+               boost_rows: Optional[np.ndarray] = None, boost: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+        matrix = self.matrix if rows is None else self.matrix[rows]
+        similarities = matrix @ query_vector
+        ranking = similarities
+        if boost and boost_rows is not None and len(boost_rows):
+            ranking = similarities.copy()
+            if rows is None:
+                ranking[boost_rows] += boost
+            else:
+                ranking[np.isin(rows, boost_rows, assume_unique=True)] += boost
+
+        k = min(k, len(ranking))
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        top = np.argpartition(-ranking, k - 1)[:k]
+        top = top[np.argsort(-ranking[top])]
+        indices = top if rows is None else rows[top]
+        return indices, similarities[top]
@@ -1,6 +1,5 @@
-import tldextract
-
 def parse_url(url):
+    import tldextract  # slow to import (it loads the public suffix list machinery); only needed here
     extracted = tldextract.extract(url)
     domain = f"{extracted.domain}.{extracted.suffix}"
     full_url = url if url.startswith(('http://', 'https://')) else f"https://{url}"
@@ -1,71 +1,200 @@
+import logging
 import time
-from nltk.corpus import stopwords
+import uuid
+from http.client import HTTPException
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, TimeoutError, as_completed, wait
+from config.settings import (
+    TASK_POLL_INITIAL_DELAY, TASK_POLL_MAX_DELAY, TASK_READY_TIMEOUT,
+    ONPAGE_TASK_BATCH_SIZE, ONPAGE_INSTANT_BATCH_SIZE, MAX_WORKERS
+)
+from src.api.backoff import backoff_delays
 from src.utils.url_parser import parse_url
+from src.utils.stopwords import stopwords_for, is_stopword_ngram
+from src.utils.keyword_table import KeywordTable
+from src.utils.tracing import propagate
 
-stop_words = set(stopwords.words('english'))
+logger = logging.getLogger(__name__)
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
 
 class URLProcessor:
-    def __init__(self, client, username, password):
+    def __init__(self, client, username, password, max_workers=MAX_WORKERS, analysis_store=None):
         self.client = client
         self.username = username
         self.password = password
+        # Threads fetching keyword density for finished crawls
+        self.max_workers = max_workers
+        # URLAnalysisStore shared with the other briefs in the process; without one every URL is crawled
+        self.analysis_store = analysis_store
 
-    def process_url(self, keyword, url):
-        page_details = self.get_on_page_data(url)
-        if not page_details:
-            return None
+    def process_urls(self, keyword, urls, language=None):
+        urls = list(dict.fromkeys(urls))
+        if self.analysis_store is None:
+            yield from self._crawl_urls(urls, language)
+            return
 
-        task_id = self.create_onpage_task(url)
-        if not task_id:
-            return None
+        # Analyses depend on the language's stop words, so a URL is shared per language
+        owned, shared = self.analysis_store.claim([(url, language) for url in urls])
+        if shared:
+            print(f"Sharing {len(shared)} URL analyses with other briefs.")
+        unresolved = set(owned)
+        waiting = {future: url for (url, _), future in shared.items()}
+
+        def shared_result(future, url):
+            # Copies, since callers take the keyword table out of the analysis they receive
+            try:
+                url_data = future.result()
+            except Exception as e:
+                print(f"Error processing URL {url}: {str(e)}")
+                return None
+            return dict(url_data) if url_data else None
+
+        def finished():
+            for future in [future for future in waiting if future.done()]:
+                url_data = shared_result(future, waiting.pop(future))
+                if url_data:
+                    yield url_data
+
+        try:
+            yield from finished()
+            for url_data in self._crawl_urls([url for url, _ in owned], language) if owned else ():
+                self.analysis_store.resolve((url_data['url'], language), url_data)
+                unresolved.discard((url_data['url'], language))
+                yield dict(url_data)
+                yield from finished()
+        finally:
+            # Waiting briefs get None for URLs this crawl could not analyse; the next claim retries them
+            for key in unresolved:
+                self.analysis_store.resolve(key, None)
+
+        try:
+            for future in as_completed(list(waiting), timeout=TASK_READY_TIMEOUT):
+                url_data = shared_result(future, waiting[future])
+                if url_data:
+                    yield url_data
+        except TimeoutError:
+            for future, url in waiting.items():
+                if not future.done():
+                    print(f"Analysis of {url} by another brief did not finish within {TASK_READY_TIMEOUT} seconds.")
+
+    def _crawl_urls(self, urls, language=None):
+        stop_words = stopwords_for(language)
+        page_details = self.get_on_page_data_bulk(urls)
+        crawlable = [url for url in urls if page_details.get(url)]
+        # URLs whose keyword density is already cached need no new crawl; the cached responses are
+        # used as they are, since an entry could expire before it was requested again
+        cached = {}
+        for url in crawlable:
+            keyword_density_list = self.cached_keyword_density(url)
+            if keyword_density_list is not None:
+                cached[url] = keyword_density_list
+        task_ids = self.create_onpage_tasks([url for url in crawlable if url not in cached])
+        if not task_ids and not cached:
+            return
 
-        print(f"Waiting for 35 seconds before fetching keyword density for {url}....")
-        time.sleep(35)
+        pending = {task_id: url for url, task_id in task_ids.items()}
+        deadline = time.monotonic() + TASK_READY_TIMEOUT
+        delays = backoff_delays(TASK_POLL_INITIAL_DELAY, TASK_POLL_MAX_DELAY)
+        if pending:
+            print(f"Waiting for {len(pending)} on-page tasks to finish....")
 
-        keyword_density_list = self.get_keyword_density(task_id, url)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(propagate(self._collect_url_data), None, url, page_details[url], stop_words,
+                                       keyword_density_list): url
+                       for url, keyword_density_list in cached.items()}
+            while pending or futures:
+                if pending and time.monotonic() >= deadline:
+                    for url in pending.values():
+                        print(f"On-page task for {url} did not finish within {TASK_READY_TIMEOUT} seconds.")
+                    pending.clear()
+
+                if pending:
+                    for task_id in self.get_ready_tasks(pending):
+                        url = pending.pop(task_id)
+                        futures[executor.submit(propagate(self._collect_url_data), task_id, url, page_details[url], stop_words)] = url
+
+                # Hand back finished URLs while the remaining crawls are still being polled
+                timeout = min(next(delays), max(deadline - time.monotonic(), 0)) if pending else None
+                if futures:
+                    done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        url = futures.pop(future)
+                        # One failing URL must not end the stream for the others
+                        try:
+                            url_data = future.result()
+                        except Exception as e:
+                            print(f"Error processing URL {url}: {str(e)}")
+                            continue
+                        if url_data:
+                            yield url_data
+                elif pending:
+                    time.sleep(timeout)
+
+    def _collect_url_data(self, task_id, url, page_details, stop_words=None, keyword_density_list=None):
+        stop_words = stopwords_for() if stop_words is None else stop_words
+        if keyword_density_list is None:
+            keyword_density_list = self.get_keyword_density(task_id, url)
         if not keyword_density_list:
             return None
 
-        all_items = []
-        for keyword_density in keyword_density_list:
-            if keyword_density.get('items'):
-                all_items.extend(keyword_density['items'])
-
-        if not all_items:
+        items = (item for keyword_density in keyword_density_list for item in keyword_density.get('items') or [])
+        keywords = KeywordTable.from_items(url, items, keep=lambda keyword: not is_stopword_ngram(keyword, stop_words))
+        if not len(keywords):
             print(f"No keyword items found for {url}.")
             return None
 
-        relevant_keywords = [
-            {**kw, 'similarity': 0}  # Initialize similarity to 0, will be calculated later
-            for kw in all_items
-            if kw['keyword'] not in stop_words
-        ]
-        relevant_keywords.sort(key=lambda x: x['frequency'], reverse=True)
-
         return {
             'url': url,
             'headings': page_details['headings'],
             'images_count': page_details['images_count'],
             'plain_text_word_count': page_details['plain_text_word_count'],
-            'relevant_keywords': relevant_keywords[:10],
-            'all_keywords': relevant_keywords
+            'relevant_keywords': keywords.top(10).records(),
+            'keywords': keywords
         }
 
-    def get_on_page_data(self, url):
-        post_data = {
-            str(int(time.time())): {
-                "url": url,
-                "enable_javascript": False
-            }
-        }
-        response = self.client.post("/v3/on_page/instant_pages", post_data)
-        
-        if response["status_code"] == 20000:
+    def _post_tagged_tasks(self, path, tasks_by_url, batch_size):
+        # Every task carries a unique tag so results can be matched back to their URL
+        # regardless of the order DataForSEO returns them in
+        results = {}
+        for batch in _chunks(list(tasks_by_url.items()), batch_size):
+            tags = {}
+            post_data = []
+            for url, task in batch:
+                tag = uuid.uuid4().hex
+                tags[tag] = url
+                post_data.append({**task, "tag": tag})
+
+            response = self.client.post(path, post_data)
+            if response["status_code"] != 20000:
+                print(f"Error. Code: {response['status_code']} Message: {response.get('status_message', 'Unknown error')}")
+                continue
+
+            for task in response.get("tasks") or []:
+                url = tags.get((task.get("data") or {}).get("tag"))
+                if url is None:
+                    continue
+                if task.get("status_code", 0) >= 40000:
+                    print(f"Task for {url} failed. Code: {task['status_code']} Message: {task.get('status_message')}")
+                    continue
+                results[url] = task
+        return results
+
+    def get_on_page_data_bulk(self, urls):
+        tasks = self._post_tagged_tasks(
+            "/v3/on_page/instant_pages",
+            {url: {"url": url, "enable_javascript": False} for url in urls},
+            ONPAGE_INSTANT_BATCH_SIZE
+        )
+
+        page_details = {}
+        for url in urls:
+            task = tasks.get(url)
             try:
-                tasks = response.get("tasks", [])
-                if tasks and isinstance(tasks[0].get("result"), list) and tasks[0]["result"]:
-                    item = tasks[0]["result"][0].get("items", [{}])[0]
-                    return {
+                if task and isinstance(task.get("result"), list) and task["result"]:
+                    item = task["result"][0].get("items", [{}])[0]
+                    page_details[url] = {
                         "url": item.get("url", url),
                         "headings": item.get("meta", {}).get("htags", {}),
                         "images_count": item.get("meta", {}).get("images_count", 0),
@@ -73,19 +202,15 @@ class URLProcessor:
                     }
                 else:
                     print(f"No valid data found in the response for URL: {url}")
-                    return None
             except (KeyError, IndexError) as e:
-                print(f"Error extracting data: {e}")
-                return None
-        else:
-            print(f"Error. Code: {response['status_code']} Message: {response.get('status_message', 'Unknown error')}")
-            return None
+                print(f"Error extracting data for {url}: {e}")
+        return page_details
 
-    def create_onpage_task(self, url):
-        domain, full_url = parse_url(url)
-        task_id = str(int(time.time()))
-        post_data = {
-            task_id: {
+    def create_onpage_tasks(self, urls):
+        tasks_by_url = {}
+        for url in urls:
+            domain, full_url = parse_url(url)
+            tasks_by_url[url] = {
                 "target": domain,
                 "max_crawl_pages": 1,
                 "start_url": full_url,
@@ -95,54 +220,91 @@ class URLProcessor:
                 "respect_robots_txt": True,
                 "custom_user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
             }
-        }
 
-        response = self.client.post("/v3/on_page/task_post", post_data)
-        print("On-Page Task Response:", response)
+        tasks = self._post_tagged_tasks("/v3/on_page/task_post", tasks_by_url, ONPAGE_TASK_BATCH_SIZE)
+        task_ids = {url: task['id'] for url, task in tasks.items()}
+        print(f"Created {len(task_ids)} of {len(urls)} on-page tasks.")
+        return task_ids
 
-        if response["status_code"] == 20000 and 'tasks' in response and len(response['tasks']) > 0:
-            task_id = response['tasks'][0]['id']
-            print("Task ID:", task_id)
-            return task_id
-        else:
-            print(f"Error creating task. Code: {response['status_code']} Message: {response['status_message']}")
-            return None
+    def get_ready_tasks(self, task_ids):
+        # One tasks_ready call covers every pending task; fall back to per-task summaries if it fails
+        response = self.client.get("/v3/on_page/tasks_ready")
+        if response["status_code"] == 20000 and response.get("tasks"):
+            ready = {
+                item["id"] for task in response["tasks"] for item in (task.get("result") or [])
+            }
+            return [task_id for task_id in task_ids if task_id in ready]
+        return [task_id for task_id in task_ids if self.is_task_ready(task_id)]
 
-    def get_keyword_density(self, task_id, url, retries=5, delay=35):
-        all_results = []
-        for keyword_length in range(1, 5):  # 1, 2, 3, 4
-            for attempt in range(retries):
-                post_data = {
-                    0: {
-                        "id": task_id,
-                        "url": url,
-                        "keyword_length": keyword_length,
-                        "filters": ["frequency", ">", 5]
-                    }
-                }
+    def is_task_ready(self, task_id):
+        response = self.client.get(f"/v3/on_page/summary/{task_id}")
+        if response["status_code"] != 20000 or not response.get("tasks"):
+            return False
+        result = response["tasks"][0].get("result")
+        return bool(result) and result[0].get("crawl_progress") == "finished"
+
+    def get_keyword_density(self, task_id, url, retries=5):
+        # The crawl is finished by now, so all n-gram lengths can be fetched at once
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = executor.map(
+                propagate(lambda keyword_length: self._get_keyword_density_for_length(task_id, url, keyword_length, retries)),
+                range(1, 5)  # 1, 2, 3, 4
+            )
+            all_results = [item for result in results for item in result]
+
+        return all_results if all_results else None
 
+    @staticmethod
+    def _keyword_density_task(task_id, url, keyword_length):
+        return {
+            "id": task_id,
+            "url": url,
+            "keyword_length": keyword_length,
+            "filters": ["frequency", ">", 5]
+        }
+
+    def cached_keyword_density(self, url):
+        # Keyword density of every n-gram length from the response cache, or None if any length is missing
+        peek = getattr(self.client, 'peek', None)
+        if peek is None:
+            return None
+        keyword_density_list = []
+        for keyword_length in range(1, 5):
+            task_response = peek("/v3/on_page/keyword_density", self._keyword_density_task(None, url, keyword_length))
+            if not task_response:
+                return None
+            keyword_density_list.extend(task_response.get('result') or [])
+        return keyword_density_list
+
+    def _get_keyword_density_for_length(self, task_id, url, keyword_length, retries):
+        # Only called once the crawl has finished, so an empty result is final; only a task that is
+        # not found yet (40400) or a failed request is retried
+        post_data = {0: self._keyword_density_task(task_id, url, keyword_length)}
+        delays = backoff_delays(TASK_POLL_INITIAL_DELAY, TASK_POLL_MAX_DELAY)
+        for attempt in range(retries):
+            try:
                 response = self.client.post("/v3/on_page/keyword_density", post_data)
-                print(f"Attempt {attempt + 1} for keyword length {keyword_length}: Keyword Density Response:", response)
-
-                if response["status_code"] == 20000:
-                    if 'tasks' in response and len(response['tasks']) > 0:
-                        result = response['tasks'][0].get('result')
-                        if result:
-                            all_results.extend(result)
-                            break  # Success, move to next keyword length
-                        else:
-                            print(f"No results found for keyword length {keyword_length}. The task might still be processing.")
-                    else:
-                        print(f"No tasks found in the response for keyword length {keyword_length}.")
-                elif response["status_code"] == 40400:  # Not Found error
-                    print(f"Task not ready yet for keyword length {keyword_length}. Waiting {delay} seconds before retry...")
+            except (OSError, HTTPException) as e:
+                print(f"Request failed for keyword length {keyword_length}: {str(e)}")
+                response = None
+            if response is not None:
+                # The full response can be megabytes of keywords; it is only formatted when DEBUG is enabled
+                logger.debug("Keyword density attempt %d for %s (length %d): %s", attempt + 1, url, keyword_length, response)
+                task = (response.get('tasks') or [{}])[0]
+                if response["status_code"] == 40400 or task.get('status_code') == 40400:
+                    print(f"Task not ready yet for keyword length {keyword_length}.")
+                elif response["status_code"] == 20000 and response.get('tasks'):
+                    if not task.get('result'):
+                        print(f"No keyword density results for {url} (keyword length {keyword_length}).")
+                    return task.get('result') or []
                 else:
                     print(f"Error for keyword length {keyword_length}. Code: {response['status_code']} Message: {response['status_message']}")
-                
-                if attempt < retries - 1:
-                    print(f"Retrying in {delay} seconds...")
-                    time.sleep(delay)
-            else:
-                print(f"Max retries reached for keyword length {keyword_length}. Could not retrieve keyword density data.")
-        
-        return all_results if all_results else None
\ No newline at end of file
+                    return []
+
+            if attempt < retries - 1:
+                delay = next(delays)
+                print(f"Retrying in {delay:.1f} seconds...")
+                time.sleep(delay)
+
+        print(f"Max retries reached for keyword length {keyword_length}. Could not retrieve keyword density data.")
+        return []
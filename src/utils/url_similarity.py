@@ -1,81 +1,125 @@
-import pandas as pd
+import csv
 import os
-from typing import List, Dict, Optional
-from config.settings import URL_DATABASES_DIR, MAX_POTENTIAL_OUTLINKS
-from openai import OpenAI
+import threading
+from typing import Iterable, List, Dict, Optional
+from config.settings import (
+    URL_DATABASES_DIR, URL_INDEX_DIR, MAX_POTENTIAL_OUTLINKS, OUTLINK_SEARCH_MODE, ANN_PARTITIONS, ANN_N_PROBE,
+    CLUSTER_BOOST
+)
 import numpy as np
+from src.analysis.embedding_service import EmbeddingService
+from src.utils.url_index import URLEmbeddingIndex
+from src.utils.partitioned_index import PartitionedIndex
 
 class URLSimilarityAnalyzer:
-    def __init__(self, openai_api_key):
-        self.databases = self._load_databases()
-        self.client = OpenAI(api_key=openai_api_key)
+    def __init__(self, openai_api_key, embedding_service: Optional[EmbeddingService] = None,
+                 search_mode: str = OUTLINK_SEARCH_MODE, n_probe: int = ANN_N_PROBE, index_dir: str = URL_INDEX_DIR):
+        if search_mode not in ('exact', 'ann'):
+            raise ValueError("Invalid search mode. Use 'exact' or 'ann'.")
+        # The API key is kept for compatibility; remote embeddings use the shared OpenAI client
+        self.embedding_service = embedding_service or EmbeddingService()
+        self.search_mode = search_mode
+        self.n_probe = n_probe
+        self.index_dir = index_dir
+        self.indexes: Dict[str, URLEmbeddingIndex] = {}
+        self.partitioned_indexes: Dict[str, PartitionedIndex] = {}
+        self.clusters: Dict[str, List[str]] = {}
+        self._index_lock = threading.Lock()
 
-    def _load_databases(self) -> Dict[str, pd.DataFrame]:
-        databases = {}
-        for filename in os.listdir(URL_DATABASES_DIR):
-            if filename.endswith('.csv'):
-                db_name = filename[:-4]  # Remove .csv extension
-                file_path = os.path.join(URL_DATABASES_DIR, filename)
-                databases[db_name] = pd.read_csv(file_path)
-        print(f"Loaded databases: {list(databases.keys())}")
-        return databases
+    @staticmethod
+    def _database_path(db_name: str) -> str:
+        return os.path.join(URL_DATABASES_DIR, f"{db_name}.csv")
+
+    def has_database(self, db_name: str) -> bool:
+        return bool(db_name) and os.path.isfile(self._database_path(db_name))
+
+    def get_index(self, db_name: str) -> URLEmbeddingIndex:
+        with self._index_lock:
+            if db_name not in self.indexes:
+                self.indexes[db_name] = URLEmbeddingIndex(
+                    db_name, self._database_path(db_name), self.embedding_service, self.index_dir
+                ).load()
+            return self.indexes[db_name]
+
+    def get_partitioned_index(self, db_name: str) -> PartitionedIndex:
+        index = self.get_index(db_name)
+        with self._index_lock:
+            if db_name not in self.partitioned_indexes:
+                self.partitioned_indexes[db_name] = PartitionedIndex(index, ANN_PARTITIONS).load()
+            return self.partitioned_indexes[db_name]
+
+    def warm(self, db_name: str) -> threading.Thread:
+        # Loads (or builds) the index in the background, e.g. while the user is still answering prompts
+        def load():
+            try:
+                self.get_index(db_name)
+            except Exception as e:
+                print(f"Error preparing the index for {db_name}: {e}")
+        thread = threading.Thread(target=load, daemon=True)
+        thread.start()
+        return thread
 
     def get_available_databases(self) -> List[str]:
-        return list(self.databases.keys())
+        # Databases are only listed here; a CSV is parsed when it is first searched
+        if not os.path.isdir(URL_DATABASES_DIR):
+            return []
+        return sorted(filename[:-4] for filename in os.listdir(URL_DATABASES_DIR) if filename.endswith('.csv'))
 
     def get_clusters_for_database(self, db_name: str) -> List[str]:
-        if db_name not in self.databases:
+        if not self.has_database(db_name):
             print(f"Error: Database '{db_name}' not found.")
             return []
-        return self.databases[db_name]['cluster_name'].unique().tolist()
+        if db_name not in self.clusters:
+            # The csv module is enough for one column and keeps pandas out of the interactive prompts
+            with open(self._database_path(db_name), 'r', encoding='utf-8', newline='') as file:
+                cluster_names = (row.get('cluster_name') for row in csv.DictReader(file))
+                self.clusters[db_name] = list(dict.fromkeys(name for name in cluster_names if name))
+        return self.clusters[db_name]
 
-    def find_potential_outlinks(self, target_keyword: str, db_name: str, cluster_name: Optional[str] = None, hard_clustering: bool = False) -> List[Dict[str, str]]:
+    def find_potential_outlinks(self, target_keyword: str, db_name: str, clusters: Optional[Iterable[str]] = None,
+                                hard_clustering: bool = False, cluster_boost: float = CLUSTER_BOOST) -> List[Dict[str, str]]:
+        clusters = set(clusters) if clusters else set()
         print(f"Finding potential outlinks for keyword '{target_keyword}' in database {db_name}")
-        print(f"Cluster: {cluster_name}, Hard clustering: {hard_clustering}")
+        print(f"Clusters: {sorted(clusters) if clusters else 'All'}, Hard clustering: {hard_clustering}")
 
-        if db_name not in self.databases:
+        if not self.has_database(db_name):
             print(f"Error: Database '{db_name}' not found.")
             return []
 
-        db_data = self.databases[db_name]
-        
-        if cluster_name and hard_clustering:
-            db_data = db_data[db_data['cluster_name'] == cluster_name]
-            print(f"Filtered to {len(db_data)} URLs in cluster {cluster_name}")
-
-        target_embedding = self._get_embedding(target_keyword)
-        similarities = []
+        try:
+            index = self.get_index(db_name)
+            query_vector = self.embedding_service.embed_one(target_keyword, normalize=True)
+        except Exception as e:
+            print(f"Error getting embeddings for outlink search: {str(e)}")
+            return []
 
-        for _, row in db_data.iterrows():
-            h1 = str(row['h1'])  # Ensure h1 is a string
-            if pd.isna(h1) or h1 == '':
-                print(f"Warning: Empty or NaN H1 for URL {row['url']}. Skipping.")
-                continue
-            h1_embedding = self._get_embedding(h1)
-            similarity = self._calculate_similarity(target_embedding, h1_embedding)
-            similarities.append({
-                "url": row['url'],
-                "similarity": similarity,
-                "cluster": row['cluster_name'],
-                "h1": h1
-            })
+        # Hard clustering scores only the selected clusters' rows; soft clustering scores
+        # every row and boosts the selected ones inside the same top-k pass
+        rows, boost_rows = None, None
+        if clusters:
+            selected_rows = index.cluster_rows(clusters)
+            if hard_clustering:
+                rows = selected_rows
+                print(f"Filtered to {len(rows)} URLs in {len(clusters)} cluster(s)")
+            else:
+                boost_rows = selected_rows
 
-        sorted_similarities = sorted(similarities, key=lambda x: x['similarity'], reverse=True)
-        potential_outlinks = sorted_similarities[:MAX_POTENTIAL_OUTLINKS]
+        if self.search_mode == 'ann':
+            partitioned_index = self.get_partitioned_index(db_name)
+            indices, scores = partitioned_index.search(
+                query_vector, MAX_POTENTIAL_OUTLINKS, self.n_probe, rows, boost_rows, cluster_boost
+            )
+        else:
+            indices, scores = index.search(query_vector, MAX_POTENTIAL_OUTLINKS, rows, boost_rows, cluster_boost)
+        potential_outlinks = [
+            {
+                "url": index.urls[i],
+                "similarity": float(score),
+                "cluster": index.clusters[i],
+                "h1": index.h1s[i]
+            }
+            for i, score in zip(indices, scores)
+        ]
 
         print(f"Found {len(potential_outlinks)} potential outlinks")
         return potential_outlinks
-
-    def _get_embedding(self, text: str) -> List[float]:
-        try:
-            response = self.client.embeddings.create(input=[text], model="text-embedding-ada-002")
-            return response.data[0].embedding
-        except Exception as e:
-            print(f"Error getting embedding for text: {text}")
-            print(f"Error details: {str(e)}")
-            return []
-
-    def _calculate_similarity(self, embedding1: List[float], embedding2: List[float]) -> float:
-        if not embedding1 or not embedding2:
-            return 0.0
-        return np.dot(embedding1, embedding2) / (np.linalg.norm(embedding1) * np.linalg.norm(embedding2))
\ No newline at end of file